@@ -0,0 +1,131 @@
+"""
+In-process cache for dataset reads.
+
+The stored dataset only changes on upload and clear, so read endpoints keep
+the column mapping, row counts and pre-encoded response bodies here instead
+of going back to Firebase on every request. Keys of a session's reads are
+tuples starting with its session_id, so writers can drop just that session
+with invalidate(session_id), or everything with invalidate().
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds an entry is trusted before it is read again, so that writes made
+# by other workers are eventually picked up
+DATASET_CACHE_TTL = float(os.getenv('DATASET_CACHE_TTL', '300'))
+
+# Upper bounds on the number of entries and on the bytes of cached bodies
+DATASET_CACHE_MAX_ENTRIES = int(os.getenv('DATASET_CACHE_MAX_ENTRIES', '256'))
+DATASET_CACHE_MAX_BYTES = int(os.getenv('DATASET_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+
+class DatasetCache:
+    """Thread-safe LRU cache with a TTL, an entry limit and a byte budget"""
+
+    def __init__(self, ttl=DATASET_CACHE_TTL, max_entries=DATASET_CACHE_MAX_ENTRIES,
+                 max_bytes=DATASET_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(value):
+        return len(value) if isinstance(value, (bytes, bytearray)) else 0
+
+    def _drop(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= self._size(value)
+
+    def get(self, key, default=None):
+        """Return a cached value, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation=None):
+        """
+        Store a value. When generation is given and the cache was invalidated
+        since it was taken, the value is stale and is not stored.
+        """
+        size = self._size(value)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if size > self.max_bytes:
+                return
+
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += size
+
+            # Evict least recently used entries until both bounds hold
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def get_or_load(self, key, loader):
+        """Return a cached value, calling loader() and caching its result on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            generation = self.generation
+            value = loader()
+            self.set(key, value, generation)
+        return value
+
+    @property
+    def generation(self):
+        """Counter bumped by every invalidation"""
+        with self._lock:
+            return self._generation
+
+    def invalidate(self, scope=None):
+        """
+        Drop every entry, or with scope only the key scope and the tuple keys
+        starting with it. Called whenever stored data changes.
+        """
+        with self._lock:
+            if scope is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                for key in [key for key in self._entries
+                            if key == scope or (isinstance(key, tuple) and key[:1] == (scope,))]:
+                    self._drop(key)
+            self._generation += 1
+
+    def stats(self):
+        """Return cache counters for status endpoints"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl_seconds": self.ttl,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+    def listen(self, ref):
+        """
+        Invalidate on every change below ref, so other workers' writes are
+        seen immediately rather than after the TTL. Returns the registration.
+        """
+        return ref.listen(lambda event: self.invalidate())
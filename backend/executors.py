@@ -0,0 +1,200 @@
+"""
+Managed worker pools for blocking work.
+
+The Firebase Admin SDK, openpyxl and pandas are all synchronous. Handlers
+hand that work to these pools so the event loop keeps serving other
+requests. Each pool accepts a bounded number of tasks; once it is full new
+work is rejected instead of queueing without limit. Background jobs, which
+have already answered their request, wait for a free slot instead.
+
+Parsing is CPU bound, so the sheets of multi-sheet workbooks are parsed in a
+separate pool of processes.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from profiling import profiled
+
+# Threads for Firebase reads and small writes
+STORAGE_WORKERS = int(os.getenv('STORAGE_WORKERS', '8'))
+STORAGE_QUEUE_LIMIT = int(os.getenv('STORAGE_QUEUE_LIMIT', '64'))
+
+# Threads for parsing and writing uploads, each one runs a whole ingestion
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))
+INGEST_QUEUE_LIMIT = int(os.getenv('INGEST_QUEUE_LIMIT', '4'))
+
+# Processes parsing the sheets of multi-sheet workbooks, one sheet each,
+# 0 parses sheets one after another on the ingest pool
+PARSE_PROCESSES = int(os.getenv('PARSE_PROCESSES', str(os.cpu_count() or 1)))
+
+
+class PoolBusyError(Exception):
+    """Raised when a pool already holds as many tasks as it accepts"""
+
+    def __init__(self, name):
+        super().__init__(f"The {name} pool is busy, please retry shortly")
+        self.name = name
+
+
+class WorkerPool:
+    """Thread pool that runs blocking callables for async code with back-pressure"""
+
+    def __init__(self, name, workers, queue_limit):
+        self.name = name
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._waiters = []
+        self.rejected = 0
+
+    async def run(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the pool and await its result"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolBusyError(self.name)
+        return await self._submit(func, *args, **kwargs)
+
+    async def run_when_free(self, func, *args, **kwargs):
+        """Like run(), but wait for a free slot instead of raising PoolBusyError"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                # Slots are released under the lock, so none can be missed between these two steps
+                if self._slots.acquire(blocking=False):
+                    break
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._lock:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+        return await self._submit(func, *args, **kwargs)
+
+    async def _submit(self, func, *args, **kwargs):
+        with self._lock:
+            self._pending += 1
+        try:
+            # A profiled request keeps being sampled while its work runs on the pool
+            future = self._executor.submit(profiled(functools.partial(func, *args, **kwargs)))
+        except Exception:
+            self._release(None)
+            raise
+
+        # Free the slot when the work finishes, even if the caller stopped waiting
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            self._slots.release()
+            waiters, self._waiters = self._waiters, []
+        # Every waiter retries, those that miss the slot wait for the next one
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # The waiter's event loop is closed
+                pass
+
+    def stats(self):
+        """Return pool counters for status endpoints"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "pending": self._pending,
+                "waiting": len(self._waiters),
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+storage_pool = WorkerPool('storage', STORAGE_WORKERS, STORAGE_QUEUE_LIMIT)
+ingest_pool = WorkerPool('ingest', INGEST_WORKERS, INGEST_QUEUE_LIMIT)
+
+
+class ProcessPool:
+    """Process pool started on first use and shared by all ingestions"""
+
+    def __init__(self, processes):
+        self.processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _context(self):
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # Spawned interpreters would re-run the application module and
+            # reconnect to Firebase in every worker, so fork copies of the
+            # server instead. start() does that before any threads exist.
+            return multiprocessing.get_context('fork')
+        return multiprocessing.get_context('spawn')
+
+    def start(self):
+        """Start the worker processes now rather than on first use"""
+        if self.processes:
+            self.executor.submit(int).result()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=self._context())
+            return self._executor
+
+    def submit(self, func, *args):
+        """
+        Submit func(*args). A worker process dying, killed for running out of
+        memory for instance, breaks the whole executor: its pending futures
+        raise BrokenProcessPool and it is replaced by a new one on next use.
+        """
+        executor = self.executor
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            self.discard(executor)
+            executor = self.executor
+            future = executor.submit(func, *args)
+        future.add_done_callback(functools.partial(self._discard_if_broken, executor))
+        return future
+
+    def _discard_if_broken(self, executor, future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self.discard(executor)
+
+    def discard(self, executor):
+        """Drop a broken executor so the next use starts new worker processes"""
+        with self._lock:
+            if self._executor is not executor:
+                # Another thread already replaced it
+                return
+            self._executor = None
+        print("Restarting the sheet parsing processes after a worker died")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+parse_pool = ProcessPool(PARSE_PROCESSES)
@@ -0,0 +1,262 @@
+"""
+In-process stand-in for the Firebase Realtime Database.
+
+Implements the part of the firebase_admin.db Reference API the backend uses:
+child, get (including shallow reads), set, update with multi-path keys,
+delete, transaction and key-ordered range queries. Data lives in nested
+dicts in memory with the Realtime Database's semantics: values must be JSON,
+writing None deletes, empty nodes disappear and nodes keyed 0..n come back
+as lists.
+
+install() routes firebase_admin to a FakeDatabase, so main.py runs without a
+Firebase project. Set FIREBASE_FAKE=1 to do that for a local server;
+benchmarks/load_test.py uses it to drive the API offline.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import firebase_admin
+from firebase_admin import db
+
+# Delay added to every call, roughly the round trip to a real database
+FAKE_FIREBASE_LATENCY_MS = float(os.getenv('FAKE_FIREBASE_LATENCY_MS', '0'))
+
+_INVALID_KEY_CHARACTERS = frozenset('.$#[]/')
+
+
+def _split(path):
+    return [part for part in (path or '').split('/') if part]
+
+
+def _key_order(key):
+    """Sort key of the Realtime Database: integer keys numerically first, then strings"""
+    if key.isdigit() and (key == '0' or not key.startswith('0')) and int(key) < 2 ** 31:
+        return (0, int(key), '')
+    return (1, 0, key)
+
+
+def _to_tree(value):
+    """Convert a JSON value to its stored form: dicts with string keys, without null or empty nodes"""
+    if isinstance(value, list):
+        value = {str(index): child for index, child in enumerate(value)}
+    if isinstance(value, dict):
+        tree = {}
+        for key, child in value.items():
+            key = str(key)
+            if not key or _INVALID_KEY_CHARACTERS & set(key):
+                raise ValueError(f"Invalid key '{key}', keys cannot be empty or contain . $ # [ ] /")
+            child = _to_tree(child)
+            if child is not None:
+                tree[key] = child
+        return tree or None
+    return value
+
+
+def _from_tree(node):
+    """Convert a stored node to what the SDK returns, nodes keyed 0..n as lists"""
+    if not isinstance(node, dict):
+        return node
+
+    return _as_array({key: _from_tree(child) for key, child in node.items()})
+
+
+def _as_array(result):
+    """Return result, converted children by key, as a list if the server would render it as an array"""
+    orders = [_key_order(key) for key in result]
+    if orders and all(order[0] == 0 for order in orders):
+        # Like the server, more than half of the indexes up to the largest must be set
+        largest = max(order[1] for order in orders)
+        if len(result) * 2 > largest + 1:
+            return [result.get(str(index)) for index in range(largest + 1)]
+    return result
+
+
+class FakeDatabase:
+    """A Realtime Database held in memory, safe to use from several threads"""
+
+    def __init__(self, latency_ms=FAKE_FIREBASE_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self._root = {}
+        self._lock = threading.RLock()
+        self._sorted_keys = {}
+
+    def reference(self, path='/'):
+        return Reference(self, _split(path))
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _node(self, parts):
+        node = self._root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _encode(self, value):
+        # The SDK sends values as JSON, so anything else fails the same way
+        return _to_tree(json.loads(json.dumps(value, allow_nan=False)))
+
+    def _write(self, parts, tree):
+        """Store an encoded value at parts, None deleting it, and drop emptied parents"""
+        self._sorted_keys.clear()
+        if not parts:
+            self._root = tree if isinstance(tree, dict) else {}
+            return
+
+        parents = [self._root]
+        for part in parts[:-1]:
+            child = parents[-1].get(part)
+            if not isinstance(child, dict):
+                if tree is None:
+                    return
+                child = parents[-1][part] = {}
+            parents.append(child)
+
+        if tree is None:
+            parents[-1].pop(parts[-1], None)
+        else:
+            parents[-1][parts[-1]] = tree
+
+        for depth in range(len(parents) - 1, 0, -1):
+            if parents[depth]:
+                break
+            del parents[depth - 1][parts[depth - 1]]
+
+    def _ordered_keys(self, node):
+        """Keys of node in key order with their sort keys, cached until the next write"""
+        cached = self._sorted_keys.get(id(node))
+        if cached is None:
+            keys = sorted(node, key=_key_order)
+            cached = self._sorted_keys[id(node)] = (keys, [_key_order(key) for key in keys])
+        return cached
+
+
+class Reference:
+    """The subset of firebase_admin.db.Reference used by the backend"""
+
+    def __init__(self, database, parts):
+        self._db = database
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self._parts)
+
+    def child(self, path):
+        return Reference(self._db, self._parts + _split(path))
+
+    def get(self, etag=False, shallow=False):
+        if etag:
+            raise NotImplementedError("etag reads are not supported by the fake database")
+        self._db._call()
+        with self._db._lock:
+            node = self._db._node(self._parts)
+            if shallow and isinstance(node, dict):
+                return {key: True if isinstance(child, dict) else child for key, child in node.items()}
+            return _from_tree(node)
+
+    def set(self, value):
+        if value is None:
+            raise ValueError("Value must not be None")
+        self._db._call()
+        tree = self._db._encode(value)
+        with self._db._lock:
+            self._db._write(self._parts, tree)
+
+    def update(self, value):
+        if not value or not isinstance(value, dict):
+            raise ValueError("Value argument must be a non-empty dictionary")
+        self._db._call()
+        # Encode everything first so a bad value leaves the database untouched
+        writes = [(self._parts + _split(path), self._db._encode(child)) for path, child in value.items()]
+        with self._db._lock:
+            for parts, tree in writes:
+                self._db._write(parts, tree)
+
+    def delete(self):
+        self._db._call()
+        with self._db._lock:
+            self._db._write(self._parts, None)
+
+    def transaction(self, transaction_update):
+        self._db._call()
+        with self._db._lock:
+            new_value = transaction_update(_from_tree(self._db._node(self._parts)))
+            self._db._write(self._parts, self._db._encode(new_value))
+            return new_value
+
+    def order_by_key(self):
+        return Query(self)
+
+    def listen(self, callback):
+        raise NotImplementedError("listen is not supported by the fake database")
+
+
+class Query:
+    """Key-ordered range query, the only ordering the backend uses"""
+
+    def __init__(self, ref):
+        self._ref = ref
+        self._start = None
+        self._end = None
+        self._limit_first = None
+        self._limit_last = None
+
+    def start_at(self, start):
+        self._start = str(start)
+        return self
+
+    def end_at(self, end):
+        self._end = str(end)
+        return self
+
+    def equal_to(self, value):
+        self._start = self._end = str(value)
+        return self
+
+    def limit_to_first(self, limit):
+        self._limit_first = limit
+        return self
+
+    def limit_to_last(self, limit):
+        self._limit_last = limit
+        return self
+
+    def get(self):
+        database = self._ref._db
+        database._call()
+        with database._lock:
+            node = database._node(self._ref._parts)
+            if not isinstance(node, dict):
+                return node
+
+            keys, orders = database._ordered_keys(node)
+            low = 0 if self._start is None else bisect.bisect_left(orders, _key_order(self._start))
+            high = len(keys) if self._end is None else bisect.bisect_right(orders, _key_order(self._end))
+            if self._limit_first is not None:
+                high = min(high, low + self._limit_first)
+            if self._limit_last is not None:
+                low = max(low, high - self._limit_last)
+            # Query results follow the same array rule as plain reads
+            return _as_array(OrderedDict((key, _from_tree(node[key])) for key in keys[low:high]))
+
+
+def install(database=None):
+    """Route firebase_admin to database, a new FakeDatabase by default, and return it"""
+    database = database or FakeDatabase()
+    firebase_admin.get_app = lambda *args, **kwargs: object()
+    db.reference = lambda path='/', app=None, url=None: database.reference(path)
+    return database
@@ -0,0 +1,424 @@
+"""
+Column indexes for server-side filtering, sorting and search.
+
+Indexes are built while an upload streams through ingestion, so queries never
+scan the stored rows. Numeric and date columns keep their values with a sorted
+permutation of row ids. Text columns are dictionary encoded and keep an
+inverted index from lower-cased tokens to the distinct values containing them.
+"""
+import bisect
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Session indexes each worker keeps in memory
+INDEX_CACHE_SESSIONS = int(os.getenv('INDEX_CACHE_SESSIONS', '8'))
+
+TOKEN_PATTERN = re.compile(r'\w+')
+ISO_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+
+FILTER_OPERATORS = ('eq', 'ne', 'lt', 'lte', 'gt', 'gte', 'contains')
+
+
+class QueryError(ValueError):
+    """Raised for filters, sort keys or columns that do not fit the dataset"""
+
+
+def tokenize(text):
+    """Split text into lower-cased word tokens"""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def parse_filter(expression):
+    """Parse a "column:operator:value" filter expression"""
+    parts = expression.split(':', 2)
+    if len(parts) != 3 or parts[1] not in FILTER_OPERATORS:
+        raise QueryError(
+            f"Invalid filter '{expression}', expected column:operator:value "
+            f"with operator one of {', '.join(FILTER_OPERATORS)}"
+        )
+    return parts[0], parts[1], parts[2]
+
+
+def parse_sort(expression):
+    """Parse "col1,-col2" into [(column, descending), ...]"""
+    keys = []
+    for part in expression.split(','):
+        part = part.strip()
+        if part:
+            keys.append((part.lstrip('-'), part.startswith('-')))
+    return keys
+
+
+def _descending(order, valid):
+    """Reverse the non-null part of an ascending order, keeping nulls last"""
+    return np.concatenate([order[:valid][::-1], order[valid:]])
+
+
+class NumericColumn:
+    """Index for number, boolean and date columns: values plus a sorted permutation"""
+
+    def __init__(self, kind, values):
+        self.kind = kind
+        self.values = values
+        self.order = np.argsort(values, kind='stable')  # NaN sorts last
+        self.valid = int(np.count_nonzero(~np.isnan(values)))
+        self.sorted_values = values[self.order[:self.valid]]
+        self._order_desc = None
+
+    def parse(self, raw):
+        try:
+            if self.kind == 'date':
+                return float(pd.Timestamp(raw).value)
+            if self.kind == 'boolean' and str(raw).lower() in ('true', 'false'):
+                return 1.0 if str(raw).lower() == 'true' else 0.0
+            return float(raw)
+        except (TypeError, ValueError):
+            raise QueryError(f"'{raw}' is not a valid {self.kind}")
+
+    def sorted_rows(self, descending=False):
+        if not descending:
+            return self.order
+        if self._order_desc is None:
+            self._order_desc = _descending(self.order, self.valid)
+        return self._order_desc
+
+    def sort_key(self, row_ids, descending=False):
+        keys = self.values[row_ids]
+        return -keys if descending else keys
+
+    def match(self, operator, raw):
+        if operator == 'contains':
+            raise QueryError(f"'contains' is not supported on {self.kind} columns")
+
+        value = self.parse(raw)
+        order = self.order[:self.valid]
+        left = np.searchsorted(self.sorted_values, value, 'left')
+        right = np.searchsorted(self.sorted_values, value, 'right')
+
+        if operator == 'eq':
+            return np.sort(order[left:right])
+        elif operator == 'ne':
+            return np.setdiff1d(np.arange(len(self.values)), order[left:right], assume_unique=True)
+        elif operator == 'lt':
+            return np.sort(order[:left])
+        elif operator == 'lte':
+            return np.sort(order[:right])
+        elif operator == 'gt':
+            return np.sort(order[right:])
+        else:  # gte
+            return np.sort(order[left:])
+
+    def search(self, token):
+        if self.kind != 'number':
+            return None
+        try:
+            return self.match('eq', token)
+        except QueryError:
+            return None
+
+
+class TextColumn:
+    """Index for text columns: dictionary codes, value ranks and an inverted token index"""
+
+    kind = 'text'
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+        self.code_of = {value: code for code, value in enumerate(categories)}
+
+        # Row ids grouped by code, rows of code c are by_code[bounds[c]:bounds[c + 1]]
+        self.by_code = np.argsort(codes, kind='stable')
+        self.bounds = np.searchsorted(codes[self.by_code], np.arange(len(categories) + 1))
+
+        # Rank of every distinct value in sort order, NaN for missing values
+        ranked = np.argsort(np.array(categories, dtype=object), kind='stable')
+        self.sorted_categories = [categories[code] for code in ranked]
+        rank = np.empty(len(categories), dtype=np.float64)
+        rank[ranked] = np.arange(len(categories))
+        self.ranks = np.where(codes >= 0, rank[np.maximum(codes, 0)], np.nan)
+
+        self.order = np.argsort(self.ranks, kind='stable')
+        self.valid = int(np.count_nonzero(codes >= 0))
+        self.sorted_ranks = self.ranks[self.order[:self.valid]]
+        self._order_desc = None
+
+        # Inverted index, tokens are kept sorted for prefix lookups
+        postings = {}
+        for code, value in enumerate(categories):
+            for token in set(tokenize(value)):
+                postings.setdefault(token, []).append(code)
+        self.tokens = sorted(postings)
+        self.token_codes = [np.array(postings[token], dtype=np.int64) for token in self.tokens]
+
+    def rows_for_codes(self, codes):
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64)
+        if len(codes) > 64:
+            # Many distinct values, one vectorized pass beats gathering slices
+            return np.flatnonzero(np.isin(self.codes, codes))
+        return np.sort(np.concatenate([self.by_code[self.bounds[code]:self.bounds[code + 1]] for code in codes]))
+
+    def sorted_rows(self, descending=False):
+        if not descending:
+            return self.order
+        if self._order_desc is None:
+            self._order_desc = _descending(self.order, self.valid)
+        return self._order_desc
+
+    def sort_key(self, row_ids, descending=False):
+        keys = self.ranks[row_ids]
+        return -keys if descending else keys
+
+    def token_rows(self, token):
+        """Rows whose value has a token starting with token"""
+        start = bisect.bisect_left(self.tokens, token)
+        end = bisect.bisect_left(self.tokens, token + '\uffff')
+        if start == end:
+            return np.empty(0, dtype=np.int64)
+        return self.rows_for_codes(np.unique(np.concatenate(self.token_codes[start:end])))
+
+    def match(self, operator, raw):
+        if operator == 'contains':
+            matches = None
+            for token in tokenize(raw):
+                rows = self.token_rows(token)
+                matches = rows if matches is None else np.intersect1d(matches, rows, assume_unique=True)
+            return matches if matches is not None else np.arange(len(self.codes))
+
+        code = self.code_of.get(raw)
+        if operator == 'eq':
+            return self.rows_for_codes([code] if code is not None else [])
+        elif operator == 'ne':
+            equal = self.rows_for_codes([code] if code is not None else [])
+            return np.setdiff1d(np.arange(len(self.codes)), equal, assume_unique=True)
+
+        # Range operators compare values in sort order
+        left = np.searchsorted(self.sorted_ranks, bisect.bisect_left(self.sorted_categories, raw), 'left')
+        right = np.searchsorted(self.sorted_ranks, bisect.bisect_right(self.sorted_categories, raw), 'left')
+        order = self.order[:self.valid]
+        if operator == 'lt':
+            return np.sort(order[:left])
+        elif operator == 'lte':
+            return np.sort(order[:right])
+        elif operator == 'gt':
+            return np.sort(order[right:])
+        else:  # gte
+            return np.sort(order[left:])
+
+    def search(self, token):
+        return self.token_rows(token)
+
+
+def _parse_iso_dates(categories):
+    """Return nanosecond timestamps for categories if every one is an ISO date, else None"""
+    if not categories or not all(ISO_DATE_PATTERN.match(value) for value in categories):
+        return None
+    parsed = pd.to_datetime(pd.Series(categories), errors='coerce')
+    if parsed.isna().any():
+        return None
+    return parsed.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _ColumnBuilder:
+    """Collects one column compactly: floats for numbers, dictionary codes for text"""
+
+    def __init__(self):
+        self.numbers = array('d')
+        self.codes = array('i')
+        self.categories = {}
+        self.numeric_count = 0
+        self.bool_count = 0
+        self.text_count = 0
+
+    def add(self, value):
+        if value is None:
+            self.numbers.append(np.nan)
+            self.codes.append(-1)
+        elif isinstance(value, (bool, int, float)):
+            self.numbers.append(float(value))
+            self.codes.append(-1)
+            self.numeric_count += 1
+            if isinstance(value, bool):
+                self.bool_count += 1
+        else:
+            text = value if isinstance(value, str) else str(value)
+            self.numbers.append(np.nan)
+            self.codes.append(self.categories.setdefault(text, len(self.categories)))
+            self.text_count += 1
+
+    def build(self):
+        numbers = np.array(self.numbers, dtype=np.float64)
+        codes = np.array(self.codes, dtype=np.int64)
+        categories = list(self.categories)
+
+        if self.text_count == 0:
+            if self.numeric_count and self.bool_count == self.numeric_count:
+                return NumericColumn('boolean', numbers)
+            return NumericColumn('number', numbers)
+
+        if self.numeric_count == 0:
+            timestamps = _parse_iso_dates(categories)
+            if timestamps is not None:
+                return NumericColumn('date', np.where(codes >= 0, timestamps[np.maximum(codes, 0)], np.nan))
+        else:
+            # Mixed column, index the numbers by their text form
+            numeric_rows = ~np.isnan(numbers)
+            distinct, inverse = np.unique(numbers[numeric_rows], return_inverse=True)
+            number_codes = np.array([
+                self.categories.setdefault(_format_number(value), len(self.categories))
+                for value in distinct
+            ], dtype=np.int64)
+            codes[numeric_rows] = number_codes[inverse]
+            categories = list(self.categories)
+
+        return TextColumn(codes, categories)
+
+
+class DatasetIndex:
+    """Indexes for every column of one dataset"""
+
+    def __init__(self, columns, rows_count):
+        self.columns = columns
+        self.rows_count = rows_count
+
+    def column(self, name, column_mapping=None):
+        """Look a column up by sanitized or original name"""
+        if name in self.columns:
+            return self.columns[name]
+        for sanitized, original in (column_mapping or {}).items():
+            if str(original) == name and sanitized in self.columns:
+                return self.columns[sanitized]
+        raise QueryError(f"Unknown column '{name}'")
+
+    def search(self, text):
+        """Rows matching every token of text in at least one column"""
+        matches = None
+        for token in tokenize(text):
+            hits = np.zeros(self.rows_count, dtype=bool)
+            for column in self.columns.values():
+                rows = column.search(token)
+                if rows is not None:
+                    hits[rows] = True
+            matches = hits if matches is None else matches & hits
+        return np.flatnonzero(matches) if matches is not None else None
+
+    def query(self, filters=(), sort=(), search=None, column_mapping=None):
+        """
+        Return the ids of rows matching all filters and the search text, in
+        sort order. filters are (column, operator, value) and sort keys are
+        (column, descending) tuples.
+        """
+        matches = None
+        for name, operator, value in filters:
+            rows = self.column(name, column_mapping).match(operator, value)
+            matches = rows if matches is None else np.intersect1d(matches, rows, assume_unique=True)
+
+        if search:
+            rows = self.search(search)
+            if rows is not None:
+                matches = rows if matches is None else np.intersect1d(matches, rows, assume_unique=True)
+
+        sort_columns = [(self.column(name, column_mapping), descending) for name, descending in sort]
+
+        if not sort_columns:
+            return matches if matches is not None else np.arange(self.rows_count)
+
+        if len(sort_columns) == 1:
+            # Walk the prebuilt permutation and keep only matching rows
+            column, descending = sort_columns[0]
+            order = column.sorted_rows(descending)
+            if matches is None:
+                return order
+            selected = np.zeros(self.rows_count, dtype=bool)
+            selected[matches] = True
+            return order[selected[order]]
+
+        if matches is None:
+            matches = np.arange(self.rows_count)
+        # np.lexsort treats the last key as the primary one
+        keys = [column.sort_key(matches, descending) for column, descending in reversed(sort_columns)]
+        return matches[np.lexsort(keys)]
+
+
+class IndexBuilder:
+    """Collects column values while batches stream to storage"""
+
+    def __init__(self, columns):
+        self.builders = {column: _ColumnBuilder() for column in columns}
+        self.rows_count = 0
+
+    def add(self, batch):
+        for row in batch:
+            # Missing rows keep their position so row ids still match storage
+            row = row or {}
+            for column, builder in self.builders.items():
+                builder.add(row.get(column))
+        self.rows_count += len(batch)
+
+    def wrap(self, batches):
+        """Pass batches through unchanged while indexing them"""
+        for batch in batches:
+            self.add(batch)
+            yield batch
+
+    def build(self):
+        return DatasetIndex(
+            {column: builder.build() for column, builder in self.builders.items()},
+            self.rows_count,
+        )
+
+
+class IndexRegistry:
+    """
+    Holds the indexes of recently used sessions, keyed by (session_id, sheet, version).
+    The sheets of a session are kept and dropped together, least recently used
+    session first, so max_sessions bounds sessions however many sheets they have.
+    """
+
+    def __init__(self, max_sessions=INDEX_CACHE_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Return the index for key, building it with loader() if this worker has none"""
+        session_id, *sheet_key = key
+        with self._lock:
+            indexes = self._sessions.get(session_id)
+            index = indexes.get(tuple(sheet_key)) if indexes else None
+            if index is not None:
+                self._sessions.move_to_end(session_id)
+                return index
+
+        # Build outside the lock so other sessions are not held up
+        index = loader()
+        self.set(key, index)
+        return index
+
+    def set(self, key, index):
+        session_id, *sheet_key = key
+        with self._lock:
+            self._sessions.setdefault(session_id, {})[tuple(sheet_key)] = index
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def discard(self, session_id):
+        """Drop the indexes of every sheet of a session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
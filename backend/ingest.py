@@ -0,0 +1,328 @@
+"""
+Streaming ingestion helpers for uploaded spreadsheets.
+
+The upload is copied to disk in fixed-size chunks and worksheets are read
+row by row with openpyxl in read-only mode, so memory use does not grow with
+the size of the workbook. Workbooks with several sheets are parsed one sheet
+per worker process, each spooling its record batches to a temporary file.
+
+CSV and TSV uploads skip openpyxl entirely: pandas' C parser reads them in
+chunks with column types inferred once from a sample of leading rows.
+"""
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from serialization import serialize_dataframe
+
+# Bytes read from the request body per iteration when spooling an upload
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(1024 * 1024)))
+
+# Rows handed to storage per write
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '1000'))
+
+# Rows parsed per chunk of a CSV/TSV upload, and rows sampled to infer column types
+CSV_CHUNK_ROWS = int(os.getenv('CSV_CHUNK_ROWS', '50000'))
+CSV_SAMPLE_ROWS = int(os.getenv('CSV_SAMPLE_ROWS', '10000'))
+
+# Field separator of each delimited text format
+TEXT_SEPARATORS = {'.csv': ',', '.tsv': '\t'}
+
+# Upload types ingestion understands
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls') + tuple(TEXT_SEPARATORS)
+
+# Text files hold a single table, stored like a workbook with one sheet
+TEXT_SHEET_NAME = 'Sheet1'
+
+
+async def save_upload_to_disk(upload_file, suffix):
+    """
+    Copy an UploadFile to a temporary file in chunks, hashing the bytes on
+    the way through. Returns (path, size, sha256 hex digest).
+    """
+    size = 0
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        try:
+            while True:
+                chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                tmp_file.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        except Exception:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+        return tmp_file.name, size, digest.hexdigest()
+
+
+def upload_key(content_hash, suffix, sheets=None):
+    """
+    Key identifying the dataset an upload produces: the same bytes read as a
+    different format or with a different sheet selection give another dataset
+    """
+    if not sheets:
+        return hashlib.sha256(f'{content_hash}:{suffix}'.encode()).hexdigest()
+    selection = '\0'.join(sheets)
+    return hashlib.sha256(f'{content_hash}:{suffix}:{selection}'.encode()).hexdigest()
+
+
+def sanitize_column_name(column_name):
+    """Sanitize column names for Firebase compatibility"""
+    if not column_name:
+        return "unnamed_column"
+
+    # Convert to string and remove/replace invalid characters
+    sanitized = str(column_name)
+
+    # Remove or replace invalid characters: $ # [ ] / . and spaces
+    sanitized = re.sub(r'[\$#\[\]/\.\s]', '_', sanitized)
+
+    # Remove leading/trailing underscores
+    sanitized = sanitized.strip('_')
+
+    # Ensure it's not empty
+    if not sanitized:
+        return "unnamed_column"
+
+    # Ensure it doesn't start with a number
+    if sanitized[0].isdigit():
+        sanitized = "col_" + sanitized
+
+    return sanitized
+
+
+class SheetNotFoundError(ValueError):
+    """Raised when a requested sheet is not in the workbook"""
+
+
+def select_sheets(sheet_names, requested=None):
+    """Pick sheets to ingest by name or position, every sheet when none are requested"""
+    if not sheet_names:
+        raise SheetNotFoundError("The workbook has no worksheets")
+    if not requested:
+        return list(sheet_names)
+
+    selected = []
+    for sheet in requested:
+        if sheet in sheet_names:
+            name = sheet
+        elif sheet.isdigit() and int(sheet) < len(sheet_names):
+            name = sheet_names[int(sheet)]
+        else:
+            raise SheetNotFoundError(f"Sheet '{sheet}' not found, the workbook has {', '.join(sheet_names)}")
+        if name not in selected:
+            selected.append(name)
+    return selected
+
+
+def list_sheet_names(path, suffix):
+    """Return the names of the worksheets of a workbook in order"""
+    if suffix in TEXT_SEPARATORS:
+        return [TEXT_SHEET_NAME]
+    if suffix == '.xlsx':
+        workbook = load_workbook(path, read_only=True)
+        try:
+            return [worksheet.title for worksheet in workbook.worksheets]
+        finally:
+            workbook.close()
+    return pd.ExcelFile(path).sheet_names
+
+
+def stream_excel_rows(path, sheet=0):
+    """Yield the rows of one worksheet of an .xlsx file, by position or name, as value tuples"""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[sheet] if isinstance(sheet, int) else workbook[sheet]
+        for row in worksheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def excel_header_names(header_row):
+    """Build column names from a header row the same way pandas.read_excel does"""
+    cells = list(header_row or ())
+
+    # Drop trailing blank header cells left behind by formatting
+    while cells and (cells[-1] is None or cells[-1] == ''):
+        cells.pop()
+
+    names = []
+    seen = {}
+    for index, cell in enumerate(cells):
+        name = f"Unnamed: {index}" if cell is None or cell == '' else cell
+        if isinstance(name, (datetime, date, time)):
+            name = name.isoformat()
+
+        # Mangle duplicate names as name.1, name.2, ...
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        if count:
+            name = f"{name}.{count}"
+        names.append(name)
+
+    return names
+
+
+def serialize_cell(value):
+    """Convert a single openpyxl cell value to a JSON serializable value"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    elif isinstance(value, timedelta):
+        return str(value)
+    elif isinstance(value, float) and value != value:  # NaN
+        return None
+    else:
+        return value
+
+
+def iter_record_batches(rows, columns, batch_size=INGEST_BATCH_SIZE):
+    """Group value tuples into lists of at most batch_size row dictionaries"""
+    width = len(columns)
+    batch = []
+    for row in rows:
+        values = [serialize_cell(value) for value in row[:width]]
+
+        # Skip blank lines, which pandas would also drop at the end of a sheet
+        if all(value is None for value in values):
+            continue
+
+        batch.append({
+            column: value
+            for column, value in zip(columns, values)
+            if value is not None
+        })
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def iter_list_batches(records, batch_size=INGEST_BATCH_SIZE):
+    """Split an in-memory list of records into batches of at most batch_size"""
+    for start in range(0, len(records), batch_size):
+        yield records[start:start + batch_size]
+
+
+def read_csv_options(path, separator):
+    """Keyword arguments shared by every read of a delimited text file"""
+    return {
+        'filepath_or_buffer': path,
+        'sep': separator,
+        'encoding': 'utf-8-sig',
+        'encoding_errors': 'replace',
+    }
+
+
+def infer_text_dtypes(sample):
+    """
+    Pick column types from a sample so every chunk is parsed the same way.
+    Integer and boolean columns use nullable dtypes, so blanks further down
+    the file do not turn them into floats.
+    """
+    dtypes = {}
+    for column, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            dtypes[column] = 'boolean'
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[column] = 'Int64'
+        elif pd.api.types.is_float_dtype(dtype):
+            dtypes[column] = 'float64'
+        else:
+            dtypes[column] = 'object'
+    return dtypes
+
+
+def iter_text_chunks(path, separator, dtypes):
+    """
+    Yield DataFrame chunks of a delimited text file parsed with dtypes. If a
+    chunk does not fit the sampled types, the file is read again and the rows
+    not yet yielded are parsed with types inferred per chunk.
+    """
+    options = read_csv_options(path, separator)
+    rows_read = 0
+    try:
+        for chunk in pd.read_csv(**options, dtype=dtypes, chunksize=CSV_CHUNK_ROWS):
+            rows_read += len(chunk)
+            yield chunk
+    except (ValueError, TypeError, OverflowError):
+        # Count parsed rows rather than lines, quoted fields may span lines
+        for chunk in pd.read_csv(**options, chunksize=CSV_CHUNK_ROWS, low_memory=False):
+            if rows_read >= len(chunk):
+                rows_read -= len(chunk)
+                continue
+            yield chunk.iloc[rows_read:]
+            rows_read = 0
+
+
+def iter_text_batches(chunks, columns, batch_size=INGEST_BATCH_SIZE):
+    """Serialize parsed chunks column by column and split them into batches"""
+    for chunk in chunks:
+        chunk.columns = columns
+
+        # Skip lines of empty fields such as ",", stored rows would have no values at all
+        filled = chunk.notna().any(axis=1)
+        if not filled.all():
+            chunk = chunk[filled]
+        yield from iter_list_batches(serialize_dataframe(chunk), batch_size)
+
+
+def parse_sheet(path, suffix, sheet=0):
+    """
+    Parse one worksheet, return (original_columns, sanitized_columns, batches)
+    where batches lazily yields lists of row dictionaries keyed by sanitized name.
+    """
+    if suffix in TEXT_SEPARATORS:
+        separator = TEXT_SEPARATORS[suffix]
+        sample = pd.read_csv(**read_csv_options(path, separator), nrows=CSV_SAMPLE_ROWS)
+        original_columns = list(sample.columns)
+        sanitized_columns = [sanitize_column_name(col) for col in original_columns]
+        chunks = iter_text_chunks(path, separator, infer_text_dtypes(sample))
+        return original_columns, sanitized_columns, iter_text_batches(chunks, sanitized_columns)
+
+    if suffix == '.xlsx':
+        # Parse rows incrementally with openpyxl read-only mode
+        rows = stream_excel_rows(path, sheet)
+        original_columns = excel_header_names(next(rows, None))
+        sanitized_columns = [sanitize_column_name(col) for col in original_columns]
+        return original_columns, sanitized_columns, iter_record_batches(rows, sanitized_columns)
+
+    # openpyxl cannot read legacy .xls workbooks, fall back to pandas
+    df = pd.read_excel(path, sheet_name=sheet)
+    original_columns = list(df.columns)
+    sanitized_columns = [sanitize_column_name(col) for col in original_columns]
+    df.columns = sanitized_columns
+    return original_columns, sanitized_columns, iter_list_batches(serialize_dataframe(df))
+
+
+def spool_sheet(path, suffix, sheet, spool_path):
+    """
+    Parse one worksheet into spool_path as a stream of pickled record batches.
+    Runs in a worker process, returns (original_columns, sanitized_columns).
+    """
+    original_columns, sanitized_columns, batches = parse_sheet(path, suffix, sheet)
+    with open(spool_path, 'wb') as spool:
+        for batch in batches:
+            pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+    return original_columns, sanitized_columns
+
+
+def read_spooled_batches(spool_path):
+    """Yield the record batches written by spool_sheet"""
+    with open(spool_path, 'rb') as spool:
+        while True:
+            try:
+                yield pickle.load(spool)
+            except EOFError:
+                return
@@ -0,0 +1,141 @@
+"""
+Background upload jobs.
+
+POST /upload-excel?job=true spools the file, registers a Job and answers at
+once with its id; ingestion then runs on the ingest pool while the job counts
+the rows parsed and written. GET /jobs/{job_id} reports the progress, either
+as one JSON snapshot or as a server-sent event stream.
+
+Jobs live in the memory of the worker that accepted the upload and are
+forgotten JOB_RETENTION_SECONDS after they finish.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Seconds a finished job can still be looked up
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+
+# Jobs kept per worker, the oldest finished ones are dropped first
+JOB_HISTORY_LIMIT = int(os.getenv('JOB_HISTORY_LIMIT', '1000'))
+
+# Seconds between progress events of GET /jobs/{job_id} streams
+JOB_EVENT_INTERVAL = float(os.getenv('JOB_EVENT_INTERVAL', '0.5'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class Job:
+    """Progress of one upload, updated from ingest threads and read by request handlers"""
+
+    def __init__(self, filename=None):
+        self.job_id = str(uuid.uuid4())
+        self.filename = filename
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.rows_parsed = 0
+        self.rows_written = 0
+        self.error = None
+        self.status_code = None
+        self.result = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def start(self):
+        with self._lock:
+            self.status = RUNNING
+            self.started_at = time.time()
+
+    def count_parsed(self, batches):
+        """Pass batches of rows through, counting them as parsed"""
+        for batch in batches:
+            with self._lock:
+                self.rows_parsed += len(batch)
+            yield batch
+
+    def add_written(self, rows):
+        with self._lock:
+            self.rows_written += rows
+
+    def succeed(self, result):
+        with self._lock:
+            self.status = SUCCEEDED
+            self.result = result
+            self.finished_at = time.time()
+
+    def fail(self, error, status_code=500):
+        with self._lock:
+            self.status = FAILED
+            self.error = error
+            self.status_code = status_code
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        """Return the job's state for GET /jobs/{job_id}"""
+        with self._lock:
+            elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+            snapshot = {
+                "job_id": self.job_id,
+                "filename": self.filename,
+                "status": self.status,
+                "rows_parsed": self.rows_parsed,
+                "rows_written": self.rows_written,
+                "elapsed_seconds": round(elapsed, 3),
+                "rows_per_second": round(self.rows_written / elapsed, 1) if elapsed else 0.0,
+                "error": self.error,
+                "status_code": self.status_code,
+            }
+            if self.result is not None:
+                snapshot["result"] = self.result
+            return snapshot
+
+
+class JobRegistry:
+    """The jobs of this worker by id, finished jobs expire after retention seconds"""
+
+    def __init__(self, retention=JOB_RETENTION_SECONDS, limit=JOB_HISTORY_LIMIT):
+        self.retention = retention
+        self.limit = limit
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, filename=None):
+        job = Job(filename)
+        with self._lock:
+            self._prune(time.time())
+            self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune(time.time())
+            return self._jobs.get(job_id)
+
+    def _prune(self, now):
+        for job_id, job in list(self._jobs.items()):
+            if job.done and now - job.finished_at > self.retention:
+                del self._jobs[job_id]
+        # Over the limit, drop the oldest finished jobs
+        for job_id, job in list(self._jobs.items()):
+            if len(self._jobs) <= self.limit:
+                break
+            if job.done:
+                del self._jobs[job_id]
+
+    def stats(self):
+        """Return job counters for status endpoints"""
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
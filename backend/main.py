@@ -1,23 +1,62 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import pandas as pd
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import firebase_admin
 from firebase_admin import credentials, db
 import os
 from dotenv import load_dotenv
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import asyncio
+import shutil
 import tempfile
-from datetime import datetime, timedelta
-import re
 import uuid
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from ingest import (
+    SUPPORTED_EXTENSIONS,
+    SheetNotFoundError,
+    list_sheet_names,
+    parse_sheet,
+    read_spooled_batches,
+    sanitize_column_name,
+    save_upload_to_disk,
+    select_sheets,
+    spool_sheet,
+    upload_key,
+)
+from cache import DatasetCache
+from executors import PoolBusyError, ingest_pool, parse_pool, storage_pool
+from jobs import JOB_EVENT_INTERVAL, JobRegistry
+from metrics import Gauge, MetricsMiddleware, Stage, render_metrics
+from profiling import ProfilingMiddleware, read_profile
+from indexes import IndexBuilder, IndexRegistry, QueryError, parse_filter, parse_sort
+from stats import compute_dataset_stats
+from rowdiff import RowDiff, RowHasher
+from serialization import (
+    ARROW_MEDIA_TYPE,
+    COLUMNAR_MEDIA_TYPE,
+    columnar_page,
+    encode_arrow,
+    encode_json,
+    negotiate_format,
+)
+from storage import STORAGE_BACKEND, create_storage_backend
+from sessions import SessionRecord, create_session_registry
+from sweeper import SESSION_TTL_SECONDS, ExpirySweeper
 
 # Load environment variables
 load_dotenv()
 
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by encode_json, orjson when it is installed"""
+    
+    def render(self, content):
+        return encode_json(content)
+
 # Initialize FastAPI app
-app = FastAPI(title="Excel Data Processor", version="1.0.0")
+app = FastAPI(title="Excel Data Processor", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -36,6 +75,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latency and response size of every request by route, served by GET /metrics
+app.add_middleware(MetricsMiddleware, routes=app.routes)
+
+# Requests sent with X-Profile: 1 or ?profile=1 are profiled when PROFILING_ENABLED is set
+app.add_middleware(ProfilingMiddleware)
+
+# FIREBASE_FAKE=1 keeps the database in memory, for offline development and load tests
+if os.getenv('FIREBASE_FAKE', '').lower() in ('1', 'true', 'yes'):
+    import fake_firebase
+    fake_firebase.install()
+    print("Using the in-memory fake Firebase database")
+
 # Initialize Firebase
 try:
     # Check if Firebase is already initialized
@@ -89,64 +140,488 @@ except Exception as e:
     # Create a mock database reference for development
     db_ref = None
 
-# Session management
-active_sessions = {}
+# Column indexes for filtering, sorting and search, built at upload time
+dataset_indexes = IndexRegistry()
+
+# Session management, shared between workers with SESSION_REGISTRY=sqlite
+session_registry = create_session_registry()
+
+# Background uploads of this worker and the tasks running them
+upload_jobs = JobRegistry()
+job_tasks = set()
+
+# Cached reads of session datasets, invalidated by every write endpoint
+dataset_cache = DatasetCache()
+if db_ref and os.getenv('DATASET_CACHE_LISTEN', '').lower() in ('1', 'true', 'yes'):
+    # Keep workers coherent by invalidating on any change to the current session
+    try:
+        dataset_cache.listen(db_ref.child('current_session'))
+    except Exception as e:
+        print(f"Error listening for dataset changes: {str(e)}")
+
+# Largest page of rows GET /data returns at once
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '1000'))
+
+# Page size for filtered, sorted or searched queries that do not set a limit
+DEFAULT_QUERY_LIMIT = int(os.getenv('DEFAULT_QUERY_LIMIT', '100'))
+
+# Rows read from storage and sent per chunk by GET /data/export
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '1000'))
+
+# Let requests without a session_id read and clear the latest upload, or clear
+# every session, for single-user deployments. Otherwise session_id is required.
+SINGLE_USER_MODE = os.getenv('SINGLE_USER_MODE', '').lower() in ('1', 'true', 'yes')
+
+def restore_column_names(rows, column_mapping):
+    """Convert sanitized column names in rows back to the original names"""
+    if not column_mapping or not isinstance(column_mapping, dict):
+        return rows
+    
+    return [
+        {column_mapping.get(sanitized_key, sanitized_key): value for sanitized_key, value in row.items()}
+        for row in rows
+        if row is not None
+    ]
+
+def parse_session_id(session_id):
+    """Validate a session_id parameter, it becomes part of storage paths"""
+    try:
+        return str(uuid.UUID(session_id))
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid session_id")
+
+def session_ref(session_id):
+    """Firebase node holding one upload's metadata (and rows with the Firebase backend)"""
+    return db_ref.child(f'sessions/{session_id}')
+
+def dataset_path(session_id, sheet):
+    """Path of one sheet's dataset inside a session"""
+    return f'sessions/{session_id}/sheets/{sheet}'
+
+def dataset_ref(session_id, sheet):
+    """Firebase node holding one sheet's column mapping, statistics and row count"""
+    return db_ref.child(dataset_path(session_id, sheet))
+
+def dataset_storage(session_id, sheet):
+    """Storage backend for one sheet's rows and row hashes, kept apart from its metadata"""
+    return create_storage_backend(db_ref, dataset_path(session_id, sheet), f'sessions/{session_id}/row_hashes/{sheet}')
 
-def sanitize_column_name(column_name):
-    """Sanitize column names for Firebase compatibility"""
-    if not column_name:
-        return "unnamed_column"
+def session_storage(session_id):
+    """Storage backend rooted at a session, clearing it removes the rows of every sheet"""
+    return create_storage_backend(db_ref, f'sessions/{session_id}')
+
+def get_column_mapping(session_id, sheet):
+    """Return a sheet's column mapping, reading Firebase only on a cache miss"""
+    return dataset_cache.get_or_load(
+        (session_id, sheet, 'column_mapping'), lambda: dataset_ref(session_id, sheet).child('column_mapping').get()
+    )
+
+async def run_blocking(pool, func, *args, wait=False):
+    """Run blocking work on a worker pool, answering 503 when the pool is full unless wait is set"""
+    if wait:
+        return await pool.run_when_free(func, *args)
+    try:
+        return await pool.run(func, *args)
+    except PoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+async def cached(key, loader):
+    """Return a cached value, running loader on the storage pool only on a miss"""
+    missing = object()
+    value = dataset_cache.get(key, missing)
+    if value is missing:
+        value = await run_blocking(storage_pool, dataset_cache.get_or_load, key, loader)
+    return value
+
+def require_session_id(session_id):
+    """Reject a request without a session_id unless SINGLE_USER_MODE lets it use the latest upload"""
+    if session_id is None and not SINGLE_USER_MODE:
+        raise HTTPException(status_code=400, detail="session_id is required")
+
+async def resolve_session(session_id):
+    """
+    Return the session a read should use: the requested one, or in
+    SINGLE_USER_MODE the latest upload when none is given. None means there is no data at all.
+    """
+    require_session_id(session_id)
+    if session_id is None:
+        return await cached('current_session', lambda: db_ref.child('current_session/session_id').get())
     
-    # Convert to string and remove/replace invalid characters
-    sanitized = str(column_name)
+    session_id = parse_session_id(session_id)
+    meta = await cached((session_id, 'meta'), lambda: session_ref(session_id).child('meta').get())
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session_id
+
+async def resolve_sheet(session_id, sheet):
+    """Return the position of the requested sheet, given by name or position, the first sheet by default"""
+    if sheet is None:
+        return 0
     
-    # Remove or replace invalid characters: $ # [ ] / . and spaces
-    sanitized = re.sub(r'[\$#\[\]/\.\s]', '_', sanitized)
+    meta = await cached((session_id, 'meta'), lambda: session_ref(session_id).child('meta').get())
+    names = [entry.get('name') for entry in (meta or {}).get('sheets') or []]
+    if sheet in names:
+        return names.index(sheet)
+    if sheet.isdigit() and int(sheet) < len(names):
+        return int(sheet)
+    raise HTTPException(status_code=404, detail=f"Sheet '{sheet}' not found")
+
+def load_data(session_id, sheet, offset=0, limit=None):
+    """Build the GET /data payload, reading only the requested rows when limit is set"""
+    column_mapping = get_column_mapping(session_id, sheet)
+    storage = dataset_storage(session_id, sheet)
     
-    # Remove leading/trailing underscores
-    sanitized = sanitized.strip('_')
+    if limit is not None:
+        rows = storage.read_rows(offset, limit)
+        total = dataset_cache.get_or_load(
+            (session_id, sheet, 'rows_count'), lambda: dataset_ref(session_id, sheet).child('rows_count').get() or 0
+        )
+        next_offset = offset + len(rows)
+        
+        return {
+            "data": restore_column_names(rows, column_mapping),
+            "count": len(rows),
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": next_offset if next_offset < total else None
+        }
     
-    # Ensure it's not empty
-    if not sanitized:
-        return "unnamed_column"
+    data = storage.read_all()
     
-    # Ensure it doesn't start with a number
-    if sanitized[0].isdigit():
-        sanitized = "col_" + sanitized
+    if data is None:
+        return {"data": [], "message": "No data found"}
     
-    return sanitized
+    converted_data = restore_column_names(data, column_mapping)
+    return {"data": converted_data, "count": len(converted_data)}
 
-def serialize_data(data):
-    """Convert data to JSON serializable format"""
-    if isinstance(data, list):
-        return [serialize_data(item) for item in data]
-    elif isinstance(data, dict):
-        return {key: serialize_data(value) for key, value in data.items()}
-    elif isinstance(data, (datetime, pd.Timestamp)):
-        return data.isoformat()
-    elif hasattr(data, 'timestamp'):  # Handle datetime objects
-        return data.isoformat() if hasattr(data, 'isoformat') else str(data)
-    elif pd.isna(data):  # Handle NaN values
-        return None
+def sheet_columns(session_id, sheet):
+    """A sheet's original column names in file order, the column order of column-oriented responses"""
+    return list((get_column_mapping(session_id, sheet) or {}).values())
+
+def encode_page(payload, media_type="application/json", columns=()):
+    """
+    Encode a GET /data payload as media_type, rows or one of the column-oriented
+    formats in the order of columns, recorded as the encode stage
+    """
+    with Stage('encode') as encoded:
+        if media_type == ARROW_MEDIA_TYPE:
+            body = encode_arrow(payload, columns)
+        elif media_type == COLUMNAR_MEDIA_TYPE:
+            body = encode_json(columnar_page(payload, columns))
+        else:
+            body = encode_json(payload)
+        encoded.rows = len(payload.get('data') or [])
+        encoded.bytes = len(body)
+    return body
+
+def session_version(meta):
+    """When a session's rows last changed, part of its index keys"""
+    return (meta or {}).get('updated_at') or (meta or {}).get('created_at')
+
+def get_dataset_index(session_id, sheet):
+    """
+    Return a sheet's index, rebuilding it from storage if this worker has none
+    for the current version of the session
+    """
+    def build_from_storage():
+        builder = IndexBuilder(list(get_column_mapping(session_id, sheet) or {}))
+        builder.add(dataset_storage(session_id, sheet).read_all() or [])
+        return builder.build()
+    
+    meta = dataset_cache.get_or_load((session_id, 'meta'), lambda: session_ref(session_id).child('meta').get())
+    return dataset_indexes.get((session_id, sheet, session_version(meta)), build_from_storage)
+
+def load_query(session_id, sheet, offset, limit, filters, sort, search):
+    """Build the GET /data payload for a filtered, sorted or searched page of rows"""
+    column_mapping = get_column_mapping(session_id, sheet)
+    row_ids = get_dataset_index(session_id, sheet).query(filters, sort, search, column_mapping)
+    
+    page_ids = row_ids[offset:offset + limit].tolist()
+    rows = dataset_storage(session_id, sheet).read_rows_by_ids(page_ids)
+    next_offset = offset + len(page_ids)
+    
+    return {
+        "data": restore_column_names(rows, column_mapping),
+        "count": len(rows),
+        "total": len(row_ids),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset if next_offset < len(row_ids) else None
+    }
+
+def load_stats(session_id, sheet):
+    """Return a sheet's stored statistics, computing them from the index if they are missing"""
+    if session_id is None:
+        return compute_dataset_stats(IndexBuilder([]).build())
+    
+    stats = dataset_ref(session_id, sheet).child('dataset_stats').get()
+    if stats is None:
+        stats = compute_dataset_stats(get_dataset_index(session_id, sheet), get_column_mapping(session_id, sheet))
+    return stats
+
+def store_sheet(session_id, sheet, name, original_columns, sanitized_columns, batches, incremental=False, job=None,
+                parse_stage='parse'):
+    """
+    Store one parsed sheet as its own dataset with its own column mapping and statistics.
+    With incremental, only the rows that differ from the sheet already stored there are written.
+    job, when given, counts the rows parsed and written. Time spent producing batches is
+    recorded as the parse_stage stage.
+    """
+    # Create mapping for frontend
+    column_mapping = dict(zip(sanitized_columns, original_columns))
+    
+    # Write rows in bounded batches, indexing and hashing them on the way through
+    index_builder = IndexBuilder(sanitized_columns)
+    storage = dataset_storage(session_id, sheet)
+    previous_hashes = None
+    if incremental:
+        with Stage('load_row_hashes'):
+            previous_hashes = storage.read_row_hashes()
+    parsed = Stage(parse_stage)
+    batches = parsed.wrap(batches)
+    progress = None
+    if job is not None:
+        batches = job.count_parsed(batches)
+        progress = job.add_written
+    try:
+        if previous_hashes is None:
+            hasher = RowHasher()
+            prepared = Stage('index_and_hash', inner=parsed)
+            with Stage('write_rows', inner=prepared) as written:
+                rows_count = storage.write_dataset(
+                    prepared.wrap(hasher.wrap(index_builder.wrap(batches))), sanitized_columns, progress=progress
+                )
+                written.rows = rows_count
+            changes = {'inserted': rows_count, 'updated': 0, 'deleted': 0}
+        else:
+            hasher = RowDiff(previous_hashes)
+            prepared = Stage('index_and_diff', inner=parsed)
+            with Stage('write_rows', inner=prepared) as written:
+                written.rows = storage.update_rows(
+                    prepared.wrap(hasher.changes(index_builder.wrap(batches)), count=lambda change: 1),
+                    sanitized_columns, progress=progress
+                )
+            rows_count = len(hasher.hashes)
+            changes = {'inserted': hasher.inserted, 'updated': hasher.updated, 'deleted': hasher.deleted}
+    except Exception:
+        # The stored rows no longer match their hashes, the next re-upload rewrites the sheet
+        storage.delete_row_hashes()
+        raise
+    
+    # Summarize every column once so the dashboard never needs the full rows
+    with Stage('compute_stats') as computed:
+        index = index_builder.build()
+        stats = compute_dataset_stats(index, column_mapping)
+        computed.rows = rows_count
+    with Stage('write_metadata'):
+        dataset_ref(session_id, sheet).update({
+            'column_mapping': column_mapping,
+            'dataset_stats': stats,
+            'rows_count': rows_count
+        })
+    with Stage('write_row_hashes'):
+        storage.write_row_hashes(hasher.hashes)
+    
+    return {
+        'name': name,
+        'original_columns': original_columns,
+        'sanitized_columns': sanitized_columns,
+        'rows_count': rows_count,
+        'changes': changes,
+        'index': index,
+        'stats': stats
+    }
+
+def ingest_sheet(tmp_file_path, suffix, session_id, sheet, name, incremental, job=None):
+    """Parse one sheet in this thread, streaming its rows into storage"""
+    with Stage('open_sheet'):
+        original_columns, sanitized_columns, batches = parse_sheet(tmp_file_path, suffix, name)
+    return store_sheet(session_id, sheet, name, original_columns, sanitized_columns, batches, incremental, job)
+
+def ingest_sheets_in_parallel(tmp_file_path, suffix, session_id, sheet_names, incremental, job=None):
+    """Parse sheets in worker processes and store each one as soon as it is parsed"""
+    spool_dir = tempfile.mkdtemp(prefix='sheets-')
+    futures = {}
+    try:
+        for sheet, name in enumerate(sheet_names):
+            spool_path = os.path.join(spool_dir, f'{sheet}.pickle')
+            parsing = Stage('parse_process').start()
+            future = parse_pool.submit(spool_sheet, tmp_file_path, suffix, name, spool_path)
+            future.add_done_callback(lambda future, parsing=parsing: parsing.stop())
+            futures[future] = (sheet, name, spool_path)
+        
+        results = [None] * len(sheet_names)
+        for future in as_completed(futures):
+            sheet, name, spool_path = futures[future]
+            try:
+                original_columns, sanitized_columns = future.result()
+            except BrokenProcessPool:
+                # A parsing process died, parse the sheets it took down in this thread
+                print(f"Parsing sheet {name!r} in-thread after a parsing process died")
+                results[sheet] = ingest_sheet(tmp_file_path, suffix, session_id, sheet, name, incremental[sheet], job)
+                continue
+            results[sheet] = store_sheet(
+                session_id, sheet, name, original_columns, sanitized_columns, read_spooled_batches(spool_path),
+                incremental[sheet], job, parse_stage='read_spool'
+            )
+            os.unlink(spool_path)
+        return results
+    finally:
+        # Stop parsing the remaining sheets if one of them failed
+        for future in futures:
+            future.cancel()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+def ingest_file(tmp_file_path, suffix, session_id, sheets=None, previous_sheets=None, job=None):
+    """
+    Parse a spooled upload and store each selected sheet as a dataset of a new session.
+    previous_sheets lists the sheet names of an existing session being re-uploaded: a sheet
+    keeping its name and position is diffed against the stored rows, other sheets are replaced.
+    Runs on the ingest pool, returns the columns, row count, index and statistics of every sheet.
+    """
+    with Stage('list_sheets'):
+        sheet_names = select_sheets(list_sheet_names(tmp_file_path, suffix), sheets)
+    previous_sheets = previous_sheets or []
+    incremental = [
+        sheet < len(previous_sheets) and previous_sheets[sheet] == name for sheet, name in enumerate(sheet_names)
+    ]
+    
+    if len(sheet_names) > 1 and parse_pool.processes:
+        results = ingest_sheets_in_parallel(tmp_file_path, suffix, session_id, sheet_names, incremental, job)
     else:
-        return data
+        # A single sheet streams straight into storage without a worker process
+        results = [
+            ingest_sheet(tmp_file_path, suffix, session_id, sheet, name, incremental[sheet], job)
+            for sheet, name in enumerate(sheet_names)
+        ]
+    
+    # Sheets the new file no longer has
+    for sheet in range(len(sheet_names), len(previous_sheets)):
+        dataset_storage(session_id, sheet).clear()
+        dataset_ref(session_id, sheet).delete()
+    return results
 
-def cleanup_expired_sessions():
-    """Clean up expired sessions"""
-    if not db_ref:
-        return
+def publish_session(session_id, meta, record, replaced_hash=None):
+    """
+    Make a fully written session readable and the latest upload in one update, then track it.
+    replaced_hash is the upload key of the content a re-upload replaced.
+    """
+    updates = {
+        f'sessions/{session_id}/meta': meta,
+        f'upload_hashes/{record.content_hash}': {'session_id': session_id},
+        'current_session': meta
+    }
+    if replaced_hash and replaced_hash != record.content_hash:
+        updates[f'upload_hashes/{replaced_hash}'] = None
+    with Stage('publish'):
+        db_ref.update(updates)
+        session_registry.add(record)
+
+def find_uploaded_session(content_hash):
+    """Return the meta of the live session holding an upload with this key, or None"""
+    with Stage('dedup_lookup'):
+        entry = db_ref.child(f'upload_hashes/{content_hash}').get()
+        if not entry or not entry.get('session_id'):
+            return None
         
-    current_time = datetime.now()
-    expired_sessions = []
+        # The entry outlives its session if the session was deleted by an older version
+        meta = session_ref(entry['session_id']).child('meta').get()
+    if not meta or meta.get('content_hash') != content_hash:
+        return None
+    return meta
+
+def reuse_session(meta):
+    """Make an existing session the latest upload again and restart its expiry"""
+    db_ref.child('current_session').set(meta)
+    session_registry.add(SessionRecord(
+        meta['session_id'],
+        datetime.fromisoformat(meta['created_at']).timestamp(),
+        datetime.now().timestamp() + SESSION_TTL_SECONDS,
+        meta.get('rows_count'),
+        meta.get('content_hash'),
+    ))
+
+def forget_session(session_id):
+    """Drop what this worker holds in memory for a session"""
+    session_registry.remove(session_id)
+    dataset_indexes.discard(session_id)
+    dataset_cache.invalidate(session_id)
+    dataset_cache.invalidate('current_session')
+
+def clear_session(session_id):
+    """Delete one session's rows and metadata"""
+    content_hash = session_ref(session_id).child('meta/content_hash').get()
+    session_storage(session_id).clear()
+    updates = {f'sessions/{session_id}': None}
+    if content_hash:
+        updates[f'upload_hashes/{content_hash}'] = None
+    db_ref.update(updates)
+    
+    # Only drop the latest upload pointer if no newer upload replaced it
+    db_ref.child('current_session').transaction(
+        lambda current: None if current and current.get('session_id') == session_id else current
+    )
+    forget_session(session_id)
+
+def clear_all_sessions():
+    """Delete every session's rows and metadata"""
+    session_ids = db_ref.child('sessions').get(shallow=True) or {}
+    for session_id in session_ids:
+        session_storage(session_id).clear()
+    db_ref.child('sessions').delete()
+    db_ref.child('upload_hashes').delete()
+    db_ref.child('current_session').delete()
+    
+    # Nodes left behind by versions that kept a single global dataset
+    for legacy_path in ('excel_data', 'column_mapping', 'dataset_stats'):
+        db_ref.child(legacy_path).delete()
     
-    for session_id, session_data in active_sessions.items():
-        if current_time - session_data['created_at'] > timedelta(hours=24):  # 24 hour expiry
-            expired_sessions.append(session_id)
+    session_registry.clear()
+    dataset_indexes.clear()
+    dataset_cache.invalidate()
+
+def reclaim_sessions(records):
+    """Delete a batch of expired sessions with a single multi-path update"""
+    session_ids = [record.session_id for record in records]
+    updates = {f'sessions/{session_id}': None for session_id in session_ids}
+    for record in records:
+        if record.content_hash:
+            updates[f'upload_hashes/{record.content_hash}'] = None
+    db_ref.update(updates)
+    if STORAGE_BACKEND != 'firebase':
+        # Rows kept outside Firebase are not covered by the update
+        for session_id in session_ids:
+            session_storage(session_id).clear()
     
-    for session_id in expired_sessions:
-        # Clear data for expired session
-        db_ref.child(f'sessions/{session_id}').delete()
-        del active_sessions[session_id]
+    expired = set(session_ids)
+    db_ref.child('current_session').transaction(
+        lambda current: None if current and current.get('session_id') in expired else current
+    )
+    for session_id in session_ids:
+        forget_session(session_id)
+
+# Deletes sessions once they are older than SESSION_TTL_SECONDS
+session_sweeper = ExpirySweeper(session_registry, reclaim_sessions)
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    """Expire old sessions in the background instead of on the read path"""
+    if db_ref:
+        session_sweeper.start(storage_pool)
+
+@app.on_event("startup")
+def start_parse_pool():
+    """Fork the sheet parsing processes while the server has no worker threads yet"""
+    parse_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_worker_pools():
+    """Stop the worker pools when the server shuts down"""
+    session_sweeper.stop()
+    storage_pool.shutdown()
+    ingest_pool.shutdown()
+    parse_pool.shutdown()
 
 @app.get("/")
 async def root():
@@ -155,201 +630,467 @@ async def root():
 
 @app.get("/debug")
 async def debug_info():
-    """Debug endpoint to check environment variables and Firebase status"""
+    """Status page built from this worker's memory, it never calls Firebase"""
+    firebase_service_account = os.getenv('FIREBASE_SERVICE_ACCOUNT')
+    firebase_database_url = os.getenv('FIREBASE_DATABASE_URL')
+    return {
+        "firebase_service_account_set": bool(firebase_service_account),
+        "firebase_database_url_set": bool(firebase_database_url),
+        "firebase_database_url": firebase_database_url,
+        "firebase_connected": db_ref is not None,
+        "storage_backend": STORAGE_BACKEND,
+        "single_user_mode": SINGLE_USER_MODE,
+        "dataset_cache": dataset_cache.stats(),
+        "session_sweeper": session_sweeper.stats(),
+        "upload_jobs": upload_jobs.stats(),
+        "worker_pools": {
+            "storage": storage_pool.stats(),
+            "ingest": ingest_pool.stats()
+        },
+        "environment_variables": {
+            "FIREBASE_SERVICE_ACCOUNT_length": len(firebase_service_account) if firebase_service_account else 0,
+            "FIREBASE_DATABASE_URL": firebase_database_url
+        }
+    }
+
+# Gauges read from the status counters at every scrape of GET /metrics
+Gauge('worker_pool_pending', 'Tasks running or queued on a worker pool', ('pool',),
+      lambda: {(pool.name,): pool.stats()['pending'] for pool in (storage_pool, ingest_pool)})
+Gauge('worker_pool_rejected', 'Tasks a full worker pool turned away since startup', ('pool',),
+      lambda: {(pool.name,): pool.stats()['rejected'] for pool in (storage_pool, ingest_pool)})
+Gauge('dataset_cache', 'Dataset cache entries, bytes, hits and misses', ('counter',),
+      lambda: {(key,): value for key, value in dataset_cache.stats().items() if key in ('entries', 'bytes', 'hits', 'misses')})
+Gauge('upload_jobs', 'Upload jobs of this worker by status', ('status',),
+      lambda: {(status,): count for status, count in upload_jobs.stats().items()})
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """
+    Return the profile of a request sent with X-Profile: 1 or ?profile=1, named by
+    its X-Profile-Id response header, as folded stacks for flame graph tools
+    """
+    profile = read_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=profile, media_type="text/plain; charset=utf-8")
+
+@app.get("/metrics")
+async def metrics():
+    """Request latency by route, upload stage timings and storage call timings in the Prometheus text format"""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def upload_response(meta, deduplicated=False, changes=None):
+    """Describe a stored upload from its session meta and the rows it inserted, updated and deleted"""
+    sheets = meta.get('sheets') or []
+    columns = (sheets[0].get('columns') or []) if sheets else []
+    return {
+        "message": "Data already uploaded" if deduplicated else "Data uploaded successfully",
+        "rows_processed": meta.get('rows_count', 0),
+        "columns": columns,
+        "sanitized_columns": [sanitize_column_name(col) for col in columns],
+        "sheets": [
+            {
+                "name": entry.get('name'),
+                "rows_processed": entry.get('rows_count', 0),
+                "columns": entry.get('columns') or []
+            }
+            for entry in sheets
+        ],
+        "session_id": meta['session_id'],
+        "deduplicated": deduplicated,
+        "changes": changes or {'inserted': 0, 'updated': 0, 'deleted': 0}
+    }
+
+async def process_upload(tmp_file_path, suffix, content_hash, sheets, session_id, previous, job=None):
+    """
+    Store a spooled upload as session_id, or refresh the existing session described
+    by previous, and return the upload response. Removes the spooled file.
+    A job has already been accepted, so it waits for busy pools instead of failing with 503.
+    """
+    wait = job is not None
     try:
-        firebase_service_account = os.getenv('FIREBASE_SERVICE_ACCOUNT')
-        firebase_database_url = os.getenv('FIREBASE_DATABASE_URL')
+        try:
+            # The same file was stored before, point at it instead of storing it again
+            if previous is None:
+                meta = await run_blocking(storage_pool, find_uploaded_session, content_hash, wait=wait)
+            else:
+                meta = previous if previous.get('content_hash') == content_hash else None
+            if meta is not None:
+                await run_blocking(storage_pool, reuse_session, meta, wait=wait)
+                dataset_cache.invalidate('current_session')
+                return upload_response(meta, deduplicated=True)
+            
+            # Parse and store on the ingest pool so other requests stay responsive
+            previous_sheets = [entry.get('name') for entry in previous.get('sheets') or []] if previous else None
+            results = await run_blocking(
+                ingest_pool, ingest_file, tmp_file_path, suffix, session_id, sheets, previous_sheets, job, wait=wait
+            )
+            rows_count = sum(result['rows_count'] for result in results)
+        finally:
+            # Clean up temporary file
+            os.unlink(tmp_file_path)
+        
+        now = datetime.now()
+        created_at = datetime.fromisoformat(previous['created_at']) if previous else now
+        record = SessionRecord(
+            session_id, created_at.timestamp(), now.timestamp() + SESSION_TTL_SECONDS, rows_count, content_hash
+        )
+        meta = {
+            'session_id': session_id,
+            'created_at': created_at.isoformat(),
+            'updated_at': now.isoformat(),
+            'rows_count': rows_count,
+            'content_hash': content_hash,
+            'sheets': [
+                {'name': result['name'], 'rows_count': result['rows_count'], 'columns': result['original_columns']}
+                for result in results
+            ]
+        }
         
-        # Test Firebase connection
-        test_data = db_ref.child('test').get()
+        # Store session tracking in Firebase and the session registry
+        await run_blocking(
+            storage_pool, publish_session, session_id, meta, record, previous and previous.get('content_hash'),
+            wait=wait
+        )
         
-        return {
-            "firebase_service_account_set": bool(firebase_service_account),
-            "firebase_database_url_set": bool(firebase_database_url),
-            "firebase_database_url": firebase_database_url,
-            "firebase_connection_test": "success" if test_data is not None else "failed",
-            "environment_variables": {
-                "FIREBASE_SERVICE_ACCOUNT_length": len(firebase_service_account) if firebase_service_account else 0,
-                "FIREBASE_DATABASE_URL": firebase_database_url
-            }
+        # Other sessions are untouched, only the latest upload pointer moved. A new session
+        # is invalidated too, reads made while a job was running cached it as missing
+        dataset_indexes.discard(session_id)
+        dataset_cache.invalidate(session_id)
+        dataset_cache.invalidate('current_session')
+        for sheet, result in enumerate(results):
+            dataset_indexes.set((session_id, sheet, session_version(meta)), result['index'])
+            dataset_cache.set((session_id, sheet, 'stats'), encode_json(result['stats']))
+        
+        changes = {
+            kind: sum(result['changes'][kind] for result in results) for kind in ('inserted', 'updated', 'deleted')
         }
+        return upload_response(meta, changes=changes)
+        
+    except HTTPException:
+        raise
+    except SheetNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        return {
-            "error": str(e),
-            "firebase_service_account_set": bool(os.getenv('FIREBASE_SERVICE_ACCOUNT')),
-            "firebase_database_url_set": bool(os.getenv('FIREBASE_DATABASE_URL')),
-            "firebase_database_url": os.getenv('FIREBASE_DATABASE_URL')
-        }
+        if previous:
+            # Rows are written in place, the next re-upload rewrites a partially written sheet
+            raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+        
+        # Remove whatever part of the session was written
+        try:
+            await run_blocking(storage_pool, clear_session, session_id, wait=wait)
+        except Exception as cleanup_error:
+            print(f"Error removing failed upload {session_id}: {str(cleanup_error)}")
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+async def run_upload_job(job, *args):
+    """Run process_upload for a job, recording its outcome instead of raising"""
+    job.start()
+    try:
+        job.succeed(await process_upload(*args, job=job))
+    except HTTPException as e:
+        job.fail(e.detail, e.status_code)
+    except Exception as e:
+        job.fail(f"Error processing file: {str(e)}")
 
 @app.post("/upload-excel")
-async def upload_excel(file: UploadFile = File(...)):
+async def upload_excel(
+    file: UploadFile = File(...),
+    sheets: Optional[List[str]] = Query(None, alias="sheet"),
+    session_id: Optional[str] = None,
+    job: bool = False
+):
     """
-    Upload and process Excel file
+    Upload and process an Excel, CSV or TSV file. Every sheet of a workbook is
+    stored, or only those named by sheet=name (repeatable). With session_id the
+    file replaces that session's data and only the rows that changed are written.
+    With job=true the file is processed in the background and a job id is
+    returned at once, its progress is reported by GET /jobs/{job_id}
     """
     if not db_ref:
         raise HTTPException(status_code=500, detail="Firebase database not available")
         
-    if not file or not file.filename or not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Only Excel files are allowed")
+    if not file or not file.filename or os.path.splitext(file.filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Only Excel, CSV and TSV files are allowed")
     
-    try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-        
-        # Read Excel file
-        df = pd.read_excel(tmp_file_path)
-        
-        # Clean up temporary file
-        os.unlink(tmp_file_path)
-        
-        # Sanitize column names
-        original_columns = list(df.columns)
-        sanitized_columns = [sanitize_column_name(col) for col in original_columns]
-        
-        # Create mapping for frontend
-        column_mapping = dict(zip(sanitized_columns, original_columns))
-        
-        # Rename columns in DataFrame
-        df.columns = sanitized_columns
-        
-        # Convert DataFrame to list of dictionaries and serialize datetime objects
-        data = df.to_dict('records')
-        serialized_data = serialize_data(data)
-        
-        # Generate session ID for this upload
+    previous = None
+    if session_id is not None:
+        session_id = parse_session_id(session_id)
+        previous = await run_blocking(storage_pool, lambda: session_ref(session_id).child('meta').get())
+        if previous is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+    else:
+        # Generate session ID for this upload, its rows are stored under it
         session_id = str(uuid.uuid4())
-        active_sessions[session_id] = {
-            'created_at': datetime.now(),
-            'rows_count': len(serialized_data) if serialized_data else 0
-        }
-        
-        # Store in Firebase with session tracking
-        db_ref.child('excel_data').set(serialized_data)
-        db_ref.child('column_mapping').set(column_mapping)
-        db_ref.child('current_session').set({
-            'session_id': session_id,
-            'created_at': datetime.now().isoformat(),
-            'rows_count': len(serialized_data) if serialized_data else 0
-        })
-        
-        return {
-            "message": "Data uploaded successfully",
-            "rows_processed": len(serialized_data) if serialized_data else 0,
-            "columns": original_columns,
-            "sanitized_columns": sanitized_columns,
-            "session_id": session_id
-        }
-        
+    
+    try:
+        # Copy the upload to disk in chunks instead of buffering it in memory
+        suffix = os.path.splitext(file.filename)[1].lower()
+        with Stage('save_upload') as saved:
+            tmp_file_path, saved.bytes, digest = await save_upload_to_disk(file, suffix)
+        content_hash = upload_key(digest, suffix, sheets)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    
+    if not job:
+        return await process_upload(tmp_file_path, suffix, content_hash, sheets, session_id, previous)
+    
+    # The request ends here, the file keeps being processed in the background
+    upload_job = upload_jobs.create(file.filename)
+    task = asyncio.get_running_loop().create_task(
+        run_upload_job(upload_job, tmp_file_path, suffix, content_hash, sheets, session_id, previous)
+    )
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+    return FastJSONResponse(status_code=202, content={
+        "message": "Upload accepted",
+        "job_id": upload_job.job_id,
+        "session_id": session_id,
+        "status": upload_job.status,
+        "status_url": f"/jobs/{upload_job.job_id}"
+    })
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """
+    Report an upload job's progress: rows parsed and written, throughput, errors
+    and, once it succeeded, the upload response. Clients sending
+    Accept: text/event-stream get a server-sent event every JOB_EVENT_INTERVAL seconds until the job ends
+    """
+    upload_job = upload_jobs.get(job_id)
+    if upload_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if 'text/event-stream' not in request.headers.get('accept', ''):
+        return upload_job.snapshot()
+    
+    async def events():
+        last = None
+        while True:
+            snapshot = upload_job.snapshot()
+            if snapshot != last:
+                event = 'done' if upload_job.done else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(snapshot)}\n\n"
+                last = snapshot
+            if upload_job.done:
+                return
+            await asyncio.sleep(JOB_EVENT_INTERVAL)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/data")
-async def get_data():
+async def get_data(
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    filters: Optional[List[str]] = Query(None, alias="filter"),
+    sort: Optional[str] = None,
+    q: Optional[str] = None,
+    session_id: Optional[str] = None,
+    sheet: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
     """
-    Retrieve all data from Firebase
+    Retrieve a session's data (the latest upload in SINGLE_USER_MODE), optionally one page of rows at a time.
+    sheet selects a sheet of a multi-sheet upload by name or position, the first one by default.
+    filter=column:operator:value (repeatable), sort=col,-col and q=text
+    are answered from the column indexes and return one page of matches.
+    Accept: application/vnd.excel-data.columnar+json returns the rows as one array
+    per column and Accept: application/vnd.apache.arrow.stream as an Arrow IPC stream.
     """
     if not db_ref:
         raise HTTPException(status_code=500, detail="Firebase database not available")
+    
+    media_type = negotiate_format(accept)
+    if media_type is None:
+        raise HTTPException(status_code=406, detail="Arrow responses need pyarrow installed on the server")
         
     try:
-        # Clean up expired sessions first
-        cleanup_expired_sessions()
+        session_id = await resolve_session(session_id)
+        if session_id is None:
+            body = encode_page({"data": [], "message": "No data found"}, media_type)
+            return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+        sheet = await resolve_sheet(session_id, sheet)
         
-        data = db_ref.child('excel_data').get()
-        column_mapping = db_ref.child('column_mapping').get()
-        
-        if data is None:
-            return {"data": [], "message": "No data found"}
-        
-        # Convert sanitized column names back to original names
-        if column_mapping and isinstance(column_mapping, dict):
-            # Create reverse mapping
-            reverse_mapping = {v: k for k, v in column_mapping.items()}
-            
-            # Convert data back to original column names
-            converted_data = []
-            for row in data:
-                converted_row = {}
-                for sanitized_key, value in row.items():
-                    original_key = reverse_mapping.get(sanitized_key, sanitized_key)
-                    converted_row[original_key] = value
-                converted_data.append(converted_row)
-            
-            return {"data": converted_data, "count": len(converted_data)}
+        if filters or sort or q:
+            parsed_filters = [parse_filter(expression) for expression in filters or []]
+            parsed_sort = parse_sort(sort or '')
+            limit = limit or DEFAULT_QUERY_LIMIT
+            key = (session_id, sheet, 'query', offset, limit, tuple(parsed_filters), tuple(parsed_sort), q, media_type)
+            body = await cached(key, lambda: encode_page(
+                load_query(session_id, sheet, offset, limit, parsed_filters, parsed_sort, q),
+                media_type, sheet_columns(session_id, sheet)
+            ))
         else:
-            return {"data": data, "count": len(data)}
+            # Serve the encoded body from cache until the session changes
+            body = await cached((session_id, sheet, 'data', offset, limit, media_type), lambda: encode_page(
+                load_data(session_id, sheet, offset, limit), media_type, sheet_columns(session_id, sheet)
+            ))
+        return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
         
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving data: {str(e)}")
 
+async def export_chunks(batches, column_mapping, export_format):
+    """
+    Encode batches of stored rows as NDJSON lines or as one JSON array, one chunk per batch.
+    The next batch is read from storage while the current chunk is being sent.
+    """
+    pending = asyncio.ensure_future(run_blocking(storage_pool, next, batches, None))
+    first = True
+    try:
+        if export_format == 'json':
+            yield b'['
+        while True:
+            rows = await pending
+            if rows is None:
+                break
+            pending = asyncio.ensure_future(run_blocking(storage_pool, next, batches, None))
+            
+            rows = restore_column_names(rows, column_mapping)
+            if export_format == 'json':
+                # The rows of a batch are encoded in one call, without the brackets
+                yield (b'' if first else b',') + encode_json(rows)[1:-1]
+            else:
+                yield b''.join(encode_json(row) + b'\n' for row in rows)
+            first = False
+        if export_format == 'json':
+            yield b']'
+    except Exception as e:
+        # Headers are already sent, so the client sees a truncated body
+        print(f"Error exporting data: {str(e)}")
+        raise
+    finally:
+        pending.cancel()
+
+@app.get("/data/export")
+async def export_data(
+    session_id: Optional[str] = None,
+    sheet: Optional[str] = None,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|json)$")
+):
+    """
+    Stream every row of a session's sheet (the latest upload in SINGLE_USER_MODE) as NDJSON
+    (format=ndjson) or as a JSON array (format=json). Rows are read from storage a
+    batch at a time, so memory stays bounded and the first rows are sent right away
+    """
+    if not db_ref:
+        raise HTTPException(status_code=500, detail="Firebase database not available")
+    
+    try:
+        session_id = await resolve_session(session_id)
+        if session_id is None:
+            raise HTTPException(status_code=404, detail="No data found")
+        sheet = await resolve_sheet(session_id, sheet)
+        column_mapping = await cached(
+            (session_id, sheet, 'column_mapping'), lambda: dataset_ref(session_id, sheet).child('column_mapping').get()
+        )
+        
+        batches = dataset_storage(session_id, sheet).iter_batches(EXPORT_BATCH_ROWS)
+        media_type = "application/json" if export_format == 'json' else "application/x-ndjson"
+        return StreamingResponse(export_chunks(batches, column_mapping, export_format), media_type=media_type)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting data: {str(e)}")
+
 @app.get("/data/{row_id}")
-async def get_row(row_id: int):
+async def get_row(row_id: int, session_id: Optional[str] = None, sheet: Optional[str] = None):
     """
     Retrieve specific row by index
     """
-    try:
-        data = db_ref.child('excel_data').get()
-        column_mapping = db_ref.child('column_mapping').get()
+    if not db_ref:
+        raise HTTPException(status_code=500, detail="Firebase database not available")
         
-        if data is None or row_id >= len(data):
+    try:
+        session_id = await resolve_session(session_id)
+        if session_id is None:
             raise HTTPException(status_code=404, detail="Row not found")
+        sheet = await resolve_sheet(session_id, sheet)
         
-        row_data = data[row_id]
+        # Read just this row instead of the whole dataset
+        row_data = None
+        if row_id >= 0:
+            row_data = await cached(
+                (session_id, sheet, 'row', row_id), lambda: dataset_storage(session_id, sheet).read_row(row_id)
+            )
         
-        # Convert sanitized column names back to original names
-        if column_mapping and isinstance(column_mapping, dict):
-            reverse_mapping = {v: k for k, v in column_mapping.items()}
-            converted_row = {}
-            for sanitized_key, value in row_data.items():
-                original_key = reverse_mapping.get(sanitized_key, sanitized_key)
-                converted_row[original_key] = value
-            return {"data": converted_row}
-        else:
-            return {"data": row_data}
+        if row_data is None:
+            raise HTTPException(status_code=404, detail="Row not found")
+        
+        column_mapping = await cached(
+            (session_id, sheet, 'column_mapping'), lambda: dataset_ref(session_id, sheet).child('column_mapping').get()
+        )
+        return {"data": restore_column_names([row_data], column_mapping)[0]}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving row: {str(e)}")
 
-@app.delete("/data")
-async def clear_data():
+@app.get("/stats")
+async def get_stats(session_id: Optional[str] = None, sheet: Optional[str] = None):
     """
-    Clear all data from Firebase
+    Per-column summary statistics of one sheet of a session, by default the first sheet
     """
     if not db_ref:
         raise HTTPException(status_code=500, detail="Firebase database not available")
         
     try:
-        db_ref.child('excel_data').delete()
-        db_ref.child('column_mapping').delete()
-        db_ref.child('current_session').delete()
+        session_id = await resolve_session(session_id)
+        if session_id is not None:
+            sheet = await resolve_sheet(session_id, sheet)
+        body = await cached((session_id, sheet, 'stats'), lambda: encode_json(load_stats(session_id, sheet)))
+        return Response(content=body, media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving statistics: {str(e)}")
+
+@app.delete("/data")
+async def clear_data(session_id: Optional[str] = None):
+    """
+    Clear one session's data, or in SINGLE_USER_MODE all data when no session_id is given
+    """
+    if not db_ref:
+        raise HTTPException(status_code=500, detail="Firebase database not available")
         
-        # Clear active sessions
-        active_sessions.clear()
+    try:
+        require_session_id(session_id)
+        if session_id is not None:
+            await run_blocking(storage_pool, clear_session, parse_session_id(session_id))
+            return {"message": "Session data cleared successfully"}
         
+        await run_blocking(storage_pool, clear_all_sessions)
         return {"message": "All data cleared successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing data: {str(e)}")
 
 @app.post("/session/clear")
-async def clear_session_data():
+async def clear_session_data(session_id: Optional[str] = None):
     """
-    Clear session data from Firebase
+    Clear a session's data, in SINGLE_USER_MODE by default the latest upload
     """
     if not db_ref:
         raise HTTPException(status_code=500, detail="Firebase database not available")
         
     try:
-        db_ref.child('excel_data').delete()
-        db_ref.child('column_mapping').delete()
-        db_ref.child('current_session').delete()
-        
-        # Clear active sessions
-        active_sessions.clear()
+        require_session_id(session_id)
+        session_id = parse_session_id(session_id) if session_id is not None else (
+            await run_blocking(storage_pool, db_ref.child('current_session/session_id').get)
+        )
+        if session_id:
+            await run_blocking(storage_pool, clear_session, session_id)
         
         return {"message": "Session data cleared successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing session data: {str(e)}")
 
@@ -362,20 +1103,22 @@ async def get_active_sessions():
         raise HTTPException(status_code=500, detail="Firebase database not available")
         
     try:
-        # Clean up expired sessions first
-        cleanup_expired_sessions()
+        records = await run_blocking(storage_pool, session_registry.list_active)
         
         return {
-            "active_sessions": len(active_sessions),
+            "active_sessions": len(records),
             "sessions": [
                 {
-                    "session_id": session_id,
-                    "created_at": session_data['created_at'].isoformat(),
-                    "rows_count": session_data['rows_count']
+                    "session_id": record.session_id,
+                    "created_at": datetime.fromtimestamp(record.created_at).isoformat(),
+                    "expires_at": datetime.fromtimestamp(record.expires_at).isoformat(),
+                    "rows_count": record.rows_count
                 }
-                for session_id, session_data in active_sessions.items()
+                for record in records
             ]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving sessions: {str(e)}")
 
@@ -0,0 +1,280 @@
+"""
+Request, pipeline stage and storage call metrics.
+
+Every request is timed by MetricsMiddleware from its first byte in to its
+last byte out, labelled with the matched route. Uploads are broken down into
+stages (spooling, parsing, indexing, writing rows, ...) with the rows and
+bytes each one handled, every storage backend call is timed on its own and so
+is every sweep of expired sessions.
+GET /metrics renders it all in the Prometheus text format, together with
+gauges read from the worker pools, cache, sweeper and job registry.
+
+Streamed stages overlap: rows are parsed while earlier ones are written. A
+Stage wrapping the batches of another one only counts its own share, so the
+parse, index and write times of an upload add up to its ingestion time.
+
+Counters live in the memory of each worker.
+"""
+import os
+import threading
+import time
+
+from starlette.routing import Match
+
+# Upper bounds in seconds of the latency histogram buckets
+METRICS_BUCKETS = tuple(
+    float(bound) for bound in os.getenv(
+        'METRICS_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60'
+    ).split(',')
+)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing total per label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # A series without labels is exported from the start, at zero
+        self._values = {} if self.labelnames else {(): 0}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, values, (), total) for values, total in self._values.items()]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=METRICS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {} if self.labelnames else {(): [[0] * len(self.buckets), 0.0, 0]}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            counts = self._values.get(labelvalues)
+            if counts is None:
+                counts = self._values[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][position] += 1
+                    break
+            counts[1] += value
+            counts[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for values, (buckets, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, buckets):
+                    cumulative += bucket_count
+                    samples.append((f'{self.name}_bucket', values, (('le', _number(bound)),), cumulative))
+                samples.append((f'{self.name}_sum', values, (), total))
+                samples.append((f'{self.name}_count', values, (), count))
+        return samples
+
+
+class Gauge:
+    """Current values read from callback(), a dict of label values tuples to numbers, at every scrape"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        _registry.append(self)
+
+    def samples(self):
+        return [(self.name, values, (), value) for values, value in self.callback().items() if value is not None]
+
+
+def render_metrics():
+    """Render every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, values, extra, value in metric.samples():
+            lines.append(f'{name}{_labels(metric.labelnames, values, extra)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time from receiving a request to sending its last byte',
+    ('method', 'route', 'status')
+)
+RESPONSE_BYTES = Counter('http_response_bytes_total', 'Bytes of response bodies sent', ('method', 'route'))
+
+STAGE_SECONDS = Histogram('pipeline_stage_duration_seconds', 'Time spent in a pipeline stage', ('stage',))
+STAGE_ROWS = Counter('pipeline_stage_rows_total', 'Rows handled by a pipeline stage', ('stage',))
+STAGE_BYTES = Counter('pipeline_stage_bytes_total', 'Bytes handled by a pipeline stage', ('stage',))
+
+STORAGE_SECONDS = Histogram(
+    'storage_call_duration_seconds', 'Time spent in a storage backend call', ('backend', 'operation')
+)
+STORAGE_ROWS = Counter('storage_call_rows_total', 'Rows read or written by storage backend calls',
+                       ('backend', 'operation'))
+STORAGE_ERRORS = Counter('storage_call_errors_total', 'Storage backend calls that raised', ('backend', 'operation'))
+
+SWEEP_SECONDS = Histogram('session_sweep_duration_seconds', 'Time spent in a sweep of expired sessions')
+SWEEP_SESSIONS = Counter('session_sweep_sessions_reclaimed_total', 'Expired sessions deleted by sweeps')
+SWEEP_ROWS = Counter('session_sweep_rows_reclaimed_total', 'Rows of the expired sessions deleted by sweeps')
+SWEEP_ERRORS = Counter('session_sweep_errors_total', 'Batches of expired sessions a sweep failed to delete')
+
+
+class Stage:
+    """
+    Times one pipeline stage and counts its rows and bytes, either as a
+    context manager or over the batches it produces with wrap(). inner is the
+    Stage producing this stage's input, its time is not counted twice.
+    """
+
+    def __init__(self, name, inner=None):
+        self.name = name
+        self.inner = inner
+        self.seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.seconds += time.perf_counter() - self._start
+        self.observe()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def wrap(self, batches, count=len):
+        """Pass batches through, timing how long each takes to produce and counting count(batch) rows"""
+        iterator = iter(batches)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    batch = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.seconds += time.perf_counter() - start
+                self.rows += count(batch)
+                yield batch
+        finally:
+            self.observe()
+
+    def observe(self):
+        seconds = self.seconds - (self.inner.seconds if self.inner else 0.0)
+        STAGE_SECONDS.observe(max(seconds, 0.0), self.name)
+        if self.rows:
+            STAGE_ROWS.inc(self.rows, self.name)
+        if self.bytes:
+            STAGE_BYTES.inc(self.bytes, self.name)
+
+
+def observe_storage_call(backend, operation, seconds, rows=0):
+    STORAGE_SECONDS.observe(seconds, backend, operation)
+    if rows:
+        STORAGE_ROWS.inc(rows, backend, operation)
+
+
+def timed_storage(operation):
+    """Decorate a storage backend method to record its duration, the rows it handled and failures"""
+    def decorate(method):
+        def timed(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception:
+                STORAGE_ERRORS.inc(1, self.name, operation)
+                observe_storage_call(self.name, operation, time.perf_counter() - start)
+                raise
+            # Writes return a row count, reads a list of rows or a single row
+            rows = result if isinstance(result, int) else len(result) if isinstance(result, list) else int(result is not None)
+            observe_storage_call(self.name, operation, time.perf_counter() - start, rows)
+            return result
+        timed.__name__ = method.__name__
+        timed.__doc__ = method.__doc__
+        return timed
+    return decorate
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency and response size of every request by route"""
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def route_of(self, scope):
+        # Label by route template so ids in paths do not create new series
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return 'unmatched'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        response = {'status': 500, 'bytes': 0}
+
+        async def send_and_count(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['bytes'] += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_count)
+        finally:
+            route = self.route_of(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope['method'], route, str(response['status']))
+            RESPONSE_BYTES.inc(response['bytes'], scope['method'], route)
@@ -0,0 +1,232 @@
+"""
+Opt-in sampling profiler for single requests.
+
+With PROFILING_ENABLED=true, a request sent with the header "X-Profile: 1" or
+the query parameter profile=1 is profiled on its own: a background thread
+samples the stacks of the event loop thread and of every worker pool thread
+running work for that request every PROFILE_INTERVAL seconds. The response
+carries an X-Profile-Id header and the profile is kept in PROFILE_DIR as
+folded stacks ("thread;outer;...;inner count" lines), the input of
+flamegraph.pl, speedscope and most other flame graph viewers. GET
+/profiles/{profile_id} returns it.
+
+Samples are wall-clock, so time spent waiting on Firebase or on a full shard
+queue shows up too. The event loop thread is shared by all requests, so its
+stacks may include concurrent requests; uploads spend most of their time on
+the ingest pool, which is attributed exactly. With job=true only the request
+itself is profiled, not the background ingestion.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+# Requests may only ask for a profile when this is set
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+# Seconds between stack samples
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+
+# Where profiles are written, and how many are kept
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_HISTORY_LIMIT = int(os.getenv('PROFILE_HISTORY_LIMIT', '100'))
+
+_current_profile = contextvars.ContextVar('current_profile', default=None)
+
+
+def frame_label(frame):
+    code = frame.f_code
+    # Semicolons separate frames in the folded format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class Profile:
+    """Stack samples of the threads working for one request"""
+
+    def __init__(self, name):
+        self.profile_id = uuid.uuid4().hex
+        self.name = name
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.duration = None
+        self._threads = Counter()
+        self._lock = threading.Lock()
+
+    def attach(self):
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def detach(self):
+        with self._lock:
+            ident = threading.get_ident()
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def sample(self, frames, thread_names):
+        with self._lock:
+            idents = list(self._threads)
+        for ident in idents:
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            labels.append(thread_names.get(ident, str(ident)).replace(';', ':'))
+            self.stacks[';'.join(reversed(labels))] += 1
+        self.samples += 1
+
+    def folded(self):
+        """The samples in the folded stack format, one 'frames count' line per distinct stack"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class Sampler:
+    """One thread sampling the stacks of all active profiles while there are any"""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._profiles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+
+    def remove(self, profile):
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for profile in profiles:
+                profile.sample(frames, thread_names)
+            del frames
+            time.sleep(self.interval)
+
+
+sampler = Sampler()
+
+
+def profiled(func):
+    """
+    Wrap func, about to be handed to a worker thread, so that the thread is
+    sampled while it runs if the calling request is being profiled
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return func
+
+    def run(*args, **kwargs):
+        profile.attach()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.detach()
+    return run
+
+
+def profile_path(profile_id, directory=PROFILE_DIR):
+    return os.path.join(directory, f'{profile_id}.folded')
+
+
+def save_profile(profile, directory=PROFILE_DIR, limit=PROFILE_HISTORY_LIMIT):
+    """Write a profile to directory, dropping the oldest ones beyond limit"""
+    os.makedirs(directory, exist_ok=True)
+    path = profile_path(profile.profile_id, directory)
+    with open(path, 'w') as profile_file:
+        profile_file.write(profile.folded())
+
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.folded')),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in profiles[:max(len(profiles) - limit, 0)]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+    return path
+
+
+def read_profile(profile_id, directory=PROFILE_DIR):
+    """Return a stored profile's folded stacks, None for unknown or malformed ids"""
+    try:
+        profile_id = uuid.UUID(hex=profile_id).hex
+    except (ValueError, TypeError):
+        return None
+    try:
+        with open(profile_path(profile_id, directory)) as profile_file:
+            return profile_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def profile_requested(scope):
+    """Whether a request asks to be profiled with X-Profile or profile= set to 1, true or yes"""
+    for name, value in scope.get('headers', ()):
+        if name == b'x-profile':
+            return value.decode('latin-1').lower() in ('1', 'true', 'yes')
+    for pair in scope.get('query_string', b'').decode('latin-1').split('&'):
+        name, _, value = pair.partition('=')
+        if name == 'profile':
+            return value.lower() in ('1', 'true', 'yes')
+    return False
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests that ask for it when PROFILING_ENABLED is set"""
+
+    def __init__(self, app, enabled=PROFILING_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope['type'] != 'http' or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(f"{scope['method']} {scope['path']}")
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message = dict(message)
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'x-profile-id', profile.profile_id.encode()),
+                    (b'access-control-expose-headers', b'X-Profile-Id'),
+                ]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        profile.attach()
+        sampler.add(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.remove(profile)
+            profile.detach()
+            _current_profile.reset(token)
+            profile.duration = time.perf_counter() - start
+            try:
+                path = save_profile(profile)
+                print(f"Profiled {profile.name} in {profile.duration:.3f}s, {profile.samples} samples: {path}")
+            except OSError as e:
+                print(f"Error saving profile {profile.profile_id}: {str(e)}")
@@ -0,0 +1,82 @@
+"""
+Row hashes for incremental re-uploads.
+
+Every stored sheet keeps an 8-byte hash of each row in its storage backend,
+apart from the sheet metadata that reads load; Firebase packs them into base64
+strings of ROW_HASH_CHUNK hashes. Re-uploading a file into an existing session
+hashes the new rows the same way and compares them position by position with
+the stored hashes, so only rows that were changed, appended or cut off at the
+end are written.
+"""
+import base64
+import hashlib
+import os
+
+# Row hashes per stored string, about 11 characters each once encoded
+ROW_HASH_CHUNK = int(os.getenv('ROW_HASH_CHUNK', '8192'))
+
+ROW_HASH_SIZE = 8
+
+
+def row_hash(row):
+    """Hash a parsed row, rows hold JSON values in column order so repr() is stable"""
+    return hashlib.blake2b(repr(row).encode(), digest_size=ROW_HASH_SIZE).digest()
+
+
+def pack_row_hashes(hashes, chunk_size=ROW_HASH_CHUNK):
+    """Encode row hashes as a list of base64 strings for Firebase"""
+    return [
+        base64.b64encode(b''.join(hashes[start:start + chunk_size])).decode('ascii')
+        for start in range(0, len(hashes), chunk_size)
+    ]
+
+
+def unpack_row_hashes(chunks):
+    """Decode the output of pack_row_hashes back to a list of row hashes"""
+    data = b''.join(base64.b64decode(chunk) for chunk in chunks or [])
+    return [data[start:start + ROW_HASH_SIZE] for start in range(0, len(data), ROW_HASH_SIZE)]
+
+
+class RowHasher:
+    """Records the hash of every row of a stream of batches passing through"""
+
+    def __init__(self):
+        self.hashes = []
+
+    def wrap(self, batches):
+        for batch in batches:
+            self.hashes.extend(row_hash(row) for row in batch)
+            yield batch
+
+
+class RowDiff(RowHasher):
+    """
+    Compares a stream of batches with the hashes of the stored rows.
+    changes() yields (row_id, row) for every row to write and (row_id, None)
+    for every stored row past the end of the new rows.
+    """
+
+    def __init__(self, previous_hashes):
+        super().__init__()
+        self.previous_hashes = previous_hashes
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+
+    def changes(self, batches):
+        previous = self.previous_hashes
+        for batch in batches:
+            for row in batch:
+                row_id = len(self.hashes)
+                digest = row_hash(row)
+                self.hashes.append(digest)
+                if row_id >= len(previous):
+                    self.inserted += 1
+                    yield row_id, row
+                elif previous[row_id] != digest:
+                    self.updated += 1
+                    yield row_id, row
+
+        for row_id in range(len(self.hashes), len(previous)):
+            self.deleted += 1
+            yield row_id, None
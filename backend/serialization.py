@@ -0,0 +1,216 @@
+"""
+Conversion of parsed sheet data to JSON serializable values.
+
+serialize_data walks records value by value. serialize_dataframe does the
+same conversion one column at a time with pandas/NumPy vector operations,
+which is much cheaper for wide sheets.
+
+encode_json turns response payloads into JSON bytes. It uses orjson when it
+is installed, which encodes datetimes and NumPy values natively, and the
+standard library encoder otherwise.
+
+Pages of rows can also be sent column-oriented, so that column names are not
+repeated in every row: as columnar JSON ({"columns": [...], "data": [[values
+of the first column], ...]}) or as an Apache Arrow IPC stream, which needs
+pyarrow.
+"""
+import json
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import (
+    is_bool_dtype,
+    is_datetime64_any_dtype,
+    is_float_dtype,
+    is_integer_dtype,
+    is_object_dtype,
+    is_timedelta64_dtype,
+)
+
+from storage import column_to_arrow, pa
+
+try:
+    import orjson
+except ImportError:  # Responses are then encoded with the json module
+    orjson = None
+
+# Integer and float column names restored by the column mapping become object keys
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+# Media types of the response formats GET /data can answer with
+JSON_MEDIA_TYPE = 'application/json'
+COLUMNAR_MEDIA_TYPE = 'application/vnd.excel-data.columnar+json'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+# infer_dtype results for object columns that only need NaN replaced
+_PLAIN_OBJECT_KINDS = {
+    'string', 'empty', 'bytes', 'boolean', 'integer', 'floating',
+    'mixed-integer-float', 'decimal',
+}
+
+
+def serialize_data(data):
+    """Convert data to JSON serializable format"""
+    if isinstance(data, list):
+        return [serialize_data(item) for item in data]
+    elif isinstance(data, dict):
+        return {key: serialize_data(value) for key, value in data.items()}
+    elif isinstance(data, (datetime, pd.Timestamp)):
+        return data.isoformat()
+    elif hasattr(data, 'timestamp'):  # Handle datetime objects
+        return data.isoformat() if hasattr(data, 'isoformat') else str(data)
+    elif pd.isna(data):  # Handle NaN values
+        return None
+    else:
+        return data
+
+
+def serialize_datetime_series(series):
+    """Format a datetime64 column as ISO strings, with None for NaT"""
+    missing = series.isna().to_numpy()
+
+    if series.dt.tz is not None:
+        # Offsets differ per value, let pandas format them
+        strings = np.array([None if pd.isna(value) else value.isoformat() for value in series], dtype=object)
+    else:
+        values = series.to_numpy().astype('datetime64[us]')
+
+        # Match datetime.isoformat(), which only prints microseconds when set
+        has_fraction = (series.dt.microsecond != 0).to_numpy()
+        strings = np.where(
+            has_fraction,
+            np.datetime_as_string(values, unit='us'),
+            np.datetime_as_string(values, unit='s'),
+        ).astype(object)
+
+    strings[missing] = None
+    return strings.tolist()
+
+
+def serialize_series(series):
+    """Convert one DataFrame column to a list of JSON serializable values"""
+    dtype = series.dtype
+
+    if is_datetime64_any_dtype(dtype):
+        return serialize_datetime_series(series)
+
+    if is_timedelta64_dtype(dtype):
+        strings = series.astype(str).to_numpy(dtype=object)
+        strings[series.isna().to_numpy()] = None
+        return strings.tolist()
+
+    if isinstance(dtype, np.dtype) and (is_integer_dtype(dtype) or is_bool_dtype(dtype)):
+        # NumPy integers and booleans hold no missing values and tolist() returns Python scalars.
+        # Nullable Int64/boolean columns return NumPy scalars from tolist() on pandas 1.x.
+        return series.tolist()
+
+    if is_float_dtype(dtype) or is_integer_dtype(dtype) or is_bool_dtype(dtype):
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    if is_object_dtype(dtype) and pd.api.types.infer_dtype(series, skipna=True) not in _PLAIN_OBJECT_KINDS:
+        # Mixed columns may hold datetime/date/time objects, convert them per value
+        return [
+            None if pd.isna(value)
+            else value.isoformat() if isinstance(value, (datetime, date, time))
+            else value
+            for value in series.tolist()
+        ]
+
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def serialize_dataframe(df):
+    """Convert a DataFrame to a list of JSON serializable records column by column"""
+    columns = list(df.columns)
+    values = [serialize_series(series) for _, series in df.items()]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _json_default(value):
+    """Encode the values orjson handles natively for the standard library encoder"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(payload):
+    """Encode a response payload as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Integers beyond 64 bits and other values orjson rejects
+            pass
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_json_default
+    ).encode("utf-8")
+
+
+def page_columns(rows, columns=()):
+    """Column names of rows, the given ones first, then any others in the order they appear"""
+    names = dict.fromkeys(columns)
+    for row in rows:
+        for name in row:
+            if name not in names:
+                names[name] = None
+    return list(names)
+
+
+def columnar_page(payload, columns=()):
+    """
+    Turn a GET /data payload's rows into one list of values per column, in the
+    order of columns. Values missing from a row become None.
+    """
+    rows = payload.get('data') or []
+    names = page_columns(rows, columns)
+    converted = {key: value for key, value in payload.items() if key != 'data'}
+    converted['columns'] = names
+    converted['data'] = [[row.get(name) for row in rows] for name in names]
+    return converted
+
+
+def encode_arrow(payload, columns=()):
+    """
+    Encode a GET /data payload as an Arrow IPC stream. Everything besides the
+    rows goes into the schema metadata, each value JSON encoded.
+    """
+    rows = payload.get('data') or []
+    arrays = []
+    fields = []
+    for name in page_columns(rows, columns):
+        array, metadata = column_to_arrow([row.get(name) for row in rows])
+        arrays.append(array)
+        # Arrow field names are strings, numeric column names are sent as text
+        fields.append(pa.field(str(name), array.type, metadata=metadata))
+    metadata = {key: encode_json(value) for key, value in payload.items() if key != 'data'}
+    table = pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def negotiate_format(accept):
+    """
+    Pick the response media type for an Accept header: the first type it lists
+    that can be produced, in listed order (q values are not weighed), JSON rows
+    when it lists none. None when it only asks for Arrow and pyarrow is not installed.
+    """
+    arrow_requested = False
+    for entry in (accept or '').split(','):
+        media_type = entry.split(';', 1)[0].strip().lower()
+        if media_type == COLUMNAR_MEDIA_TYPE:
+            return COLUMNAR_MEDIA_TYPE
+        if media_type == ARROW_MEDIA_TYPE:
+            if pa is not None:
+                return ARROW_MEDIA_TYPE
+            arrow_requested = True
+        elif media_type in (JSON_MEDIA_TYPE, 'application/*', '*/*'):
+            return JSON_MEDIA_TYPE
+    return None if arrow_requested else JSON_MEDIA_TYPE
@@ -0,0 +1,183 @@
+"""
+Registry of live upload sessions.
+
+The registry records when each session was created, when it expires and how
+many rows it holds, and hands expired sessions to the sweeper. The in-memory
+registry is per process. The SQLite registry keeps the same records in a
+shared file, so several uvicorn workers and restarts see one consistent set of
+sessions.
+"""
+import heapq
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+# Where sessions are tracked: "memory" or "sqlite"
+SESSION_REGISTRY = os.getenv('SESSION_REGISTRY', 'memory')
+
+# Database file for SESSION_REGISTRY=sqlite
+SESSION_REGISTRY_PATH = os.getenv('SESSION_REGISTRY_PATH', 'sessions.db')
+
+# Times are epoch seconds, content_hash is the upload key of the stored file
+SessionRecord = namedtuple(
+    'SessionRecord', ['session_id', 'created_at', 'expires_at', 'rows_count', 'content_hash'], defaults=[None]
+)
+
+
+class SessionRegistry:
+    """Interface for the record of live sessions"""
+
+    name = None
+
+    def add(self, record):
+        """Record a session, replacing any earlier record for it"""
+        raise NotImplementedError
+
+    def remove(self, session_id):
+        """Forget a session, doing nothing if it is unknown"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Forget every session"""
+        raise NotImplementedError
+
+    def list_active(self, now=None):
+        """Return the sessions that have not expired, oldest first"""
+        raise NotImplementedError
+
+    def pop_due(self, now=None, limit=None):
+        """Remove and return up to limit expired sessions, earliest expiry first"""
+        raise NotImplementedError
+
+
+class MemorySessionRegistry(SessionRegistry):
+    """Sessions in a dict with a min-heap of expiry times, removals are applied lazily"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._records = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self._records[record.session_id] = record
+            heapq.heappush(self._heap, (record.expires_at, record.session_id))
+
+    def remove(self, session_id):
+        with self._lock:
+            self._records.pop(session_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._records = {}
+            self._heap = []
+
+    def list_active(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            records = [record for record in self._records.values() if record.expires_at > now]
+        return sorted(records, key=lambda record: record.created_at)
+
+    def pop_due(self, now=None, limit=None):
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+                expires_at, session_id = heapq.heappop(self._heap)
+                record = self._records.get(session_id)
+                # Skip entries for removed or re-added sessions
+                if record is None or record.expires_at != expires_at:
+                    continue
+                del self._records[session_id]
+                due.append(record)
+        return due
+
+
+class SQLiteSessionRegistry(SessionRegistry):
+    """
+    Sessions in a SQLite table indexed by expiry time. Session ids and content
+    hashes are stored as raw bytes and times as floats to keep rows small. WAL
+    mode lets several worker processes read and write the same file.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=SESSION_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'session_id BLOB PRIMARY KEY, created_at REAL NOT NULL, '
+                'expires_at REAL NOT NULL, rows_count INTEGER NOT NULL, content_hash BLOB'
+                ') WITHOUT ROWID'
+            )
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(sessions)')]
+            if 'content_hash' not in columns:
+                # Files created before uploads were deduplicated
+                self._conn.execute('ALTER TABLE sessions ADD COLUMN content_hash BLOB')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)')
+
+    @staticmethod
+    def _record(row):
+        content_hash = row[4].hex() if row[4] is not None else None
+        return SessionRecord(str(uuid.UUID(bytes=row[0])), row[1], row[2], row[3], content_hash)
+
+    def add(self, record):
+        content_hash = bytes.fromhex(record.content_hash) if record.content_hash else None
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)',
+                (uuid.UUID(record.session_id).bytes, record.created_at, record.expires_at,
+                 record.rows_count or 0, content_hash),
+            )
+
+    def remove(self, session_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM sessions WHERE session_id = ?', (uuid.UUID(session_id).bytes,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM sessions')
+
+    def list_active(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM sessions WHERE expires_at > ? ORDER BY created_at', (now,)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def pop_due(self, now=None, limit=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            # Claim the rows in one write transaction so two workers never
+            # reclaim the same session
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT * FROM sessions WHERE expires_at <= ? ORDER BY expires_at LIMIT ?',
+                    (now, -1 if limit is None else limit),
+                ).fetchall()
+                self._conn.executemany('DELETE FROM sessions WHERE session_id = ?', [(row[0],) for row in rows])
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [self._record(row) for row in rows]
+
+
+def create_session_registry(registry=SESSION_REGISTRY):
+    """Build the session registry selected by SESSION_REGISTRY"""
+    if registry == 'memory':
+        return MemorySessionRegistry()
+    elif registry == 'sqlite':
+        return SQLiteSessionRegistry()
+    raise ValueError(f"Unknown SESSION_REGISTRY '{registry}', expected 'memory' or 'sqlite'")
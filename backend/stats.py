@@ -0,0 +1,92 @@
+"""
+Per-column summary statistics for the /stats endpoint.
+
+Statistics are computed once per upload from the column arrays collected for
+the dataset index, using vectorized pandas/NumPy operations, and stored with
+the dataset metadata so the dashboard never needs the full rows.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from indexes import TextColumn
+
+# Most common values reported per column
+STATS_TOP_K = int(os.getenv('STATS_TOP_K', '5'))
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _number(value):
+    """Convert a NumPy scalar to a JSON friendly int or float"""
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 6)
+
+
+def _date(nanoseconds):
+    # Values went through float64, so drop the noise below a microsecond
+    return pd.Timestamp(int(nanoseconds)).round('us').isoformat()
+
+
+def _top_values(values, counts, top_k):
+    order = np.argsort(-counts, kind='stable')[:top_k]
+    return [{"value": values[i], "count": int(counts[i])} for i in order if counts[i] > 0]
+
+
+def numeric_stats(column, top_k=STATS_TOP_K):
+    """Summaries for number, boolean and date columns"""
+    series = pd.Series(column.values).dropna()
+    stats = {"count": int(len(series)), "missing": int(len(column.values) - len(series))}
+    if series.empty:
+        return stats
+
+    counts = series.value_counts(sort=True)
+    stats["distinct"] = int(len(counts))
+
+    if column.kind == 'boolean':
+        stats["top"] = [{"value": bool(value), "count": int(count)} for value, count in counts.head(top_k).items()]
+        stats["mean"] = _number(series.mean())
+        return stats
+
+    convert = _date if column.kind == 'date' else _number
+    quantiles = series.quantile(QUANTILES)
+    stats.update({
+        "mean": convert(series.mean()),
+        "min": convert(series.min()),
+        "max": convert(series.max()),
+        "quantiles": {f"{int(q * 100)}%": convert(value) for q, value in quantiles.items()},
+        "top": [{"value": convert(value), "count": int(count)} for value, count in counts.head(top_k).items()],
+    })
+    if column.kind == 'number':
+        stats["std"] = _number(series.std()) if len(series) > 1 else 0
+    return stats
+
+
+def text_stats(column, top_k=STATS_TOP_K):
+    """Summaries for text columns, counted on the dictionary codes"""
+    present = column.codes[column.codes >= 0]
+    counts = np.bincount(present, minlength=len(column.categories))
+    return {
+        "count": int(len(present)),
+        "missing": int(len(column.codes) - len(present)),
+        "distinct": int(np.count_nonzero(counts)),
+        "top": _top_values(column.categories, counts, top_k),
+    }
+
+
+def compute_dataset_stats(index, column_mapping=None, top_k=STATS_TOP_K):
+    """Summaries for every column of an indexed dataset, keyed by original column name"""
+    column_mapping = column_mapping or {}
+    columns = []
+    for name, column in index.columns.items():
+        stats = text_stats(column, top_k) if isinstance(column, TextColumn) else numeric_stats(column, top_k)
+        columns.append({"name": column_mapping.get(name, name), "type": column.kind, **stats})
+
+    return {
+        "rows_count": index.rows_count,
+        "columns_count": len(columns),
+        "numeric_columns": sum(1 for column in columns if column["type"] == 'number'),
+        "categorical_columns": sum(1 for column in columns if column["type"] != 'number'),
+        "columns": columns,
+    }
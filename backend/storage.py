@@ -0,0 +1,706 @@
+"""
+Storage backends for parsed sheets.
+
+FirebaseBackend keeps rows in the Realtime Database. Large datasets are split
+into fixed-size shards of rows that are written with multi-path update()
+calls, so no single request carries the whole sheet. Shards are written by a
+small thread pool and retried individually. Re-uploads into an existing
+session only send the rows that changed.
+
+ParquetBackend keeps rows as columnar Parquet files on local disk, so column
+names are stored once and values keep their types. Firebase then only holds
+the dataset metadata. Re-uploads only rewrite the part files holding changed
+rows.
+
+Each backend also keeps the row hashes that re-uploads are compared with,
+apart from the dataset metadata: under sessions/{session_id}/row_hashes/ in
+Firebase, or in a sidecar file next to the Parquet parts.
+
+Every upload is its own session and every sheet of it its own dataset: rows
+live under sessions/{session_id}/sheets/{sheet}/ in either store, so
+concurrent uploads never overwrite each other.
+"""
+import bisect
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import STORAGE_ERRORS, observe_storage_call, timed_storage
+from rowdiff import ROW_HASH_SIZE, pack_row_hashes, unpack_row_hashes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for STORAGE_BACKEND=parquet
+    pa = None
+    pq = None
+
+# Where parsed rows are kept: "firebase" or "parquet"
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firebase')
+
+# Directory holding Parquet datasets
+PARQUET_DATA_DIR = os.getenv('PARQUET_DATA_DIR', 'data')
+
+# Rows per Parquet file and per row group inside it
+PARQUET_PART_ROWS = int(os.getenv('PARQUET_PART_ROWS', '50000'))
+PARQUET_ROW_GROUP_SIZE = int(os.getenv('PARQUET_ROW_GROUP_SIZE', '1000'))
+
+# Rows per multi-path update request
+FIREBASE_SHARD_SIZE = int(os.getenv('FIREBASE_SHARD_SIZE', '500'))
+
+# Shard writes in flight at the same time
+FIREBASE_WRITE_CONCURRENCY = int(os.getenv('FIREBASE_WRITE_CONCURRENCY', '4'))
+
+# Range reads in flight at the same time when fetching scattered rows
+FIREBASE_READ_CONCURRENCY = int(os.getenv('FIREBASE_READ_CONCURRENCY', '8'))
+
+# Attempts per shard before the upload is failed
+FIREBASE_WRITE_RETRIES = int(os.getenv('FIREBASE_WRITE_RETRIES', '3'))
+
+# Base delay in seconds between attempts, doubled after every failure
+FIREBASE_RETRY_BACKOFF = float(os.getenv('FIREBASE_RETRY_BACKOFF', '0.5'))
+
+
+class ShardWriteError(Exception):
+    """Raised when a shard could not be written after all retries"""
+
+    def __init__(self, start, rows_count, error):
+        super().__init__(f"Failed to write rows {start}-{start + rows_count - 1}: {error}")
+        self.start = start
+        self.rows_count = rows_count
+        self.error = error
+
+
+def iter_shards(batches, shard_size=FIREBASE_SHARD_SIZE):
+    """Regroup batches of rows into (start_index, rows) shards of shard_size rows"""
+    start = 0
+    shard = []
+    for batch in batches:
+        for row in batch:
+            shard.append(row)
+            if len(shard) >= shard_size:
+                yield start, shard
+                start += len(shard)
+                shard = []
+
+    if shard:
+        yield start, shard
+
+
+def write_shard(ref, path, start, rows, retries=FIREBASE_WRITE_RETRIES,
+                backoff=FIREBASE_RETRY_BACKOFF):
+    """Write one shard of rows below path with a single multi-path update"""
+    update = {f"{path}/{start + offset}": row for offset, row in enumerate(rows)}
+
+    for attempt in range(retries):
+        start_time = time.perf_counter()
+        try:
+            ref.update(update)
+            observe_storage_call('firebase', 'write_shard', time.perf_counter() - start_time, len(rows))
+            return len(rows)
+        except Exception as e:
+            STORAGE_ERRORS.inc(1, 'firebase', 'write_shard')
+            if attempt == retries - 1:
+                raise ShardWriteError(start, len(rows), e) from e
+            time.sleep(backoff * (2 ** attempt))
+
+
+def write_sharded(ref, path, batches, shard_size=FIREBASE_SHARD_SIZE,
+                  concurrency=FIREBASE_WRITE_CONCURRENCY, retries=FIREBASE_WRITE_RETRIES, progress=None):
+    """
+    Write rows from an iterable of batches below path as numbered children.
+
+    At most concurrency shards are written at once and at most twice that many
+    are held in memory, so the producer is throttled to the write rate.
+    progress(rows) is called after each shard is written. Returns the number
+    of rows written.
+    """
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+    errors = []
+    futures = []
+
+    def release(future):
+        in_flight.release()
+        if future.exception() is not None:
+            errors.append(future.exception())
+        elif progress is not None:
+            progress(future.result())
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='shard-writer') as executor:
+        for start, rows in iter_shards(batches, shard_size):
+            # Stop producing shards as soon as one has failed for good
+            if errors:
+                break
+            in_flight.acquire()
+            future = executor.submit(write_shard, ref, path, start, rows, retries)
+            future.add_done_callback(release)
+            futures.append(future)
+
+    if errors:
+        raise errors[0]
+
+    return sum(future.result() for future in futures)
+
+
+def update_sharded(ref, path, changes, shard_size=FIREBASE_SHARD_SIZE, retries=FIREBASE_WRITE_RETRIES,
+                   backoff=FIREBASE_RETRY_BACKOFF, progress=None):
+    """
+    Apply (row_id, row) changes below path, a row of None deleting it, in
+    multi-path updates of up to shard_size rows. progress(rows) is called after
+    each update. Returns the number of rows changed.
+    """
+    changed = 0
+    update = {}
+
+    def flush():
+        first = min(int(key.rsplit('/', 1)[1]) for key in update)
+        for attempt in range(retries):
+            start_time = time.perf_counter()
+            try:
+                ref.update(update)
+                observe_storage_call('firebase', 'update_shard', time.perf_counter() - start_time, len(update))
+                if progress is not None:
+                    progress(len(update))
+                return
+            except Exception as e:
+                STORAGE_ERRORS.inc(1, 'firebase', 'update_shard')
+                if attempt == retries - 1:
+                    raise ShardWriteError(first, len(update), e) from e
+                time.sleep(backoff * (2 ** attempt))
+
+    for row_id, row in changes:
+        update[f"{path}/{row_id}"] = row
+        changed += 1
+        if len(update) >= shard_size:
+            flush()
+            update = {}
+
+    if update:
+        flush()
+    return changed
+
+
+class StorageBackend:
+    """Interface for the place the rows of one session's dataset are kept"""
+
+    name = None
+
+    @timed_storage('write_dataset')
+    def write_dataset(self, batches, columns, progress=None):
+        """
+        Replace the dataset with rows from an iterable of batches, return the
+        row count. progress(rows) is called as rows are written.
+        """
+        raise NotImplementedError
+
+    @timed_storage('update_rows')
+    def update_rows(self, changes, columns, progress=None):
+        """
+        Apply (row_id, row) changes to the dataset, a row of None deleting it,
+        return the number of rows changed. Rows are only appended or deleted at
+        the end, so ids stay contiguous. This default rewrites the dataset.
+        """
+        return self._rewrite(changes, columns, progress)
+
+    def _rewrite(self, changes, columns, progress=None):
+        rows = self.read_all() or []
+        changed = 0
+        for row_id, row in changes:
+            changed += 1
+            if row_id < len(rows):
+                rows[row_id] = row
+            else:
+                rows.append(row)
+        self.write_dataset([[row for row in rows if row is not None]], columns)
+        if progress is not None:
+            progress(changed)
+        return changed
+
+    @timed_storage('read_rows')
+    def read_rows(self, offset, limit):
+        """Return up to limit rows starting at row offset"""
+        raise NotImplementedError
+
+    @timed_storage('read_all')
+    def read_all(self):
+        """Return every row, or None when there is no dataset"""
+        raise NotImplementedError
+
+    @timed_storage('read_row')
+    def read_row(self, row_id):
+        """Return a single row, or None when it does not exist"""
+        raise NotImplementedError
+
+    def iter_batches(self, batch_size):
+        """Yield every row in order in lists of up to batch_size, reading one list at a time"""
+        offset = 0
+        while True:
+            rows = self.read_rows(offset, batch_size)
+            if not rows:
+                return
+            yield rows
+            # Step by row ids, a range may be short of a missing row
+            offset += batch_size
+
+    @timed_storage('read_rows_by_ids')
+    def read_rows_by_ids(self, row_ids):
+        """Return the rows with the given ids in the given order, skipping missing ones"""
+        rows = {}
+        for start, length in contiguous_runs(row_ids):
+            rows.update(zip(range(start, start + length), self.read_rows(start, length)))
+        return [rows[row_id] for row_id in row_ids if row_id in rows]
+
+    @timed_storage('clear')
+    def clear(self):
+        """Delete the dataset and its row hashes"""
+        raise NotImplementedError
+
+    @timed_storage('write_row_hashes')
+    def write_row_hashes(self, hashes):
+        """Store the hash of every row, replacing the previous ones"""
+        raise NotImplementedError
+
+    @timed_storage('read_row_hashes')
+    def read_row_hashes(self):
+        """Return the stored row hashes, or None when there are none"""
+        raise NotImplementedError
+
+    @timed_storage('delete_row_hashes')
+    def delete_row_hashes(self):
+        """Forget the row hashes, the next re-upload then rewrites every row"""
+        raise NotImplementedError
+
+
+class FirebaseBackend(StorageBackend):
+    """Rows stored as numbered children of a Realtime Database node"""
+
+    name = 'firebase'
+
+    def __init__(self, ref, path='excel_data', hashes_path='row_hashes'):
+        self.ref = ref
+        self.path = path
+        self.hashes_path = hashes_path
+
+    @timed_storage('write_dataset')
+    def write_dataset(self, batches, columns, progress=None):
+        self.ref.child(self.path).delete()
+        return write_sharded(self.ref, self.path, batches, progress=progress)
+
+    @timed_storage('update_rows')
+    def update_rows(self, changes, columns, progress=None):
+        # Only the changed rows are sent, a shard at a time
+        return update_sharded(self.ref, self.path, changes, progress=progress)
+
+    @timed_storage('read_rows')
+    def read_rows(self, offset, limit):
+        page = self._read_range(offset, limit)
+        return [page[row_id] for row_id in sorted(page)]
+
+    def _read_range(self, offset, limit):
+        """Return the stored rows with ids from offset to offset + limit by row id"""
+        # Integer keys are ordered numerically. Past a missing row the query reaches
+        # beyond the requested ids, those rows belong to the next range
+        page = self.ref.child(self.path).order_by_key().start_at(str(offset)).limit_to_first(limit).get()
+        # Results keyed like an array come back as a list indexed by key, None where a key is missing
+        items = enumerate(page) if isinstance(page, list) else (page or {}).items()
+        rows = {}
+        for key, row in items:
+            row_id = int(key)
+            if row is not None and offset <= row_id < offset + limit:
+                rows[row_id] = row
+        return rows
+
+    @timed_storage('read_all')
+    def read_all(self):
+        data = self.ref.child(self.path).get()
+        if isinstance(data, dict):
+            # Sparse keys come back as a dict instead of a list, missing rows stay None
+            rows = [None] * (max(map(int, data)) + 1 if data else 0)
+            for key, row in data.items():
+                rows[int(key)] = row
+            return rows
+        return data
+
+    @timed_storage('read_row')
+    def read_row(self, row_id):
+        return self.ref.child(f'{self.path}/{row_id}').get()
+
+    @timed_storage('read_rows_by_ids')
+    def read_rows_by_ids(self, row_ids):
+        # Fetch runs of consecutive rows as range queries, several at a time
+        runs = contiguous_runs(row_ids)
+        rows = {}
+        with ThreadPoolExecutor(max_workers=FIREBASE_READ_CONCURRENCY, thread_name_prefix='row-reader') as executor:
+            for run_rows in executor.map(lambda run: self._read_range(*run), runs):
+                rows.update(run_rows)
+        return [rows[row_id] for row_id in row_ids if row_id in rows]
+
+    @timed_storage('clear')
+    def clear(self):
+        self.ref.update({self.path: None, self.hashes_path: None})
+
+    @timed_storage('write_row_hashes')
+    def write_row_hashes(self, hashes):
+        self.ref.child(self.hashes_path).set(pack_row_hashes(hashes))
+
+    @timed_storage('read_row_hashes')
+    def read_row_hashes(self):
+        chunks = self.ref.child(self.hashes_path).get()
+        return None if chunks is None else unpack_row_hashes(chunks)
+
+    @timed_storage('delete_row_hashes')
+    def delete_row_hashes(self):
+        self.ref.child(self.hashes_path).delete()
+
+
+def contiguous_runs(row_ids):
+    """Group row ids into sorted (start, length) runs of consecutive ids"""
+    runs = []
+    for row_id in sorted(set(row_ids)):
+        if runs and runs[-1][0] + runs[-1][1] == row_id:
+            runs[-1][1] += 1
+        else:
+            runs.append([row_id, 1])
+    return [tuple(run) for run in runs]
+
+
+def column_to_arrow(values):
+    """
+    Build an Arrow array for one column. Columns mixing incompatible types are
+    stored as JSON text and flagged in the field metadata so reads restore them.
+    """
+    try:
+        return pa.array(values), None
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        encoded = [None if value is None else json.dumps(value) for value in values]
+        return pa.array(encoded, type=pa.string()), {b'encoding': b'json'}
+
+
+def table_from_rows(rows, columns):
+    """Build an Arrow table from row dictionaries, one column at a time"""
+    arrays = []
+    fields = []
+    for column in columns:
+        array, metadata = column_to_arrow([row.get(column) for row in rows])
+        arrays.append(array)
+        fields.append(pa.field(column, array.type, metadata=metadata))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def rows_from_table(table):
+    """Convert an Arrow table back to row dictionaries, leaving out null values"""
+    json_columns = [
+        field.name for field in table.schema
+        if field.metadata and field.metadata.get(b'encoding') == b'json'
+    ]
+
+    rows = []
+    for row in table.to_pylist():
+        for column in json_columns:
+            if row[column] is not None:
+                row[column] = json.loads(row[column])
+        rows.append({column: value for column, value in row.items() if value is not None})
+    return rows
+
+
+class ParquetBackend(StorageBackend):
+    """
+    Rows stored as Parquet part files in a local directory with a manifest.
+
+    A dataset is written to a fresh directory and swapped in when complete, so
+    readers never see a half-written dataset. Row hashes are kept in a sidecar
+    file in the same directory, a new version of the dataset drops them.
+    """
+
+    name = 'parquet'
+    hashes_file = 'row_hashes.bin'
+
+    def __init__(self, data_dir=PARQUET_DATA_DIR, part_rows=PARQUET_PART_ROWS,
+                 row_group_size=PARQUET_ROW_GROUP_SIZE, root='current'):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for STORAGE_BACKEND=parquet")
+        self.data_dir = data_dir
+        self.part_rows = part_rows
+        self.row_group_size = row_group_size
+        self.root = os.path.join(data_dir, root)
+
+    def _manifest(self):
+        try:
+            with open(os.path.join(self.root, 'manifest.json')) as manifest_file:
+                return json.load(manifest_file)
+        except FileNotFoundError:
+            return None
+
+    @timed_storage('write_dataset')
+    def write_dataset(self, batches, columns, progress=None):
+        os.makedirs(self.data_dir, exist_ok=True)
+        staging = os.path.join(self.data_dir, f'.staging-{uuid.uuid4().hex}')
+        os.makedirs(staging)
+
+        try:
+            parts = []
+            for start, rows in iter_shards(batches, self.part_rows):
+                file_name = f'part-{len(parts):05d}.parquet'
+                pq.write_table(
+                    table_from_rows(rows, columns),
+                    os.path.join(staging, file_name),
+                    row_group_size=self.row_group_size,
+                )
+                parts.append({'file': file_name, 'start': start, 'rows': len(rows)})
+                if progress is not None:
+                    progress(len(rows))
+
+            rows_count = sum(part['rows'] for part in parts)
+            with open(os.path.join(staging, 'manifest.json'), 'w') as manifest_file:
+                json.dump({
+                    'columns': list(columns),
+                    'rows_count': rows_count,
+                    'row_group_size': self.row_group_size,
+                    'parts': parts,
+                }, manifest_file)
+
+            self._swap_in(staging)
+            return rows_count
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @timed_storage('update_rows')
+    def update_rows(self, changes, columns, progress=None):
+        """
+        Rewrite only the part files holding changed or deleted rows and add
+        parts for appended rows. Unchanged parts are hard-linked into the new
+        version, which is swapped in like a full write.
+        """
+        manifest = self._manifest()
+        if not manifest:
+            return self._rewrite(changes, columns, progress)
+
+        parts = [dict(part) for part in manifest['parts']]
+        starts = [part['start'] for part in parts]
+        rows_count = manifest['rows_count']
+        row_group_size = manifest['row_group_size']
+        os.makedirs(self.data_dir, exist_ok=True)
+        staging = os.path.join(self.data_dir, f'.staging-{uuid.uuid4().hex}')
+        os.makedirs(staging)
+
+        # The part being changed, or the rows appended after the last part
+        current = None
+        current_rows = []
+        pending = 0
+        rewritten = set()
+
+        def flush():
+            nonlocal current, current_rows, pending
+            if current is None and current_rows:
+                start = parts[-1]['start'] + parts[-1]['rows'] if parts else 0
+                parts.append({'file': f'part-{len(parts):05d}.parquet', 'start': start, 'rows': 0})
+                current = len(parts) - 1
+            if current is not None and current_rows:
+                pq.write_table(table_from_rows(current_rows, columns), os.path.join(staging, parts[current]['file']),
+                               row_group_size=row_group_size)
+                rewritten.add(current)
+            if current is not None:
+                parts[current]['rows'] = len(current_rows)
+            if progress is not None and pending:
+                progress(pending)
+            current, current_rows, pending = None, [], 0
+
+        try:
+            changed = 0
+            truncated = False
+            for row_id, row in changes:
+                changed += 1
+                if truncated:
+                    # Rows after the first deleted one are already cut off
+                    pending += 1
+                    continue
+
+                if row_id >= rows_count:
+                    # Appended rows follow every change to existing rows
+                    if current is not None or len(current_rows) >= self.part_rows:
+                        flush()
+                    current_rows.append(row)
+                    pending += 1
+                    continue
+
+                index = bisect.bisect_right(starts, row_id) - 1
+                if index != current:
+                    flush()
+                    current = index
+                    current_rows = rows_from_table(pq.read_table(os.path.join(self.root, parts[index]['file'])))
+                pending += 1
+                offset = row_id - parts[index]['start']
+                if row is None:
+                    # Deletions only cut rows off the end: drop this one, the rest of its part and later parts
+                    del current_rows[offset:]
+                    del parts[index + 1:]
+                    truncated = True
+                else:
+                    current_rows[offset] = row
+            flush()
+
+            # Parts left empty by deletions are dropped, unchanged ones are linked
+            kept = []
+            for index, part in enumerate(parts):
+                if not part['rows']:
+                    continue
+                if index not in rewritten:
+                    link_or_copy(os.path.join(self.root, part['file']), os.path.join(staging, part['file']))
+                part['start'] = kept[-1]['start'] + kept[-1]['rows'] if kept else 0
+                kept.append(part)
+
+            with open(os.path.join(staging, 'manifest.json'), 'w') as manifest_file:
+                json.dump({
+                    'columns': list(columns),
+                    'rows_count': sum(part['rows'] for part in kept),
+                    'row_group_size': row_group_size,
+                    'parts': kept,
+                }, manifest_file)
+
+            self._swap_in(staging)
+            return changed
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def _swap_in(self, staging):
+        retired = None
+        if os.path.exists(self.root):
+            retired = os.path.join(self.data_dir, f'.retired-{uuid.uuid4().hex}')
+            os.rename(self.root, retired)
+        os.makedirs(os.path.dirname(self.root), exist_ok=True)
+        os.rename(staging, self.root)
+        if retired:
+            shutil.rmtree(retired, ignore_errors=True)
+
+    def _read_part(self, part, row_group_size, first, last):
+        """Read rows first..last (inclusive, relative to the part) of one part file"""
+        parquet_file = pq.ParquetFile(os.path.join(self.root, part['file']))
+        groups = list(range(first // row_group_size, last // row_group_size + 1))
+        table = parquet_file.read_row_groups(groups)
+        skip = first - groups[0] * row_group_size
+        return rows_from_table(table.slice(skip, last - first + 1))
+
+    @timed_storage('read_rows')
+    def read_rows(self, offset, limit):
+        manifest = self._manifest()
+        if not manifest:
+            return []
+
+        rows = []
+        end = offset + limit
+        for part in manifest['parts']:
+            part_end = part['start'] + part['rows']
+            if part_end <= offset or part['start'] >= end:
+                continue
+            first = max(offset, part['start']) - part['start']
+            last = min(end, part_end) - part['start'] - 1
+            rows.extend(self._read_part(part, manifest['row_group_size'], first, last))
+        return rows
+
+    @timed_storage('read_all')
+    def read_all(self):
+        manifest = self._manifest()
+        if not manifest:
+            return None
+
+        rows = []
+        for part in manifest['parts']:
+            rows.extend(rows_from_table(pq.read_table(os.path.join(self.root, part['file']))))
+        return rows
+
+    @timed_storage('read_row')
+    def read_row(self, row_id):
+        rows = self.read_rows(row_id, 1)
+        return rows[0] if rows else None
+
+    def iter_batches(self, batch_size):
+        manifest = self._manifest()
+        if not manifest:
+            return
+
+        for part in manifest['parts']:
+            parquet_file = pq.ParquetFile(os.path.join(self.root, part['file']))
+            for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+                yield rows_from_table(pa.Table.from_batches([record_batch]))
+
+    @timed_storage('read_rows_by_ids')
+    def read_rows_by_ids(self, row_ids):
+        manifest = self._manifest()
+        if not manifest:
+            return []
+
+        # Read every needed row group once
+        row_group_size = manifest['row_group_size']
+        wanted = {}
+        for row_id in set(row_ids):
+            for part in manifest['parts']:
+                if part['start'] <= row_id < part['start'] + part['rows']:
+                    group = (row_id - part['start']) // row_group_size
+                    wanted.setdefault((part['file'], part['start'], group), []).append(row_id)
+                    break
+
+        rows = {}
+        for (file_name, part_start, group), group_row_ids in wanted.items():
+            group_rows = rows_from_table(pq.ParquetFile(os.path.join(self.root, file_name)).read_row_group(group))
+            group_start = part_start + group * row_group_size
+            for row_id in group_row_ids:
+                rows[row_id] = group_rows[row_id - group_start]
+        return [rows[row_id] for row_id in row_ids if row_id in rows]
+
+    @timed_storage('clear')
+    def clear(self):
+        if os.path.exists(self.root):
+            retired = os.path.join(self.data_dir, f'.retired-{uuid.uuid4().hex}')
+            os.rename(self.root, retired)
+            shutil.rmtree(retired, ignore_errors=True)
+
+    @timed_storage('write_row_hashes')
+    def write_row_hashes(self, hashes):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, self.hashes_file)
+        temporary = f'{path}.{uuid.uuid4().hex}'
+        with open(temporary, 'wb') as hashes_file:
+            hashes_file.write(b''.join(hashes))
+        os.replace(temporary, path)
+
+    @timed_storage('read_row_hashes')
+    def read_row_hashes(self):
+        try:
+            with open(os.path.join(self.root, self.hashes_file), 'rb') as hashes_file:
+                data = hashes_file.read()
+        except FileNotFoundError:
+            return None
+        return [data[start:start + ROW_HASH_SIZE] for start in range(0, len(data), ROW_HASH_SIZE)]
+
+    @timed_storage('delete_row_hashes')
+    def delete_row_hashes(self):
+        try:
+            os.remove(os.path.join(self.root, self.hashes_file))
+        except FileNotFoundError:
+            pass
+
+
+def link_or_copy(source, destination):
+    """Hard-link an unchanged file into a new dataset version, copying it where links are not supported"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def create_storage_backend(ref, path, hashes_path=None, backend=STORAGE_BACKEND):
+    """
+    Build the storage backend selected by STORAGE_BACKEND for the dataset at
+    path. With Firebase its row hashes go to hashes_path, by default path/row_hashes.
+    """
+    if backend == 'firebase':
+        return FirebaseBackend(ref, f'{path}/excel_data', hashes_path or f'{path}/row_hashes')
+    elif backend == 'parquet':
+        return ParquetBackend(root=os.path.join(*path.split('/')))
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected 'firebase' or 'parquet'")
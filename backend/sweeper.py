@@ -0,0 +1,118 @@
+"""
+Background expiry of upload sessions.
+
+The session registry orders sessions by expiry time. A background task wakes
+up periodically, pops only the sessions that are due and hands them to a
+reclaim callback in batches, so read endpoints never pay for housekeeping and
+a sweep never scans live sessions.
+"""
+import asyncio
+import os
+import threading
+import time
+
+from metrics import SWEEP_ERRORS, SWEEP_ROWS, SWEEP_SECONDS, SWEEP_SESSIONS
+
+# Seconds an upload is kept before it is deleted
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', str(24 * 60 * 60)))
+
+# Seconds between sweeps
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', '60'))
+
+# Sessions deleted per reclaim call, one multi-path update each
+SESSION_SWEEP_BATCH_SIZE = int(os.getenv('SESSION_SWEEP_BATCH_SIZE', '100'))
+
+
+class ExpirySweeper:
+    """
+    Reclaims expired sessions of a SessionRegistry. reclaim(records) deletes
+    a batch of sessions and is called from a worker thread.
+    """
+
+    def __init__(self, registry, reclaim, interval=SESSION_SWEEP_INTERVAL, batch_size=SESSION_SWEEP_BATCH_SIZE):
+        self.registry = registry
+        self.reclaim = reclaim
+        self.interval = interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._task = None
+        self.sweeps = 0
+        self.sweep_seconds_total = 0.0
+        self.last_sweep_seconds = 0.0
+        self.sessions_reclaimed = 0
+        self.rows_reclaimed = 0
+        self.errors = 0
+        self.last_error = None
+
+    def sweep(self, now=None):
+        """Reclaim every expired session in batches, return how many were deleted"""
+        started = time.perf_counter()
+        reclaimed = 0
+        try:
+            while True:
+                batch = self.registry.pop_due(now, self.batch_size)
+                if not batch:
+                    break
+                try:
+                    self.reclaim(batch)
+                except Exception as e:
+                    # Keep the batch so the next sweep retries it
+                    retry_at = time.time() + self.interval
+                    for record in batch:
+                        self.registry.add(record._replace(expires_at=retry_at))
+                    with self._lock:
+                        self.errors += 1
+                        self.last_error = str(e)
+                    SWEEP_ERRORS.inc()
+                    break
+
+                rows = sum(record.rows_count or 0 for record in batch)
+                reclaimed += len(batch)
+                with self._lock:
+                    self.sessions_reclaimed += len(batch)
+                    self.rows_reclaimed += rows
+                SWEEP_SESSIONS.inc(len(batch))
+                SWEEP_ROWS.inc(rows)
+        finally:
+            elapsed = time.perf_counter() - started
+            SWEEP_SECONDS.observe(elapsed)
+            with self._lock:
+                self.sweeps += 1
+                self.last_sweep_seconds = elapsed
+                self.sweep_seconds_total += elapsed
+        return reclaimed
+
+    async def _run(self, pool):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await pool.run(self.sweep)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error sweeping expired sessions: {str(e)}")
+
+    def start(self, pool):
+        """Start sweeping on pool from the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(pool))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        """Return sweep counters for status endpoints"""
+        with self._lock:
+            return {
+                "registry": self.registry.name,
+                "interval_seconds": self.interval,
+                "sweeps": self.sweeps,
+                "last_sweep_seconds": self.last_sweep_seconds,
+                "sweep_seconds_total": self.sweep_seconds_total,
+                "sessions_reclaimed": self.sessions_reclaimed,
+                "rows_reclaimed": self.rows_reclaimed,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
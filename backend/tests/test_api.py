@@ -0,0 +1,394 @@
+import asyncio
+import io
+import json
+import os
+import re
+import signal
+import threading
+import time
+import uuid
+
+import pytest
+from openpyxl import Workbook
+
+# main.py connects to Firebase on import, use the in-memory fake instead
+os.environ['FIREBASE_FAKE'] = '1'
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+import serialization  # noqa: E402
+from executors import WorkerPool, parse_pool  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def workbook(sheets=1, rows=20):
+    """A workbook with unique content, so uploads are never deduplicated"""
+    book = Workbook()
+    book.remove(book.active)
+    for position in range(sheets):
+        sheet = book.create_sheet(f'Sheet {position}')
+        sheet.append(['id', 'token'])
+        for row in range(rows):
+            sheet.append([row, uuid.uuid4().hex])
+    buffer = io.BytesIO()
+    book.save(buffer)
+    return buffer.getvalue()
+
+
+def test_upload_then_read_pages_and_rows(client):
+    response = client.post('/upload-excel', files={'file': ('book.xlsx', workbook(rows=25))})
+    assert response.status_code == 200
+    assert response.json()['rows_processed'] == 25
+    session_id = response.json()['session_id']
+
+    page = client.get('/data', params={'session_id': session_id, 'offset': 20, 'limit': 10}).json()
+    assert page['total'] == 25
+    assert [row['id'] for row in page['data']] == [20, 21, 22, 23, 24]
+
+    row = client.get('/data/7', params={'session_id': session_id})
+    assert row.status_code == 200
+    assert row.json()['data']['id'] == 7
+    assert client.get('/data/25', params={'session_id': session_id}).status_code == 404
+
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+
+def scrape(client):
+    """Parse GET /metrics, checking every line against the text exposition format"""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+
+    types = {}
+    samples = {}
+    for line in response.text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert kind in ('counter', 'gauge', 'histogram')
+            types[name] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in types else name
+        assert family in types, line
+        samples[name + (labels or '')] = float(value)
+    return samples
+
+
+def test_metrics_count_each_upload_stage_once(client):
+    stages = ('save_upload', 'dedup_lookup', 'list_sheets', 'parse', 'index_and_hash', 'write_rows',
+              'compute_stats', 'write_metadata', 'write_row_hashes', 'publish')
+    before = scrape(client)
+    response = client.post('/upload-excel', files={'file': ('book.xlsx', workbook(rows=30))})
+    assert response.status_code == 200
+    after = scrape(client)
+
+    def delta(name, stage):
+        key = f'{name}{{stage="{stage}"}}'
+        return after.get(key, 0) - before.get(key, 0)
+
+    for stage in stages:
+        assert delta('pipeline_stage_duration_seconds_count', stage) == 1, stage
+    for stage in ('parse', 'index_and_hash', 'write_rows', 'compute_stats'):
+        assert delta('pipeline_stage_rows_total', stage) == 30, stage
+    assert delta('pipeline_stage_bytes_total', 'save_upload') > 0
+    assert after['http_request_duration_seconds_count{method="POST",route="/upload-excel",status="200"}'] >= 1
+
+
+@pytest.fixture(scope='module')
+def small_session(client):
+    response = client.post('/upload-excel', files={'file': ('book.xlsx', workbook(rows=5))})
+    return response.json()['session_id']
+
+
+def get_page(client, session_id, accept=None):
+    headers = {'Accept': accept} if accept else {}
+    return client.get('/data', params={'session_id': session_id, 'offset': 1, 'limit': 2}, headers=headers)
+
+
+@pytest.mark.parametrize('accept', [None, 'application/json', '*/*', 'text/html, application/*;q=0.5'])
+def test_data_defaults_to_json_rows(client, small_session, accept):
+    response = get_page(client, small_session, accept)
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/json')
+    # CORSMiddleware may add Origin to the same header
+    assert 'Accept' in [value.strip() for value in response.headers['vary'].split(',')]
+    assert [row['id'] for row in response.json()['data']] == [1, 2]
+
+
+def test_data_as_columnar_json(client, small_session):
+    response = get_page(client, small_session, serialization.COLUMNAR_MEDIA_TYPE)
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith(serialization.COLUMNAR_MEDIA_TYPE)
+    page = response.json()
+    assert page['columns'] == ['id', 'token']
+    assert page['data'][0] == [1, 2]
+    assert (page['total'], page['offset'], page['limit']) == (5, 1, 2)
+
+
+@pytest.mark.skipif(serialization.pa is None, reason="pyarrow is not installed")
+def test_data_as_arrow_stream(client, small_session):
+    response = get_page(client, small_session, serialization.ARROW_MEDIA_TYPE)
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith(serialization.ARROW_MEDIA_TYPE)
+    table = serialization.pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ['id', 'token']
+    assert table.column('id').to_pylist() == [1, 2]
+    assert table.schema.metadata[b'total'] == b'5'
+
+
+def test_arrow_without_pyarrow(client, small_session, monkeypatch):
+    monkeypatch.setattr(serialization, 'pa', None)
+
+    assert get_page(client, small_session, serialization.ARROW_MEDIA_TYPE).status_code == 406
+    fallback = get_page(client, small_session, f'{serialization.ARROW_MEDIA_TYPE}, application/json')
+    assert fallback.status_code == 200
+    assert fallback.headers['content-type'].startswith('application/json')
+
+
+def wait_for_job(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{job_id}').json()
+        if job['status'] in ('succeeded', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_job_session_is_readable_after_a_read_during_the_job(client):
+    body = 'id,name\n' + ''.join(f'{row},name {row}\n' for row in range(2000))
+    response = client.post('/upload-excel', params={'job': 'true'}, files={'file': ('rows.csv', body)})
+    assert response.status_code == 202
+    session_id = response.json()['session_id']
+
+    # Not published yet, this read must not be remembered once the job is done
+    client.get('/data', params={'session_id': session_id, 'limit': 1})
+    assert wait_for_job(client, response.json()['job_id'])['status'] == 'succeeded'
+
+    page = client.get('/data', params={'session_id': session_id, 'limit': 1})
+    assert page.status_code == 200
+    assert page.json()['total'] == 2000
+    assert client.get('/stats', params={'session_id': session_id}).status_code == 200
+
+
+@pytest.mark.skipif(not parse_pool.processes, reason='sheets are parsed in-thread')
+def test_uploads_recover_after_a_parsing_process_dies(client):
+    assert client.post('/upload-excel', files={'file': ('book.xlsx', workbook(sheets=3))}).status_code == 200
+
+    for pid in list(parse_pool.executor._processes):
+        os.kill(pid, signal.SIGKILL)
+    time.sleep(0.5)
+
+    for _ in range(2):
+        response = client.post('/upload-excel', files={'file': ('book.xlsx', workbook(sheets=3))})
+        assert response.status_code == 200
+        assert response.json()['rows_processed'] == 60
+
+
+def test_stats_keep_numeric_column_names(client):
+    book = Workbook()
+    sheet = book.active
+    sheet.append([2021, 'name'])
+    for row in range(4):
+        sheet.append([row * 10, uuid.uuid4().hex])
+    buffer = io.BytesIO()
+    book.save(buffer)
+    session_id = client.post('/upload-excel', files={'file': ('years.xlsx', buffer.getvalue())}).json()['session_id']
+
+    response = client.get('/stats', params={'session_id': session_id})
+    assert response.status_code == 200
+    columns = {column['name']: column for column in response.json()['columns']}
+    # Header cells keep their type, the dashboard has to render a number as a name
+    assert set(columns) == {2021, 'name'}
+    assert (columns[2021]['type'], columns[2021]['min'], columns[2021]['max']) == ('number', 0, 30)
+    assert columns['name']['distinct'] == 4
+
+
+def test_jobs_wait_for_a_full_ingest_pool(client, monkeypatch):
+    pool = WorkerPool('ingest', workers=1, queue_limit=0)
+    monkeypatch.setattr(main, 'ingest_pool', pool)
+    # Hold the only slot from another event loop until the jobs are queued
+    release = threading.Event()
+    holder = threading.Thread(target=asyncio.run, args=(pool.run(release.wait),))
+    holder.start()
+    try:
+        time.sleep(0.05)
+        job_ids = []
+        for _ in range(2):
+            response = client.post('/upload-excel', params={'job': 'true'},
+                                   files={'file': ('book.xlsx', workbook(rows=10))})
+            assert response.status_code == 202
+            job_ids.append(response.json()['job_id'])
+
+        time.sleep(0.2)
+        for job_id in job_ids:
+            assert client.get(f'/jobs/{job_id}').json()['status'] in ('queued', 'running')
+    finally:
+        release.set()
+        holder.join()
+
+    for job_id in job_ids:
+        job = wait_for_job(client, job_id)
+        assert job['status'] == 'succeeded', job['error']
+        assert job['result']['rows_processed'] == 10
+
+
+def test_re_upload_writes_only_changed_rows(client):
+    token = uuid.uuid4().hex
+    rows = [f'{row},{token}' for row in range(10)]
+    first = client.post('/upload-excel', files={'file': ('rows.csv', 'id,token\n' + '\n'.join(rows))}).json()
+
+    rows[3] = '3,changed'
+    rows.append(f'10,{token}')
+    response = client.post(
+        '/upload-excel', params={'session_id': first['session_id']},
+        files={'file': ('rows.csv', 'id,token\n' + '\n'.join(rows))}
+    )
+
+    assert response.status_code == 200
+    assert response.json()['changes'] == {'inserted': 1, 'updated': 1, 'deleted': 0}
+    page = client.get('/data', params={'session_id': first['session_id'], 'limit': 100}).json()
+    assert page['total'] == 11
+    assert page['data'][3] == {'id': 3, 'token': 'changed'}
+    # The hashes are kept by the storage backend, not in the sheet metadata
+    assert 'row_hashes' not in main.db_ref.child(f"sessions/{first['session_id']}/sheets/0").get()
+
+
+def export(client, session_id, export_format):
+    response = client.get('/data/export', params={'session_id': session_id, 'format': export_format})
+    assert response.status_code == 200
+    return response
+
+
+def test_export_as_json_or_ndjson(client, monkeypatch):
+    session_id = client.post('/upload-excel', files={'file': ('book.xlsx', workbook(rows=10))}).json()['session_id']
+    rows = client.get('/data', params={'session_id': session_id}).json()['data']
+    assert len(rows) == 10
+
+    monkeypatch.setattr(main, 'EXPORT_BATCH_ROWS', 3)
+    before = scrape(client)
+    as_json = export(client, session_id, 'json')
+    reads = scrape(client)
+    as_ndjson = export(client, session_id, 'ndjson')
+
+    assert as_json.headers['content-type'] == 'application/json'
+    assert as_json.json() == rows
+    assert as_ndjson.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in as_ndjson.text.splitlines()] == rows
+    # Four batches of up to three rows, then the read that finds no more
+    key = 'storage_call_duration_seconds_count{backend="firebase",operation="read_rows"}'
+    assert reads[key] - before.get(key, 0) == 5
+
+
+def test_export_an_empty_sheet(client):
+    body = f'name,{uuid.uuid4().hex}\n'
+    session_id = client.post('/upload-excel', files={'file': ('rows.csv', body)}).json()['session_id']
+
+    assert export(client, session_id, 'json').json() == []
+    assert export(client, session_id, 'ndjson').text == ''
+
+
+def registry_record(session_id):
+    return next(record for record in main.session_registry.list_active() if record.session_id == session_id)
+
+
+def test_identical_upload_is_deduplicated(client, monkeypatch):
+    content = workbook(rows=4)
+    first = client.post('/upload-excel', files={'file': ('book.xlsx', content)}).json()
+    assert first['deduplicated'] is False
+    expires_at = registry_record(first['session_id']).expires_at
+
+    monkeypatch.setattr(main, 'SESSION_TTL_SECONDS', main.SESSION_TTL_SECONDS + 3600)
+    second = client.post('/upload-excel', files={'file': ('again.xlsx', content)}).json()
+
+    assert second['deduplicated'] is True
+    assert second['session_id'] == first['session_id']
+    assert second['rows_processed'] == 4
+    assert registry_record(first['session_id']).expires_at >= expires_at + 3600
+
+
+def test_same_bytes_with_another_reading_are_not_deduplicated(client):
+    content = workbook(sheets=2, rows=3)
+    whole = client.post('/upload-excel', files={'file': ('book.xlsx', content)}).json()
+    first_sheet = client.post(
+        '/upload-excel', params={'sheet': 'Sheet 0'}, files={'file': ('book.xlsx', content)}
+    ).json()
+    assert first_sheet['deduplicated'] is False
+    assert first_sheet['session_id'] != whole['session_id']
+
+    body = f'name\n{uuid.uuid4().hex}\n'
+    as_csv = client.post('/upload-excel', files={'file': ('rows.csv', body)}).json()
+    as_tsv = client.post('/upload-excel', files={'file': ('rows.tsv', body)}).json()
+    assert as_tsv['deduplicated'] is False
+    assert as_tsv['session_id'] != as_csv['session_id']
+
+
+def test_deleted_sessions_are_stored_again(client):
+    content = workbook(rows=3)
+    cleared = client.post('/upload-excel', files={'file': ('book.xlsx', content)}).json()['session_id']
+    assert client.post('/session/clear', params={'session_id': cleared}).status_code == 200
+
+    swept = client.post('/upload-excel', files={'file': ('book.xlsx', content)}).json()
+    assert swept['deduplicated'] is False and swept['session_id'] != cleared
+    # What the sweeper does once the session expired
+    record = registry_record(swept['session_id'])
+    main.session_registry.remove(record.session_id)
+    main.reclaim_sessions([record])
+
+    again = client.post('/upload-excel', files={'file': ('book.xlsx', content)}).json()
+    assert again['deduplicated'] is False
+    assert again['session_id'] not in (cleared, swept['session_id'])
+    assert client.get('/data', params={'session_id': again['session_id']}).json()['count'] == 3
+
+
+def test_reads_are_scoped_to_their_session(client):
+    sessions = []
+    for name in ('first', 'second'):
+        body = f'name\n{name} {uuid.uuid4().hex}\n'
+        sessions.append((client.post('/upload-excel', files={'file': ('rows.csv', body)}).json()['session_id'], name))
+
+    for session_id, name in sessions:
+        rows = client.get('/data', params={'session_id': session_id}).json()['data']
+        assert len(rows) == 1 and rows[0]['name'].startswith(name)
+
+    first_session = sessions[0][0]
+    assert client.delete('/data', params={'session_id': first_session}).status_code == 200
+    assert client.get('/data', params={'session_id': first_session}).status_code == 404
+    assert client.get('/data', params={'session_id': sessions[1][0]}).status_code == 200
+    assert client.get('/data', params={'session_id': 'not-a-session'}).status_code == 400
+
+
+def test_requests_without_a_session_are_rejected(client):
+    session_id = client.post('/upload-excel', files={'file': ('book.xlsx', workbook(rows=3))}).json()['session_id']
+
+    for path in ('/data', '/data/0', '/stats', '/data/export'):
+        assert client.get(path).status_code == 400, path
+    assert client.delete('/data').status_code == 400
+    assert client.post('/session/clear').status_code == 400
+
+    # Nothing was cleared on the way
+    assert client.get('/data', params={'session_id': session_id}).json()['count'] == 3
+
+
+def test_single_user_mode_falls_back_to_the_latest_upload(client, monkeypatch):
+    monkeypatch.setattr(main, 'SINGLE_USER_MODE', True)
+    session_id = client.post('/upload-excel', files={'file': ('book.xlsx', workbook(rows=4))}).json()['session_id']
+
+    assert client.get('/data').json()['count'] == 4
+    assert client.get('/stats').json()['rows_count'] == 4
+    assert client.post('/session/clear').status_code == 200
+    assert client.get('/data', params={'session_id': session_id}).status_code == 404
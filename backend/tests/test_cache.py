@@ -0,0 +1,72 @@
+import time
+
+from cache import DatasetCache
+
+
+def test_entries_expire_after_the_ttl():
+    cache = DatasetCache(ttl=0.05)
+    cache.set('key', b'value')
+
+    assert cache.get('key') == b'value'
+    time.sleep(0.06)
+    assert cache.get('key') is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = DatasetCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_byte_budget_bounds_encoded_bodies():
+    cache = DatasetCache(max_bytes=10)
+    cache.set('a', b'12345')
+    cache.set('b', b'123456')
+    cache.set('too big', b'x' * 11)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == b'123456'
+    assert cache.get('too big') is None
+    assert cache.stats()['bytes'] == 6
+
+
+def test_invalidate_drops_every_entry():
+    cache = DatasetCache()
+    cache.set('column_mapping', {'a': 'A'})
+    cache.set(('data', 0, 100), b'rows')
+    cache.invalidate()
+
+    assert cache.get('column_mapping') is None
+    assert cache.get(('data', 0, 100)) is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_invalidate_drops_one_session():
+    cache = DatasetCache()
+    cache.set(('session', 0, 'data'), b'rows')
+    cache.set('session', b'meta')
+    cache.set(('other', 0, 'data'), b'rows')
+    cache.invalidate('session')
+
+    assert cache.get(('session', 0, 'data')) is None
+    assert cache.get('session') is None
+    assert cache.get(('other', 0, 'data')) == b'rows'
+
+
+def test_values_loaded_before_an_invalidation_are_not_stored():
+    cache = DatasetCache()
+
+    def load():
+        # The data changes while it is being read
+        cache.invalidate()
+        return b'stale'
+
+    assert cache.get_or_load('key', load) == b'stale'
+    assert cache.get('key') is None
+    assert cache.get_or_load('key', lambda: b'fresh') == b'fresh'
+    assert cache.get('key') == b'fresh'
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+import pytest
+
+from executors import PoolBusyError, WorkerPool
+
+
+def test_full_pool_rejects_run_and_queues_run_when_free():
+    async def scenario():
+        pool = WorkerPool('test', workers=1, queue_limit=0)
+        release = threading.Event()
+        busy = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(PoolBusyError):
+            await pool.run(int)
+
+        waiting = [asyncio.ensure_future(pool.run_when_free(lambda value=value: value)) for value in range(3)]
+        await asyncio.sleep(0.05)
+        assert not any(task.done() for task in waiting)
+        assert pool.stats()['waiting'] == 3
+        assert pool.stats()['rejected'] == 1
+
+        release.set()
+        assert await asyncio.wait_for(asyncio.gather(*waiting), timeout=5) == [0, 1, 2]
+        assert await busy is True
+        assert pool.stats()['pending'] == 0
+        assert pool.stats()['waiting'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_hold_up_the_others():
+    async def scenario():
+        pool = WorkerPool('test', workers=1, queue_limit=0)
+        release = threading.Event()
+        busy = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        cancelled = asyncio.ensure_future(pool.run_when_free(int))
+        waiting = asyncio.ensure_future(pool.run_when_free(lambda: 'ran'))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+
+        release.set()
+        assert await asyncio.wait_for(waiting, timeout=5) == 'ran'
+        await busy
+
+    asyncio.run(scenario())
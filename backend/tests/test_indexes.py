@@ -0,0 +1,91 @@
+import pytest
+
+from indexes import IndexBuilder, IndexRegistry, QueryError, parse_filter, parse_sort
+
+ROWS = [
+    {'name': 'Alice Smith', 'age': 34, 'city': 'Paris', 'joined': '2021-03-01'},
+    {'name': 'Bob Jones', 'age': 28, 'city': 'London', 'joined': '2020-11-15'},
+    {'name': 'Carol Smith', 'city': 'Paris', 'joined': '2022-01-20'},
+    {'name': 'Dan Brown', 'age': 45, 'city': 'Berlin'},
+    {'name': 'Eve Adams', 'age': 28, 'city': 'London', 'joined': '2019-06-30'},
+]
+
+
+@pytest.fixture
+def index():
+    builder = IndexBuilder(['name', 'age', 'city', 'joined'])
+    # Rows arrive in several batches during ingestion
+    list(builder.wrap([ROWS[:2], ROWS[2:]]))
+    return builder.build()
+
+
+def query(index, filters=(), sort='', search=None, column_mapping=None):
+    parsed = [parse_filter(expression) for expression in filters]
+    return index.query(parsed, parse_sort(sort), search, column_mapping).tolist()
+
+
+def test_numeric_filters(index):
+    assert sorted(query(index, ['age:gt:30'])) == [0, 3]
+    assert sorted(query(index, ['age:eq:28'])) == [1, 4]
+    assert sorted(query(index, ['age:lte:28'])) == [1, 4]
+
+
+def test_text_filters(index):
+    assert sorted(query(index, ['city:eq:Paris'])) == [0, 2]
+    assert sorted(query(index, ['name:contains:smith'])) == [0, 2]
+
+
+def test_filters_are_combined(index):
+    assert query(index, ['city:eq:London', 'age:lt:30', 'name:contains:eve']) == [4]
+
+
+def test_date_filter(index):
+    assert sorted(query(index, ['joined:gte:2021-01-01'])) == [0, 2]
+
+
+def test_sort_keeps_nulls_last_in_both_directions(index):
+    assert query(index, sort='age,name') == [1, 4, 0, 3, 2]
+    assert query(index, sort='-age,name') == [3, 0, 1, 4, 2]
+    assert query(index, sort='joined') == [4, 1, 0, 2, 3]
+
+
+def test_sort_by_several_columns(index):
+    assert query(index, sort='age,-name') == [4, 1, 0, 3, 2]
+
+
+def test_sort_of_filtered_rows(index):
+    assert query(index, ['city:ne:Berlin'], sort='-joined') == [2, 0, 1, 4]
+
+
+def test_search_matches_every_token(index):
+    assert sorted(query(index, search='smith')) == [0, 2]
+    assert query(index, search='smith paris carol') == [2]
+
+
+def test_columns_are_found_by_original_name(index):
+    assert sorted(query(index, ['City Name:eq:Paris'], column_mapping={'city': 'City Name'})) == [0, 2]
+
+
+def test_invalid_queries_raise_query_error(index):
+    with pytest.raises(QueryError):
+        parse_filter('age>30')
+    with pytest.raises(QueryError):
+        query(index, ['height:gt:1'])
+
+
+def test_registry_evicts_whole_sessions():
+    registry = IndexRegistry(max_sessions=2)
+    for sheet in range(3):
+        registry.set(('a', sheet, 1), f'a{sheet}')
+    registry.set(('b', 0, 1), 'b0')
+
+    # Three sheets of one session still count as one session
+    assert [registry.get(('a', sheet, 1), lambda: None) for sheet in range(3)] == ['a0', 'a1', 'a2']
+
+    registry.set(('c', 0, 1), 'c0')
+    assert registry.get(('b', 0, 1), lambda: 'rebuilt') == 'rebuilt'
+    # Rebuilding b dropped a, the least recently used, with all its sheets
+    assert [registry.get(('a', sheet, 1), lambda: 'rebuilt') for sheet in range(3)] == ['rebuilt'] * 3
+
+    registry.discard('a')
+    assert registry.get(('a', 0, 1), lambda: 'again') == 'again'
@@ -0,0 +1,48 @@
+import json
+
+import pandas as pd
+
+from ingest import parse_sheet
+from serialization import serialize_series
+
+
+def parse_text(tmp_path, text, suffix='.csv'):
+    path = tmp_path / f'upload{suffix}'
+    path.write_text(text)
+    original_columns, sanitized_columns, batches = parse_sheet(str(path), suffix)
+    return original_columns, [row for batch in batches for row in batch]
+
+
+def test_csv_values_are_python_scalars(tmp_path):
+    columns, rows = parse_text(tmp_path, 'id,name,active,score\n1,x,true,\n2,y,false,3\n')
+
+    assert columns == ['id', 'name', 'active', 'score']
+    assert rows == [
+        {'id': 1, 'name': 'x', 'active': True, 'score': None},
+        {'id': 2, 'name': 'y', 'active': False, 'score': 3.0},
+    ]
+    assert [type(row['id']) for row in rows] == [int, int]
+    assert [type(row['active']) for row in rows] == [bool, bool]
+    json.dumps(rows)
+
+
+def test_tsv_is_parsed_with_tabs(tmp_path):
+    columns, rows = parse_text(tmp_path, 'a\tb\n1\tx\n', suffix='.tsv')
+
+    assert columns == ['a', 'b']
+    assert rows == [{'a': 1, 'b': 'x'}]
+
+
+def test_nullable_series_serialize_to_python_scalars():
+    for series in (pd.Series([1, 2], dtype='Int64'), pd.Series([True, False], dtype='boolean')):
+        values = serialize_series(series)
+        assert values == series.tolist()
+        assert all(type(value) in (int, bool) for value in values)
+
+    assert serialize_series(pd.Series([1, None], dtype='Int64')) == [1, None]
+
+
+def test_lines_of_empty_fields_are_skipped(tmp_path):
+    columns, rows = parse_text(tmp_path, 'a,b\n1,x\n,\n2,y\n')
+
+    assert rows == [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}]
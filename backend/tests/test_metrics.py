@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from metrics import STAGE_BYTES, STAGE_ROWS, STAGE_SECONDS, Counter, Histogram, Stage, render_metrics
+
+
+def sample(metric, name, *labelvalues):
+    """The value of one sample of metric, 0 when it was never recorded"""
+    for sample_name, values, extra, value in metric.samples():
+        if sample_name == name and values == labelvalues and not extra:
+            return value
+    return 0
+
+
+def test_wrapped_stage_is_recorded_once_with_its_rows():
+    count = sample(STAGE_SECONDS, 'pipeline_stage_duration_seconds_count', 'test_wrap')
+    rows = sample(STAGE_ROWS, 'pipeline_stage_rows_total', 'test_wrap')
+
+    stage = Stage('test_wrap')
+    assert list(stage.wrap([[1, 2], [3], []])) == [[1, 2], [3], []]
+
+    assert stage.rows == 3
+    assert sample(STAGE_SECONDS, 'pipeline_stage_duration_seconds_count', 'test_wrap') == count + 1
+    assert sample(STAGE_ROWS, 'pipeline_stage_rows_total', 'test_wrap') == rows + 3
+
+
+def test_outer_stage_does_not_count_its_inner_stage():
+    def slow_batches():
+        for _ in range(2):
+            time.sleep(0.05)
+            yield [1]
+
+    inner = Stage('test_inner')
+    outer = Stage('test_outer', inner=inner)
+    with Stage('test_consume', inner=outer) as consume:
+        consume.bytes = 10
+        for _ in outer.wrap(inner.wrap(slow_batches())):
+            pass
+
+    assert inner.seconds >= 0.1
+    # Each stage reports its own share, so the shares add up to the elapsed time
+    own = sample(STAGE_SECONDS, 'pipeline_stage_duration_seconds_sum', 'test_outer')
+    assert own < 0.05
+    assert sample(STAGE_BYTES, 'pipeline_stage_bytes_total', 'test_consume') >= 10
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_histogram_seconds', 'Test histogram', ('kind',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value, 'a')
+
+    buckets = [(extra, value) for name, _, extra, value in histogram.samples() if name.endswith('_bucket')]
+    assert buckets == [((('le', '0.1'),), 1), ((('le', '1'),), 3), ((('le', '+Inf'),), 4)]
+    assert sample(histogram, 'test_histogram_seconds_count', 'a') == 4
+    assert sample(histogram, 'test_histogram_seconds_sum', 'a') == pytest.approx(6.05)
+
+
+def test_label_values_are_escaped():
+    counter = Counter('test_escaped_total', 'Test counter', ('name',))
+    counter.inc(2, 'say "hi"\\\n')
+
+    assert 'test_escaped_total{name="say \\"hi\\"\\\\\\n"} 2' in render_metrics().splitlines()
@@ -0,0 +1,52 @@
+from rowdiff import RowDiff, RowHasher, pack_row_hashes, row_hash, unpack_row_hashes
+
+ROWS = [{'id': index, 'value': f'row {index}'} for index in range(5)]
+
+
+def stored_hashes(rows):
+    hasher = RowHasher()
+    for _ in hasher.wrap([rows]):
+        pass
+    return hasher.hashes
+
+
+def diff(previous_rows, rows):
+    differ = RowDiff(stored_hashes(previous_rows))
+    changes = list(differ.changes([rows[:2], rows[2:]]))
+    return differ, changes
+
+
+def test_hashes_survive_packing():
+    hashes = stored_hashes(ROWS)
+
+    assert unpack_row_hashes(pack_row_hashes(hashes, chunk_size=2)) == hashes
+    assert unpack_row_hashes(None) == []
+
+
+def test_hashes_depend_on_values_and_column_order():
+    assert row_hash({'a': 1, 'b': 2}) != row_hash({'a': 1, 'b': 3})
+    assert row_hash({'a': 1, 'b': 2}) != row_hash({'b': 2, 'a': 1})
+
+
+def test_identical_rows_write_nothing():
+    differ, changes = diff(ROWS, ROWS)
+
+    assert changes == []
+    assert (differ.inserted, differ.updated, differ.deleted) == (0, 0, 0)
+
+
+def test_changed_and_appended_rows_are_written():
+    rows = [dict(row) for row in ROWS] + [{'id': 5, 'value': 'row 5'}]
+    rows[1]['value'] = 'changed'
+    differ, changes = diff(ROWS, rows)
+
+    assert changes == [(1, rows[1]), (5, rows[5])]
+    assert (differ.inserted, differ.updated, differ.deleted) == (1, 1, 0)
+    assert differ.hashes == stored_hashes(rows)
+
+
+def test_rows_cut_off_at_the_end_are_deleted():
+    differ, changes = diff(ROWS, ROWS[:3])
+
+    assert changes == [(3, None), (4, None)]
+    assert (differ.inserted, differ.updated, differ.deleted) == (0, 0, 2)
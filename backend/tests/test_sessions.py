@@ -0,0 +1,99 @@
+import threading
+import uuid
+
+import pytest
+
+from sessions import MemorySessionRegistry, SessionRecord, SQLiteSessionRegistry, create_session_registry
+
+
+def record(created_at, expires_at, rows_count=10, content_hash=None):
+    return SessionRecord(str(uuid.uuid4()), created_at, expires_at, rows_count, content_hash)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def registry(request, tmp_path):
+    if request.param == 'memory':
+        return MemorySessionRegistry()
+    return SQLiteSessionRegistry(str(tmp_path / 'sessions.db'))
+
+
+def test_active_sessions_exclude_expired_ones(registry):
+    old = record(created_at=100, expires_at=200)
+    new = record(created_at=150, expires_at=400)
+    registry.add(new)
+    registry.add(old)
+
+    assert registry.list_active(now=100) == [old, new]
+    assert registry.list_active(now=300) == [new]
+
+
+def test_pop_due_claims_expired_sessions_earliest_first(registry):
+    first = record(created_at=0, expires_at=100)
+    second = record(created_at=0, expires_at=200)
+    live = record(created_at=0, expires_at=500)
+    for entry in (second, live, first):
+        registry.add(entry)
+
+    assert registry.pop_due(now=300, limit=1) == [first]
+    assert registry.pop_due(now=300) == [second]
+    assert registry.pop_due(now=300) == []
+    assert registry.list_active(now=300) == [live]
+
+
+def test_re_added_session_uses_its_new_expiry(registry):
+    entry = record(created_at=0, expires_at=100)
+    registry.add(entry)
+    renewed = entry._replace(expires_at=1000)
+    registry.add(renewed)
+
+    assert registry.pop_due(now=500) == []
+    assert registry.list_active(now=500) == [renewed]
+
+
+def test_removed_sessions_are_never_due(registry):
+    entry = record(created_at=0, expires_at=100)
+    registry.add(entry)
+    registry.remove(entry.session_id)
+    registry.remove(str(uuid.uuid4()))
+
+    assert registry.pop_due(now=500) == []
+
+
+def test_content_hash_round_trips(registry):
+    entry = record(created_at=0, expires_at=100, content_hash='ab' * 32)
+    registry.add(entry)
+
+    assert registry.list_active(now=0) == [entry]
+
+
+def test_sqlite_claims_each_session_once_across_registries(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    registries = [SQLiteSessionRegistry(path) for _ in range(4)]
+    entries = [record(created_at=0, expires_at=index) for index in range(200)]
+    for entry in entries:
+        registries[0].add(entry)
+
+    # Workers sharing the file sweep at the same time
+    claimed = []
+    lock = threading.Lock()
+
+    def sweep(registry):
+        while True:
+            due = registry.pop_due(now=1000, limit=7)
+            if not due:
+                return
+            with lock:
+                claimed.extend(due)
+
+    threads = [threading.Thread(target=sweep, args=(registry,)) for registry in registries]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(entry.session_id for entry in claimed) == sorted(entry.session_id for entry in entries)
+
+
+def test_unknown_registry_is_rejected():
+    with pytest.raises(ValueError):
+        create_session_registry('redis')
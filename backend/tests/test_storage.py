@@ -0,0 +1,359 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import storage
+from fake_firebase import FakeDatabase
+from indexes import IndexBuilder
+from storage import FirebaseBackend, ParquetBackend, ShardWriteError, write_shard, write_sharded
+
+
+class FlakyRef:
+    """A reference whose update() fails the first failures calls for every shard"""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.data = {}
+        self.calls = {}
+        self.active = 0
+        self.max_active = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def update(self, update):
+        shard = min(update, key=lambda path: int(path.rsplit('/', 1)[1]))
+        with self._lock:
+            self.calls[shard] = self.calls.get(shard, 0) + 1
+            attempt = self.calls[shard]
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if attempt <= self.failures:
+                raise ConnectionError(f'attempt {attempt} of {shard} failed')
+            with self._lock:
+                self.data.update(update)
+                self.completed += 1
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of waiting"""
+    delays = []
+    monkeypatch.setattr(storage.time, 'sleep', delays.append)
+    return delays
+
+
+def rows(count):
+    return [{'id': index} for index in range(count)]
+
+
+def test_shard_is_retried_with_doubling_backoff(sleeps):
+    ref = FlakyRef(failures=2)
+
+    assert write_shard(ref, 'rows', 10, rows(3), retries=3, backoff=0.5) == 3
+    assert ref.calls == {'rows/10': 3}
+    assert sleeps == [0.5, 1.0]
+    assert ref.data == {'rows/10': {'id': 0}, 'rows/11': {'id': 1}, 'rows/12': {'id': 2}}
+
+
+def test_shard_fails_with_the_last_error_after_all_retries(sleeps):
+    ref = FlakyRef(failures=5)
+
+    with pytest.raises(ShardWriteError) as raised:
+        write_shard(ref, 'rows', 20, rows(4), retries=3, backoff=0.1)
+
+    assert ref.calls == {'rows/20': 3}
+    assert sleeps == [0.1, 0.2]
+    assert (raised.value.start, raised.value.rows_count) == (20, 4)
+    assert str(raised.value.error) == 'attempt 3 of rows/20 failed'
+    assert 'rows 20-23' in str(raised.value)
+
+
+def test_rows_are_written_as_numbered_shards():
+    ref = FlakyRef()
+    batches = [rows(7), rows(5)]
+
+    assert write_sharded(ref, 'rows', batches, shard_size=5, concurrency=2) == 12
+    assert sorted(ref.calls) == ['rows/0', 'rows/10', 'rows/5']
+    assert [ref.data[f'rows/{index}'] for index in range(12)] == rows(7) + rows(5)
+
+
+def test_shards_in_flight_are_bounded():
+    concurrency = 2
+    ref = FlakyRef(delay=0.02)
+    produced = []
+    held = []
+
+    def batches():
+        for index in range(20):
+            # Shards handed to the writer but not written yet, including this one
+            held.append(len(produced) - ref.completed + 1)
+            produced.append(index)
+            yield rows(1)
+
+    assert write_sharded(ref, 'rows', batches(), shard_size=1, concurrency=concurrency) == 20
+    assert ref.max_active == concurrency
+    assert max(held) <= concurrency * 2 + 1
+
+
+def test_write_fails_once_a_shard_gives_up():
+    ref = FlakyRef(failures=1)
+
+    with pytest.raises(ShardWriteError):
+        write_sharded(ref, 'rows', [rows(10)], shard_size=2, concurrency=2, retries=1)
+
+
+needs_pyarrow = pytest.mark.skipif(storage.pa is None, reason="pyarrow is not installed")
+
+
+@needs_pyarrow
+def test_parquet_reads_span_parts_and_row_groups(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=7, row_group_size=3)
+    expected = rows(20)
+    assert backend.write_dataset([rows(20)[:9], rows(20)[9:]], ['id']) == 20
+
+    for offset in range(21):
+        for limit in (1, 2, 3, 4, 7, 8, 14, 25):
+            assert backend.read_rows(offset, limit) == expected[offset:offset + limit]
+    assert backend.read_row(6) == {'id': 6}
+    assert backend.read_row(7) == {'id': 7}
+    assert backend.read_row(20) is None
+    assert backend.read_all() == expected
+
+
+@needs_pyarrow
+def test_parquet_mixed_type_columns_round_trip(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=4, row_group_size=2)
+    data = [
+        {'mixed': 1, 'text': 'a'},
+        {'mixed': 'two', 'text': 'b'},
+        {'mixed': 3.5},
+        {'mixed': True, 'text': 'd'},
+        {'mixed': None, 'text': 'e'},
+    ]
+    backend.write_dataset([data], ['mixed', 'text'])
+
+    assert backend.read_all() == [
+        {'mixed': 1, 'text': 'a'},
+        {'mixed': 'two', 'text': 'b'},
+        {'mixed': 3.5},
+        {'mixed': True, 'text': 'd'},
+        {'text': 'e'},
+    ]
+    assert backend.read_rows(1, 3) == [
+        {'mixed': 'two', 'text': 'b'},
+        {'mixed': 3.5},
+        {'mixed': True, 'text': 'd'},
+    ]
+
+
+@needs_pyarrow
+def test_parquet_failed_write_keeps_previous_dataset(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=3, row_group_size=2)
+    backend.write_dataset([rows(5)], ['id'])
+
+    def batches():
+        yield [{'id': 'new'}] * 4
+        raise ValueError("parse failed")
+
+    with pytest.raises(ValueError):
+        backend.write_dataset(batches(), ['id'])
+
+    assert backend.read_all() == rows(5)
+    assert sorted(os.listdir(tmp_path)) == ['current']
+
+
+@needs_pyarrow
+def test_parquet_clear_removes_dataset(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=3, row_group_size=2)
+    backend.write_dataset([rows(5)], ['id'])
+    backend.clear()
+
+    assert backend.read_all() is None
+    assert backend.read_rows(0, 10) == []
+    assert os.listdir(tmp_path) == []
+
+
+def firebase_rows(rows):
+    """A FirebaseBackend holding rows by id, None leaving a missing row"""
+    ref = FakeDatabase(latency_ms=0).reference('/')
+    ref.child('excel_data').set({str(row_id): row for row_id, row in enumerate(rows) if row is not None})
+    return FirebaseBackend(ref)
+
+
+def test_rows_are_read_by_id_around_a_missing_row():
+    storage = firebase_rows([{'a': 0}, {'a': 1}, None, {'a': 3}, {'a': 4}])
+
+    assert storage.read_rows(0, 2) == [{'a': 0}, {'a': 1}]
+    assert storage.read_rows(1, 3) == [{'a': 1}, {'a': 3}]
+    assert storage.read_rows_by_ids([4, 1, 2, 3]) == [{'a': 4}, {'a': 1}, {'a': 3}]
+    assert storage.read_row(2) is None
+    assert [row for batch in storage.iter_batches(2) for row in batch] == [{'a': 0}, {'a': 1}, {'a': 3}, {'a': 4}]
+
+
+class ArrayQueryRef:
+    """A reference whose range queries come back as a list, as Firebase renders keys 0..n"""
+
+    def __init__(self, page):
+        self.page = page
+
+    def child(self, path):
+        return self
+
+    def order_by_key(self):
+        return self
+
+    def start_at(self, start):
+        return self
+
+    def limit_to_first(self, limit):
+        return self
+
+    def get(self):
+        return self.page
+
+
+def test_range_queries_answered_with_a_list():
+    storage = FirebaseBackend(ArrayQueryRef([{'a': 0}, None, {'a': 2}]))
+
+    assert storage.read_rows(0, 3) == [{'a': 0}, {'a': 2}]
+    assert storage.read_rows_by_ids([2, 0]) == [{'a': 2}, {'a': 0}]
+
+    # A range from offset 2 may still be rendered from key 0 with leading Nones
+    storage = FirebaseBackend(ArrayQueryRef([None, None, {'a': 2}, {'a': 3}]))
+    assert storage.read_rows(2, 2) == [{'a': 2}, {'a': 3}]
+
+
+def test_read_all_keeps_row_positions():
+    rows = firebase_rows([{'a': 0}, None, {'a': 2}]).read_all()
+
+    assert rows == [{'a': 0}, None, {'a': 2}]
+
+
+def test_index_built_from_rows_with_a_missing_one_keeps_row_ids():
+    builder = IndexBuilder(['a'])
+    builder.add([{'a': 5}, None, {'a': 1}])
+    index = builder.build()
+
+    assert index.rows_count == 3
+    assert index.query([], [('a', False)], None).tolist() == [2, 0, 1]
+
+
+def update(backend, changes, columns=('id',)):
+    progress = []
+    changed = backend.update_rows(iter(changes), list(columns), progress=progress.append)
+    assert sum(progress) == changed
+    return changed
+
+
+def part_inodes(backend):
+    manifest = backend._manifest()
+    return {part['file']: os.stat(os.path.join(backend.root, part['file'])).st_ino for part in manifest['parts']}
+
+
+@needs_pyarrow
+def test_parquet_update_rewrites_only_changed_parts(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=5, row_group_size=2)
+    backend.write_dataset([rows(15)], ['id'])
+    before = part_inodes(backend)
+
+    assert update(backend, [(6, {'id': 'six'}), (8, {'id': 'eight'})]) == 2
+
+    expected = rows(15)
+    expected[6], expected[8] = {'id': 'six'}, {'id': 'eight'}
+    assert backend.read_all() == expected
+    assert backend.read_rows(5, 5) == expected[5:10]
+    after = part_inodes(backend)
+    assert after['part-00000.parquet'] == before['part-00000.parquet']
+    assert after['part-00002.parquet'] == before['part-00002.parquet']
+    assert after['part-00001.parquet'] != before['part-00001.parquet']
+    assert sorted(os.listdir(tmp_path)) == ['current']
+
+
+@needs_pyarrow
+def test_parquet_update_appends_rows_in_new_parts(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=5, row_group_size=2)
+    backend.write_dataset([rows(7)], ['id'])
+
+    changes = [(3, {'id': 'three'})] + [(row_id, {'id': row_id}) for row_id in range(7, 19)]
+    assert update(backend, changes) == 13
+
+    expected = rows(19)
+    expected[3] = {'id': 'three'}
+    assert backend.read_all() == expected
+    for offset in range(19):
+        assert backend.read_rows(offset, 4) == expected[offset:offset + 4]
+    assert backend._manifest()['rows_count'] == 19
+
+
+@needs_pyarrow
+def test_parquet_update_cuts_rows_off_the_end(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=5, row_group_size=2)
+    backend.write_dataset([rows(15)], ['id'])
+
+    changes = [(1, {'id': 'one'})] + [(row_id, None) for row_id in range(7, 15)]
+    assert update(backend, changes) == 9
+
+    assert backend.read_all() == [{'id': 0}, {'id': 'one'}] + rows(7)[2:]
+    assert [part['rows'] for part in backend._manifest()['parts']] == [5, 2]
+
+    # Deleting a whole part leaves no empty part behind
+    assert update(backend, [(row_id, None) for row_id in range(5, 7)]) == 2
+    assert [part['rows'] for part in backend._manifest()['parts']] == [5]
+    assert backend.read_row(5) is None
+
+
+@needs_pyarrow
+def test_parquet_update_without_a_dataset_writes_one(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=5, row_group_size=2)
+
+    assert update(backend, [(row_id, {'id': row_id}) for row_id in range(3)]) == 3
+    assert backend.read_all() == rows(3)
+
+
+@needs_pyarrow
+def test_parquet_row_hashes_live_in_a_sidecar(tmp_path):
+    backend = ParquetBackend(str(tmp_path), part_rows=5, row_group_size=2)
+    backend.write_dataset([rows(3)], ['id'])
+    hashes = [bytes([index]) * 8 for index in range(3)]
+
+    assert backend.read_row_hashes() is None
+    backend.write_row_hashes(hashes)
+    assert backend.read_row_hashes() == hashes
+    assert 'row_hashes' not in json.dumps(backend._manifest())
+
+    # A new version of the rows no longer matches the old hashes
+    update(backend, [(0, {'id': 'zero'})])
+    assert backend.read_row_hashes() is None
+
+    backend.write_row_hashes(hashes)
+    backend.delete_row_hashes()
+    assert backend.read_row_hashes() is None
+    backend.write_row_hashes(hashes)
+    backend.clear()
+    assert backend.read_row_hashes() is None
+
+
+def test_firebase_row_hashes_are_kept_apart_from_the_rows():
+    ref = FakeDatabase(latency_ms=0).reference('/')
+    backend = FirebaseBackend(ref, 'sheet/excel_data', 'hashes/sheet')
+    backend.write_dataset([rows(3)], ['id'])
+    hashes = [bytes([index]) * 8 for index in range(3)]
+    backend.write_row_hashes(hashes)
+
+    assert backend.read_row_hashes() == hashes
+    assert ref.child('hashes/sheet').get() is not None
+    assert set(ref.child('sheet').get()) == {'excel_data'}
+
+    backend.clear()
+    assert backend.read_row_hashes() is None
+    assert ref.child('sheet/excel_data').get() is None
@@ -0,0 +1,97 @@
+from metrics import render_metrics
+from sessions import MemorySessionRegistry, SessionRecord
+from sweeper import ExpirySweeper
+
+
+class Reclaimer:
+    """Records reclaimed batches, failing the first failures calls"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def __call__(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("delete failed")
+        self.batches.append([record.session_id for record in records])
+
+
+def schedule(registry, session_id, expires_at, rows_count=0):
+    registry.add(SessionRecord(session_id, 0, expires_at, rows_count))
+
+
+def test_only_due_sessions_are_reclaimed_in_batches():
+    registry = MemorySessionRegistry()
+    reclaim = Reclaimer()
+    sweeper = ExpirySweeper(registry, reclaim, interval=60, batch_size=2)
+    for index in range(5):
+        schedule(registry, f's{index}', 100 + index, rows_count=10)
+    schedule(registry, 'later', 500)
+
+    assert sweeper.sweep(now=200) == 5
+    assert reclaim.batches == [['s0', 's1'], ['s2', 's3'], ['s4']]
+    assert [record.session_id for record in registry.list_active(now=200)] == ['later']
+    assert sweeper.stats()['rows_reclaimed'] == 50
+
+
+def test_removed_and_renewed_sessions_are_skipped():
+    registry = MemorySessionRegistry()
+    reclaim = Reclaimer()
+    sweeper = ExpirySweeper(registry, reclaim, interval=60)
+    schedule(registry, 'removed', 100)
+    schedule(registry, 'renewed', 100)
+    schedule(registry, 'renewed', 300)
+    registry.remove('removed')
+
+    assert sweeper.sweep(now=200) == 0
+    assert sweeper.sweep(now=400) == 1
+    assert reclaim.batches == [['renewed']]
+
+
+def test_failed_batch_is_rescheduled_and_retried():
+    registry = MemorySessionRegistry()
+    reclaim = Reclaimer(failures=1)
+    sweeper = ExpirySweeper(registry, reclaim, interval=60, batch_size=10)
+    schedule(registry, 'a', 100, rows_count=3)
+    schedule(registry, 'b', 100, rows_count=4)
+
+    assert sweeper.sweep(now=200) == 0
+    assert sweeper.stats()['errors'] == 1
+    assert sweeper.stats()['last_error'] == 'delete failed'
+
+    # The batch is retried one interval later, not on the next sweep at the same time
+    assert sweeper.sweep(now=200) == 0
+    assert sweeper.sweep(now=float('inf')) == 2
+    assert reclaim.batches == [['a', 'b']]
+    stats = sweeper.stats()
+    assert (stats['sessions_reclaimed'], stats['rows_reclaimed'], stats['sweeps']) == (2, 7, 3)
+
+
+def sweep_series():
+    series = {}
+    for line in render_metrics().splitlines():
+        if line.startswith('session_sweep_') and '{' not in line:
+            name, value = line.split(' ')
+            series[name] = float(value)
+    return series
+
+
+def test_sweeps_are_exported_as_metrics():
+    registry = MemorySessionRegistry()
+    sweeper = ExpirySweeper(registry, Reclaimer(failures=1), interval=60, batch_size=1)
+    schedule(registry, 'a', 100, rows_count=3)
+    schedule(registry, 'b', 100, rows_count=4)
+    before = sweep_series()
+
+    sweeper.sweep(now=200)
+    sweeper.sweep(now=float('inf'))
+    after = sweep_series()
+
+    def delta(name):
+        return after[name] - before.get(name, 0)
+
+    assert delta('session_sweep_duration_seconds_count') == 2
+    assert delta('session_sweep_sessions_reclaimed_total') == 2
+    assert delta('session_sweep_rows_reclaimed_total') == 7
+    assert delta('session_sweep_errors_total') == 1
@@ -0,0 +1,69 @@
+"""
+Compare parsing the same table from .xlsx (openpyxl) and from .csv/.tsv.
+
+Generates the sample workbooks from create_sample_data.py into a temporary
+directory, tiles each one to a larger row count, writes it out in every
+format and times ingest.parse_sheet over all of its batches.
+
+Usage: python benchmarks/bench_ingest.py [--repeat N] [--runs N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_serialization import best_time, load_samples  # noqa: E402
+from ingest import parse_sheet  # noqa: E402
+
+FORMATS = ('.xlsx', '.csv', '.tsv')
+
+
+def write_table(df, path, suffix):
+    if suffix == '.xlsx':
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False, sep='\t' if suffix == '.tsv' else ',')
+
+
+def parse_all(path, suffix):
+    """Parse a file the way ingestion does and return the row count"""
+    _, _, batches = parse_sheet(path, suffix)
+    return sum(len(batch) for batch in batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=100, help='tile each sample this many times')
+    parser.add_argument('--runs', type=int, default=3, help='timed runs per format')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        samples = load_samples(directory)
+
+        print(f"{'file':<30} {'rows':>8} " + ' '.join(f'{suffix:>9}' for suffix in FORMATS) + f" {'csv speedup':>12}")
+        for name, df in samples.items():
+            df = pd.concat([df] * args.repeat, ignore_index=True)
+            stem = os.path.join(directory, f'tiled_{os.path.splitext(name)[0]}')
+
+            timings = {}
+            for suffix in FORMATS:
+                path = stem + suffix
+                write_table(df, path, suffix)
+                rows = parse_all(path, suffix)
+                if rows != len(df):
+                    print(f"⚠️  {name} {suffix}: parsed {rows} of {len(df)} rows")
+                timings[suffix] = best_time(lambda: parse_all(path, suffix), args.runs)
+
+            print(
+                f"{name:<30} {len(df):>8} "
+                + ' '.join(f'{timings[suffix]:>8.3f}s' for suffix in FORMATS)
+                + f" {timings['.xlsx'] / timings['.csv']:>11.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
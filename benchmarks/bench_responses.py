@@ -0,0 +1,100 @@
+"""
+Compare the ways a GET /data response body can be encoded.
+
+Generates the sample workbooks from create_sample_data.py into a temporary
+directory, tiles each one to several row counts and times encoding the
+{"data": rows, "count": n} payload with FastAPI's default path
+(jsonable_encoder plus JSONResponse), with the standard library encoder alone
+and with serialization.encode_json (orjson when it is installed). A second
+table compares the size of the rows, columnar JSON and Arrow IPC bodies and
+how long each takes to encode and to decode again.
+
+Usage: python benchmarks/bench_responses.py [--repeat N [N ...]] [--runs N]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_serialization import best_time, load_samples  # noqa: E402
+from serialization import columnar_page, encode_arrow, encode_json, orjson, pa, serialize_dataframe  # noqa: E402
+
+
+def fastapi_default(payload):
+    """What FastAPI does with a dict returned by an endpoint"""
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def stdlib(payload):
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def format_encoders():
+    """Encode and decode functions of each GET /data response format"""
+    formats = {
+        'rows': (encode_json, json.loads),
+        'columnar': (lambda payload: encode_json(columnar_page(payload)), json.loads),
+    }
+    if pa is not None:
+        formats['arrow'] = (encode_arrow, lambda body: pa.ipc.open_stream(body).read_all())
+    return formats
+
+
+def compare_formats(samples, repeats, runs):
+    formats = format_encoders()
+    print()
+    print(f"{'file':<30} {'rows':>8} " + ' '.join(f"{name + ' MB':>11} {'enc':>8} {'dec':>8}" for name in formats))
+    for name, df in samples.items():
+        for repeat in repeats:
+            rows = serialize_dataframe(pd.concat([df] * repeat, ignore_index=True))
+            payload = {"data": rows, "count": len(rows)}
+            line = f"{name:<30} {len(rows):>8}"
+            for encode, decode in formats.values():
+                body = encode(payload)
+                encoding = best_time(lambda: encode(payload), runs)
+                decoding = best_time(lambda: decode(body), runs)
+                line += f" {len(body) / 1e6:>11.2f} {encoding * 1000:>6.1f}ms {decoding * 1000:>6.1f}ms"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, nargs='+', default=[1, 10, 100],
+                        help='tile each sample these many times')
+    parser.add_argument('--runs', type=int, default=3, help='timed runs per encoder')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        samples = load_samples(directory)
+
+    encoder = 'orjson' if orjson is not None else 'encode_json'
+    print(f"{'file':<30} {'rows':>8} {'MB':>7} {'fastapi':>9} {'json':>9} {encoder:>11} {'speedup':>8}")
+    for name, df in samples.items():
+        for repeat in args.repeat:
+            rows = serialize_dataframe(pd.concat([df] * repeat, ignore_index=True))
+            payload = {"data": rows, "count": len(rows)}
+
+            body = encode_json(payload)
+            if json.loads(body) != json.loads(fastapi_default(payload)):
+                print(f"⚠️  {name}: encode_json output differs from FastAPI's")
+
+            default = best_time(lambda: fastapi_default(payload), args.runs)
+            plain = best_time(lambda: stdlib(payload), args.runs)
+            fast = best_time(lambda: encode_json(payload), args.runs)
+            print(
+                f"{name:<30} {len(rows):>8} {len(body) / 1e6:>7.2f} {default * 1000:>7.1f}ms {plain * 1000:>7.1f}ms"
+                f" {fast * 1000:>9.1f}ms {default / fast:>7.1f}x"
+            )
+
+    compare_formats(samples, args.repeat, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare serialize_data with the columnar serialize_dataframe.
+
+Generates the sample workbooks from create_sample_data.py into a temporary
+directory, optionally tiles each one to a larger row count, and times both
+serializers on the same DataFrame.
+
+Usage: python benchmarks/bench_serialization.py [--repeat N] [--runs N]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'backend'))
+
+import create_sample_data  # noqa: E402
+from serialization import serialize_data, serialize_dataframe  # noqa: E402
+
+GENERATORS = [
+    create_sample_data.create_employee_data,
+    create_sample_data.create_sales_data,
+    create_sample_data.create_inventory_data,
+    create_sample_data.create_student_data,
+    create_sample_data.create_customer_data,
+    create_sample_data.create_weather_data,
+    create_sample_data.create_simple_data,
+]
+
+
+def load_samples(directory):
+    """Run the sample generators in directory and read back every workbook"""
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for generator in GENERATORS:
+                generator()
+    finally:
+        os.chdir(cwd)
+
+    return {
+        os.path.basename(path): pd.read_excel(path)
+        for path in sorted(glob.glob(os.path.join(directory, '*.xlsx')))
+    }
+
+
+def best_time(func, runs):
+    """Return the fastest of runs timings of func() in seconds"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=100, help='tile each sample this many times')
+    parser.add_argument('--runs', type=int, default=3, help='timed runs per serializer')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        samples = load_samples(directory)
+
+    print(f"{'file':<30} {'rows':>8} {'cols':>5} {'serialize_data':>15} {'columnar':>10} {'speedup':>8}")
+    for name, df in samples.items():
+        df = pd.concat([df] * args.repeat, ignore_index=True)
+
+        legacy = best_time(lambda: serialize_data(df.to_dict('records')), args.runs)
+        columnar = best_time(lambda: serialize_dataframe(df), args.runs)
+
+        if serialize_dataframe(df) != serialize_data(df.to_dict('records')):
+            print(f"⚠️  {name}: serializers disagree")
+
+        print(f"{name:<30} {len(df):>8} {len(df.columns):>5} {legacy:>14.3f}s {columnar:>9.3f}s {legacy / columnar:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Load test /upload-excel, /data and /data/{row_id} end to end.
+
+Generates a sample workbook from create_sample_data.py, tiles it to each
+requested row count (1k to 1M) and, for every size, times a few uploads one
+after the other, then a burst of concurrent random page and row reads. Prints
+p50/p99/max latency, throughput and the peak RSS of the process.
+
+By default the app runs in this process against the in-memory fake Firebase
+(backend/fake_firebase.py), so no credentials or network are needed; pass
+--url to drive a running server instead (peak RSS is then not reported).
+Every size is cleared with DELETE /data?session_id= once measured.
+
+Usage: python benchmarks/load_test.py [--rows N [N ...]] [--format xlsx|csv]
+       [--sample NAME] [--uploads N] [--requests N] [--concurrency N]
+       [--page-size N] [--latency-ms MS] [--url URL]
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import httpx
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_serialization import ROOT_DIR, load_samples  # noqa: E402
+
+CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+}
+
+
+def scale_sample(df, rows):
+    """Tile df to exactly rows rows"""
+    repeat = -(-rows // len(df))
+    return pd.concat([df] * repeat, ignore_index=True).iloc[:rows]
+
+
+def write_upload(df, path, export_format, batch):
+    """Write df with a Batch column, so every upload has new content and is not deduplicated"""
+    df = df.assign(Batch=batch)
+    if export_format == 'xlsx':
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, ru_maxrss is in KiB on Linux and bytes on macOS"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def report(name, timings, elapsed, rows=None, rss=None):
+    line = (
+        f"  {name:<10} {len(timings):>6} {percentile(timings, 0.5) * 1000:>9.1f}ms"
+        f" {percentile(timings, 0.99) * 1000:>9.1f}ms {max(timings) * 1000:>9.1f}ms"
+        f" {len(timings) / elapsed:>9.1f}/s"
+    )
+    if rows is not None:
+        line += f" {rows / elapsed:>11.0f} rows/s"
+    if rss is not None:
+        line += f"  peak RSS {rss:.0f} MB"
+    print(line)
+
+
+async def check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text}")
+    return response
+
+
+async def run_uploads(client, paths, export_format):
+    """Upload paths one after the other, return the latencies and the session ids"""
+    timings = []
+    session_ids = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            content = f.read()
+        start = time.perf_counter()
+        response = await check(await client.post(
+            '/upload-excel', files={'file': (os.path.basename(path), content, CONTENT_TYPES[export_format])}
+        ))
+        timings.append(time.perf_counter() - start)
+        session_ids.append(response.json()['session_id'])
+    return timings, session_ids
+
+
+async def check_first_page(client, session_id, rows, page_size):
+    """
+    Read the page at offset 0, which Firebase renders as an array rather than
+    an object since its keys are 0..n, and check it holds every row asked for
+    """
+    response = await check(await client.get('/data', params={'session_id': session_id, 'limit': page_size}))
+    count = response.json()['count']
+    if count != min(page_size, rows):
+        raise RuntimeError(f"The first page of {rows} rows holds {count} rows instead of {min(page_size, rows)}")
+
+
+async def run_reads(client, session_id, rows, requests, concurrency, page_size):
+    """Send requests random page and row reads, concurrency at a time"""
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        if random.random() < 0.5:
+            queue.put_nowait(('data', '/data', {
+                'session_id': session_id, 'limit': page_size, 'offset': random.randrange(0, max(1, rows - page_size)),
+            }))
+        else:
+            queue.put_nowait(('row', f'/data/{random.randrange(rows)}', {'session_id': session_id}))
+
+    timings = {'data': [], 'row': []}
+
+    async def worker():
+        while not queue.empty():
+            name, path, params = queue.get_nowait()
+            start = time.perf_counter()
+            await check(await client.get(path, params=params))
+            timings[name].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timings, time.perf_counter() - start
+
+
+async def run(args, client, sample, directory, measure_rss):
+    print(f"{'':<12} {'count':>6} {'p50':>11} {'p99':>11} {'max':>11} {'throughput':>11}")
+    for rows in args.rows:
+        df = scale_sample(sample, rows)
+        paths = []
+        for batch in range(args.uploads):
+            path = os.path.join(directory, f'load_{rows}_{batch}.{args.format}')
+            write_upload(df, path, args.format, batch)
+            paths.append(path)
+
+        print(f"{rows} rows, {df.shape[1] + 1} columns, {os.path.getsize(paths[0]) / 1e6:.1f} MB {args.format}")
+
+        start = time.perf_counter()
+        upload_timings, session_ids = await run_uploads(client, paths, args.format)
+        session_id = session_ids[-1]
+        elapsed = time.perf_counter() - start
+        report('upload', upload_timings, elapsed, rows=rows * len(paths),
+               rss=peak_rss_mb() if measure_rss else None)
+
+        await check_first_page(client, session_id, rows, args.page_size)
+        read_timings, elapsed = await run_reads(
+            client, session_id, rows, args.requests, args.concurrency, args.page_size
+        )
+        for name, timings in read_timings.items():
+            if timings:
+                report(name, timings, elapsed)
+        report('reads', read_timings['data'] + read_timings['row'], elapsed,
+               rss=peak_rss_mb() if measure_rss else None)
+
+        for uploaded in set(session_ids):
+            await check(await client.delete('/data', params={'session_id': uploaded}))
+        for path in paths:
+            os.remove(path)
+
+
+async def run_in_process(args, sample, directory):
+    """Import the app against the fake Firebase and drive it over ASGI"""
+    os.environ['FIREBASE_FAKE'] = '1'
+    os.environ['FAKE_FIREBASE_LATENCY_MS'] = str(args.latency_ms)
+    backend_dir = os.path.join(ROOT_DIR, 'backend')
+    os.chdir(backend_dir)
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://load-test', timeout=None) as client:
+            await run(args, client, sample, directory, measure_rss=True)
+
+
+async def run_remote(args, sample, directory):
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        await run(args, client, sample, directory, measure_rss=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='row counts to test, up to 1000000')
+    parser.add_argument('--format', choices=sorted(CONTENT_TYPES), default='xlsx', help='upload file format')
+    parser.add_argument('--sample', default='sample_employee_data.xlsx', help='sample workbook to scale up')
+    parser.add_argument('--uploads', type=int, default=3, help='uploads per row count')
+    parser.add_argument('--requests', type=int, default=500, help='read requests per row count')
+    parser.add_argument('--concurrency', type=int, default=16, help='read requests in flight')
+    parser.add_argument('--page-size', type=int, default=100, help='rows per /data page')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='delay added to every fake Firebase call, in-process only')
+    parser.add_argument('--url', help='base URL of a running server instead of the in-process app')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random reads')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        samples = load_samples(directory)
+        if args.sample not in samples:
+            parser.error(f"unknown sample {args.sample}, choose from {', '.join(samples)}")
+
+        if args.url:
+            asyncio.run(run_remote(args, samples[args.sample], directory))
+        else:
+            asyncio.run(run_in_process(args, samples[args.sample], directory))
+
+
+if __name__ == "__main__":
+    main()
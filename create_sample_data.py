@@ -1,209 +1,497 @@
-import pandas as pd
+"""
+Generate sample and synthetic workbooks for testing and benchmarking.
+
+Without arguments, writes the seven sample_*.xlsx files used to try the app.
+With --rows it writes one synthetic table instead, either with a mix of
+generated column types or with the columns of one of the samples, scaled to
+any row count. Columns are generated with numpy in one go and .xlsx files are
+written as sheet XML directly rather than cell by cell through openpyxl, so
+multi-million-row fixtures take seconds.
+
+Usage:
+    python create_sample_data.py
+    python create_sample_data.py --rows 1000000 [--columns 10]
+        [--types int=3,float=2,category=2,text=1,date=1,bool=1]
+        [--null-ratio 0.05] [--sheets 3] [--format xlsx|csv|tsv]
+        [--sample employee] [--seed 0] [--output PATH]
+"""
+import argparse
+import os
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
 import numpy as np
-from datetime import datetime, timedelta
-import random
+import pandas as pd
+
+DEFAULT_TYPE_MIX = 'int=3,float=2,category=2,text=1,date=1,bool=1'
+
+CATEGORIES = ['North', 'South', 'East', 'West', 'Central', 'Online', 'Retail', 'Wholesale']
+FIRST_NAMES = ['John', 'Jane', 'Mike', 'Sarah', 'David', 'Lisa', 'Tom', 'Emma', 'Alex', 'Maria']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez']
+
+# Rows of sheet XML built and compressed at a time
+XLSX_CHUNK_ROWS = 50000
+
+
+def labels(prefix, numbers, suffix=''):
+    """Vectorized f'{prefix}{number}{suffix}'"""
+    return (prefix + pd.Series(numbers).astype(str) + suffix).to_numpy(dtype=object)
+
+
+def random_dates(rng, rows, days):
+    """Datetimes up to days days before now, whole days apart like the original samples"""
+    now = pd.Timestamp.now().floor('s')
+    return now - pd.to_timedelta(rng.integers(0, days, rows), unit='D')
+
+
+# Sample tables, one builder per sample_*.xlsx file
+
+def employee_table(rows, rng):
+    ids = np.arange(1, rows + 1)
+    return pd.DataFrame({
+        'Employee_ID': ids,
+        'Name': labels('Employee_', ids),
+        'Department': rng.choice(['IT', 'HR', 'Finance', 'Marketing', 'Sales'], rows),
+        'Position': rng.choice(['Manager', 'Senior', 'Junior', 'Intern'], rows),
+        'Salary': rng.integers(30000, 120000, rows),
+        'Age': rng.integers(22, 65, rows),
+        'Experience_Years': rng.integers(0, 20, rows),
+        'Location': rng.choice(['New York', 'London', 'Tokyo', 'Berlin', 'Sydney'], rows),
+        'Hire_Date': random_dates(rng, rows, 365 * 5),
+        'Performance_Score': rng.uniform(3.0, 5.0, rows).round(2),
+        'Projects_Completed': rng.integers(1, 25, rows),
+        'Is_Active': rng.random(rows) < 0.8,
+    })
+
+
+def sales_table(rows, rng):
+    quantity = rng.integers(1, 10, rows)
+    unit_price = rng.uniform(100, 2000, rows).round(2)
+    return pd.DataFrame({
+        'Order_ID': np.arange(1001, 1001 + rows),
+        'Customer_Name': labels('Customer_', np.arange(1, rows + 1)),
+        'Product': rng.choice(['Laptop', 'Phone', 'Tablet', 'Monitor', 'Keyboard'], rows),
+        'Quantity': quantity,
+        'Unit_Price': unit_price,
+        'Total_Amount': quantity * unit_price,
+        'Order_Date': random_dates(rng, rows, 365),
+        'Payment_Method': rng.choice(['Credit Card', 'Debit Card', 'Cash', 'Bank Transfer'], rows),
+        'Region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'Sales_Rep': labels('Sales_', rng.integers(1, 11, rows)),
+        'Status': rng.choice(['Completed', 'Pending', 'Cancelled'], rows, p=[0.7, 0.2, 0.1]),
+    })
+
+
+def inventory_table(rows, rng):
+    stock = rng.integers(0, 500, rows)
+    reorder = rng.integers(10, 50, rows)
+    unit_cost = rng.uniform(5, 200, rows).round(2)
+    return pd.DataFrame({
+        'Product_ID': np.arange(2001, 2001 + rows),
+        'Product_Name': labels('Product_', np.arange(1, rows + 1)),
+        'Category': rng.choice(['Electronics', 'Clothing', 'Books', 'Home', 'Sports'], rows),
+        'Brand': rng.choice(['Brand_A', 'Brand_B', 'Brand_C', 'Brand_D'], rows),
+        'Stock_Quantity': stock,
+        'Reorder_Level': reorder,
+        'Unit_Cost': unit_cost,
+        # 30-50% markup
+        'Selling_Price': unit_cost * (1 + rng.uniform(0.3, 0.5, rows)),
+        'Supplier': labels('Supplier_', rng.integers(1, 21, rows)),
+        'Last_Updated': random_dates(rng, rows, 30),
+        'Location': rng.choice(['Warehouse_A', 'Warehouse_B', 'Store_1', 'Store_2'], rows),
+        'Status': np.where(stock <= reorder, 'Low Stock', 'In Stock'),
+    })
+
+
+def student_table(rows, rng):
+    test = rng.integers(50, 101, rows)
+    assignment = rng.integers(60, 101, rows)
+    participation = rng.integers(70, 101, rows)
+    attendance = rng.integers(80, 101, rows)
+    return pd.DataFrame({
+        'Student_ID': np.arange(3001, 3001 + rows),
+        'Name': labels('Student_', np.arange(1, rows + 1)),
+        'Age': rng.integers(16, 25, rows),
+        'Grade': rng.choice(['9th', '10th', '11th', '12th'], rows),
+        'Subject': rng.choice(['Math', 'Science', 'English', 'History', 'Art'], rows),
+        'Test_Score': test,
+        'Assignment_Score': assignment,
+        'Participation': participation,
+        'Attendance': attendance,
+        # Weighted average
+        'Final_Grade': (test * 0.4 + assignment * 0.3 + participation * 0.2 + attendance * 0.1).round(1),
+        'Teacher': labels('Teacher_', rng.integers(1, 11, rows)),
+        'Parent_Contact': labels('+1-555-', rng.integers(1000, 9999, rows)),
+        'Enrollment_Date': random_dates(rng, rows, 365 * 2),
+    })
+
+
+def customer_table(rows, rng):
+    ids = np.arange(1, rows + 1)
+    return pd.DataFrame({
+        'Customer_ID': np.arange(4001, 4001 + rows),
+        'First_Name': np.resize(FIRST_NAMES, rows),
+        'Last_Name': np.resize(LAST_NAMES, rows),
+        'Email': labels('customer', ids, '@email.com'),
+        'Phone': labels('+1-555-', rng.integers(1000, 9999, rows)),
+        'Age': rng.integers(18, 80, rows),
+        'Gender': rng.choice(['Male', 'Female', 'Other'], rows),
+        'City': rng.choice(['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix', 'Philadelphia',
+                            'San Antonio', 'San Diego', 'Dallas', 'San Jose'], rows),
+        'State': rng.choice(['NY', 'CA', 'IL', 'TX', 'AZ', 'PA', 'FL', 'OH', 'GA', 'NC'], rows),
+        'Zip_Code': labels('', rng.integers(10000, 99999, rows)),
+        'Membership_Level': rng.choice(['Bronze', 'Silver', 'Gold', 'Platinum'], rows, p=[0.4, 0.3, 0.2, 0.1]),
+        'Total_Purchases': rng.integers(0, 10000, rows),
+        'Last_Purchase_Date': random_dates(rng, rows, 365 * 2),
+        'Is_Active': rng.random(rows) < 0.8,
+    })
+
+
+def weather_table(rows, rng):
+    # Daily readings, one a minute past a century so the dates stay in range
+    temperature = rng.uniform(-10, 35, rows).round(1)
+    return pd.DataFrame({
+        'Date': pd.date_range(end=pd.Timestamp.now().floor('s'), periods=rows,
+                              freq='D' if rows <= 36500 else 'min'),
+        'Temperature_C': temperature,
+        'Temperature_F': temperature * 9 / 5 + 32,
+        'Humidity': rng.integers(20, 95, rows),
+        'Pressure': rng.uniform(980, 1030, rows).round(1),
+        'Wind_Speed': rng.uniform(0, 50, rows).round(1),
+        'Wind_Direction': rng.choice(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'], rows),
+        'Precipitation': rng.uniform(0, 50, rows).round(2),
+        'UV_Index': rng.integers(0, 11, rows),
+        'Visibility': rng.uniform(5, 25, rows).round(1),
+        'Weather_Condition': rng.choice(['Sunny', 'Cloudy', 'Rainy', 'Snowy', 'Foggy', 'Stormy'], rows),
+        'Location': np.full(rows, 'Weather Station A', dtype=object),
+    })
+
+
+def simple_table(rows, rng):
+    ids = np.arange(1, rows + 1)
+    return pd.DataFrame({
+        'ID': ids,
+        'Name': labels('Item_', ids),
+        'Value': rng.integers(1, 100, rows),
+        'Category': rng.choice(['A', 'B', 'C'], rows),
+        'Active': rng.random(rows) < 0.5,
+    })
+
+
+# name: (builder, seed, default rows, description)
+SAMPLES = {
+    'employee': (employee_table, 42, 50, 'Employee management data'),
+    'sales': (sales_table, 123, 100, 'Sales and financial data'),
+    'inventory': (inventory_table, 456, 100, 'Inventory management data'),
+    'student': (student_table, 789, 100, 'Academic and student data'),
+    'customer': (customer_table, 321, 100, 'Customer relationship data'),
+    'weather': (weather_table, 654, 100, 'Time series weather data'),
+    'simple': (simple_table, 987, 20, 'Simple test data'),
+}
+
+
+# Synthetic tables with a configurable mix of column types
+
+COLUMN_TYPES = {
+    'int': lambda rng, rows: rng.integers(0, 1_000_000, rows),
+    'float': lambda rng, rows: rng.normal(1000, 250, rows).round(2),
+    'category': lambda rng, rows: rng.choice(CATEGORIES, rows),
+    'text': lambda rng, rows: labels('Item_', rng.integers(0, 10 * rows, rows)),
+    'date': lambda rng, rows: random_dates(rng, rows, 365 * 10),
+    'bool': lambda rng, rows: rng.random(rows) < 0.5,
+}
+
+
+def parse_type_mix(spec):
+    """Parse 'int=3,float=2,...' into a list of column types repeated by weight, round robin"""
+    weights = {}
+    for item in spec.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in COLUMN_TYPES:
+            raise ValueError(f"Unknown column type '{name}', choose from {', '.join(COLUMN_TYPES)}")
+        weights[name] = int(weight or 1)
+    if not any(weights.values()):
+        raise ValueError("The type mix needs at least one column type")
+
+    # int=2,float=1 gives int, float, int so a few columns still get every type
+    pattern = []
+    for turn in range(max(weights.values())):
+        pattern.extend(name for name, weight in weights.items() if weight > turn)
+    return pattern
+
+
+def synthetic_table(rows, columns, rng, type_mix=DEFAULT_TYPE_MIX):
+    """An ID column followed by columns - 1 columns cycling through the type mix"""
+    pattern = parse_type_mix(type_mix)
+    data = {'ID': np.arange(1, rows + 1)}
+    for position in range(columns - 1):
+        column_type = pattern[position % len(pattern)]
+        data[f'{column_type.title()}_{position + 1}'] = COLUMN_TYPES[column_type](rng, rows)
+    return pd.DataFrame(data)
+
+
+def apply_nulls(df, null_ratio, rng):
+    """Blank out about null_ratio of the cells of every column but the first"""
+    if null_ratio <= 0:
+        return df
+    for column in df.columns[1:]:
+        mask = rng.random(len(df)) < null_ratio
+        values = df[column]
+        if pd.api.types.is_integer_dtype(values):
+            values = values.astype('Int64')
+        elif pd.api.types.is_bool_dtype(values):
+            values = values.astype(object)
+        df[column] = values.mask(mask)
+    return df
+
+
+# Writers
+
+def column_letter(index):
+    """Spreadsheet column name of a 0-based column index"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def cell_xml(values):
+    """Render a column as an array of <c> elements, type by type"""
+    missing = pd.isna(values).to_numpy()
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+
+    if kind == 'boolean':
+        text = pd.Series(np.where(missing, 0, values.fillna(False).astype(bool)).astype(int)).astype(str)
+        cells = '<c t="b"><v>' + text + '</v></c>'
+    elif kind in ('datetime64', 'datetime', 'date'):
+        # Days since 1899-12-30, shown with the date style of styles.xml
+        serials = (pd.to_datetime(values) - pd.Timestamp('1899-12-30')) / pd.Timedelta(days=1)
+        cells = '<c s="1"><v>' + serials.round(8).astype(str) + '</v></c>'
+    elif kind in ('integer', 'floating', 'mixed-integer-float', 'decimal'):
+        cells = '<c><v>' + values.astype(str) + '</v></c>'
+    else:
+        text = (values.fillna('').astype(str).str.replace('&', '&amp;', regex=False)
+                .str.replace('<', '&lt;', regex=False).str.replace('>', '&gt;', regex=False))
+        cells = '<c t="inlineStr"><is><t xml:space="preserve">' + text + '</t></is></c>'
 
-def create_employee_data():
+    cells = cells.to_numpy(dtype=object)
+    cells[missing] = '<c/>'
+    return cells
+
+
+WORKSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+STYLES_XML = (
+    f'<styleSheet xmlns="{WORKSHEET_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def write_sheet_xml(stream, df, chunk_rows):
+    last_cell = f'{column_letter(max(len(df.columns), 1) - 1)}{len(df) + 1}'
+    stream.write(
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{WORKSHEET_NS}">'
+        f'<dimension ref="A1:{last_cell}"/><sheetData>'.encode()
+    )
+    header = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(column))}</t></is></c>' for column in df.columns
+    )
+    stream.write(f'<row>{header}</row>'.encode())
+
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        rows = np.full(len(chunk), '<row>', dtype=object)
+        for column in chunk.columns:
+            rows += cell_xml(chunk[column].reset_index(drop=True))
+        rows += '</row>'
+        stream.write(''.join(rows).encode('utf-8'))
+
+    stream.write(b'</sheetData></worksheet>')
+
+
+def write_xlsx(path, sheets, chunk_rows=XLSX_CHUNK_ROWS):
+    """Write {sheet name: DataFrame} as an .xlsx workbook with inline strings"""
+    names = list(sheets)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as workbook:
+        workbook.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            + ''.join(
+                f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for n in range(1, len(names) + 1)
+            )
+            + '</Types>'
+        ))
+        workbook.writestr('_rels/.rels', (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="{PACKAGE_NS}">'
+            f'<Relationship Id="rId1" Type="{RELATIONSHIP_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        workbook.writestr('xl/workbook.xml', (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{WORKSHEET_NS}" xmlns:r="{RELATIONSHIP_NS}"><sheets>'
+            + ''.join(
+                f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{n}" r:id="rId{n}"/>'
+                for n, name in enumerate(names, 1)
+            )
+            + '</sheets></workbook>'
+        ))
+        workbook.writestr('xl/_rels/workbook.xml.rels', (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="{PACKAGE_NS}">'
+            + ''.join(
+                f'<Relationship Id="rId{n}" Type="{RELATIONSHIP_NS}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                for n in range(1, len(names) + 1)
+            )
+            + f'<Relationship Id="rId{len(names) + 1}" Type="{RELATIONSHIP_NS}/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ))
+        workbook.writestr('xl/styles.xml', STYLES_XML)
+        for n, name in enumerate(names, 1):
+            with workbook.open(f'xl/worksheets/sheet{n}.xml', 'w', force_zip64=True) as stream:
+                write_sheet_xml(stream, sheets[name], chunk_rows)
+
+
+def write_table(path, sheets, file_format):
+    """Write sheets as one workbook, or one CSV/TSV file per sheet, and return the paths"""
+    if file_format == 'xlsx':
+        write_xlsx(path, sheets)
+        return [path]
+
+    stem, suffix = os.path.splitext(path)
+    paths = []
+    for name, df in sheets.items():
+        sheet_path = path if len(sheets) == 1 else f'{stem}_{name}{suffix}'
+        df.to_csv(sheet_path, index=False, sep='\t' if file_format == 'tsv' else ',',
+                  date_format='%Y-%m-%d %H:%M:%S')
+        paths.append(sheet_path)
+    return paths
+
+
+def create_sample(name, rows=None):
+    """Write sample_{name}_data.xlsx, with the sample's original row count by default"""
+    builder, seed, default_rows, _ = SAMPLES[name]
+    rows = default_rows if rows is None else rows
+    filename = f'sample_{name}_data.xlsx'
+    write_xlsx(filename, {'Sheet1': builder(rows, np.random.default_rng(seed))})
+    print(f"✅ Created: {filename} ({rows} {name} records)")
+
+
+def create_employee_data(rows=None):
     """Create employee data with various fields"""
-    np.random.seed(42)
-    
-    data = {
-        'Employee_ID': range(1, 51),
-        'Name': [f'Employee_{i}' for i in range(1, 51)],
-        'Department': np.random.choice(['IT', 'HR', 'Finance', 'Marketing', 'Sales'], 50),
-        'Position': np.random.choice(['Manager', 'Senior', 'Junior', 'Intern'], 50),
-        'Salary': np.random.randint(30000, 120000, 50),
-        'Age': np.random.randint(22, 65, 50),
-        'Experience_Years': np.random.randint(0, 20, 50),
-        'Location': np.random.choice(['New York', 'London', 'Tokyo', 'Berlin', 'Sydney'], 50),
-        'Hire_Date': [datetime.now() - timedelta(days=np.random.randint(0, 365*5)) for _ in range(50)],
-        'Performance_Score': np.random.uniform(3.0, 5.0, 50).round(2),
-        'Projects_Completed': np.random.randint(1, 25, 50),
-        'Is_Active': np.random.choice([True, False], 50, p=[0.8, 0.2])
-    }
-    
-    df = pd.DataFrame(data)
-    df.to_excel('sample_employee_data.xlsx', index=False)
-    print("✅ Created: sample_employee_data.xlsx (50 employee records)")
-
-def create_sales_data():
+    create_sample('employee', rows)
+
+
+def create_sales_data(rows=None):
     """Create sales data with financial fields"""
-    np.random.seed(123)
-    
-    data = {
-        'Order_ID': range(1001, 1101),
-        'Customer_Name': [f'Customer_{i}' for i in range(1, 101)],
-        'Product': np.random.choice(['Laptop', 'Phone', 'Tablet', 'Monitor', 'Keyboard'], 100),
-        'Quantity': np.random.randint(1, 10, 100),
-        'Unit_Price': np.random.uniform(100, 2000, 100).round(2),
-        'Total_Amount': [],
-        'Order_Date': [datetime.now() - timedelta(days=np.random.randint(0, 365)) for _ in range(100)],
-        'Payment_Method': np.random.choice(['Credit Card', 'Debit Card', 'Cash', 'Bank Transfer'], 100),
-        'Region': np.random.choice(['North', 'South', 'East', 'West'], 100),
-        'Sales_Rep': [f'Sales_{i}' for i in np.random.randint(1, 11, 100)],
-        'Status': np.random.choice(['Completed', 'Pending', 'Cancelled'], 100, p=[0.7, 0.2, 0.1])
-    }
-    
-    # Calculate total amount
-    data['Total_Amount'] = [data['Quantity'][i] * data['Unit_Price'][i] for i in range(100)]
-    
-    df = pd.DataFrame(data)
-    df.to_excel('sample_sales_data.xlsx', index=False)
-    print("✅ Created: sample_sales_data.xlsx (100 sales records)")
-
-def create_inventory_data():
+    create_sample('sales', rows)
+
+
+def create_inventory_data(rows=None):
     """Create inventory data with stock management fields"""
-    np.random.seed(456)
-    
-    data = {
-        'Product_ID': range(2001, 2101),
-        'Product_Name': [f'Product_{i}' for i in range(1, 101)],
-        'Category': np.random.choice(['Electronics', 'Clothing', 'Books', 'Home', 'Sports'], 100),
-        'Brand': np.random.choice(['Brand_A', 'Brand_B', 'Brand_C', 'Brand_D'], 100),
-        'Stock_Quantity': np.random.randint(0, 500, 100),
-        'Reorder_Level': np.random.randint(10, 50, 100),
-        'Unit_Cost': np.random.uniform(5, 200, 100).round(2),
-        'Selling_Price': [],
-        'Supplier': [f'Supplier_{i}' for i in np.random.randint(1, 21, 100)],
-        'Last_Updated': [datetime.now() - timedelta(days=np.random.randint(0, 30)) for _ in range(100)],
-        'Location': np.random.choice(['Warehouse_A', 'Warehouse_B', 'Store_1', 'Store_2'], 100),
-        'Status': []
-    }
-    
-    # Calculate selling price (30-50% markup)
-    for i in range(100):
-        markup = np.random.uniform(0.3, 0.5)
-        data['Selling_Price'].append(data['Unit_Cost'][i] * (1 + markup))
-    
-    # Set status based on stock level
-    data['Status'] = ['Low Stock' if data['Stock_Quantity'][i] <= data['Reorder_Level'][i] else 'In Stock' for i in range(100)]
-    
-    df = pd.DataFrame(data)
-    df.to_excel('sample_inventory_data.xlsx', index=False)
-    print("✅ Created: sample_inventory_data.xlsx (100 inventory records)")
-
-def create_student_data():
+    create_sample('inventory', rows)
+
+
+def create_student_data(rows=None):
     """Create student data with academic fields"""
-    np.random.seed(789)
-    
-    data = {
-        'Student_ID': range(3001, 3101),
-        'Name': [f'Student_{i}' for i in range(1, 101)],
-        'Age': np.random.randint(16, 25, 100),
-        'Grade': np.random.choice(['9th', '10th', '11th', '12th'], 100),
-        'Subject': np.random.choice(['Math', 'Science', 'English', 'History', 'Art'], 100),
-        'Test_Score': np.random.randint(50, 101, 100),
-        'Assignment_Score': np.random.randint(60, 101, 100),
-        'Participation': np.random.randint(70, 101, 100),
-        'Attendance': np.random.randint(80, 101, 100),
-        'Final_Grade': [],
-        'Teacher': [f'Teacher_{i}' for i in np.random.randint(1, 11, 100)],
-        'Parent_Contact': [f'+1-555-{np.random.randint(1000, 9999)}' for _ in range(100)],
-        'Enrollment_Date': [datetime.now() - timedelta(days=np.random.randint(0, 365*2)) for _ in range(100)]
-    }
-    
-    # Calculate final grade (weighted average)
-    for i in range(100):
-        final_grade = (data['Test_Score'][i] * 0.4 + 
-                      data['Assignment_Score'][i] * 0.3 + 
-                      data['Participation'][i] * 0.2 + 
-                      data['Attendance'][i] * 0.1)
-        data['Final_Grade'].append(round(final_grade, 1))
-    
-    df = pd.DataFrame(data)
-    df.to_excel('sample_student_data.xlsx', index=False)
-    print("✅ Created: sample_student_data.xlsx (100 student records)")
-
-def create_customer_data():
+    create_sample('student', rows)
+
+
+def create_customer_data(rows=None):
     """Create customer data with contact and preference fields"""
-    np.random.seed(321)
-    
-    data = {
-        'Customer_ID': range(4001, 4101),
-        'First_Name': [f'John', 'Jane', 'Mike', 'Sarah', 'David', 'Lisa', 'Tom', 'Emma', 'Alex', 'Maria'] * 10,
-        'Last_Name': [f'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez'] * 10,
-        'Email': [f'customer{i}@email.com' for i in range(1, 101)],
-        'Phone': [f'+1-555-{np.random.randint(1000, 9999)}' for _ in range(100)],
-        'Age': np.random.randint(18, 80, 100),
-        'Gender': np.random.choice(['Male', 'Female', 'Other'], 100),
-        'City': np.random.choice(['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix', 'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose'], 100),
-        'State': np.random.choice(['NY', 'CA', 'IL', 'TX', 'AZ', 'PA', 'FL', 'OH', 'GA', 'NC'], 100),
-        'Zip_Code': [f'{np.random.randint(10000, 99999)}' for _ in range(100)],
-        'Membership_Level': np.random.choice(['Bronze', 'Silver', 'Gold', 'Platinum'], 100, p=[0.4, 0.3, 0.2, 0.1]),
-        'Total_Purchases': np.random.randint(0, 10000, 100),
-        'Last_Purchase_Date': [datetime.now() - timedelta(days=np.random.randint(0, 365*2)) for _ in range(100)],
-        'Is_Active': np.random.choice([True, False], 100, p=[0.8, 0.2])
-    }
-    
-    df = pd.DataFrame(data)
-    df.to_excel('sample_customer_data.xlsx', index=False)
-    print("✅ Created: sample_customer_data.xlsx (100 customer records)")
-
-def create_weather_data():
+    create_sample('customer', rows)
+
+
+def create_weather_data(rows=None):
     """Create weather data with time series and numeric fields"""
-    np.random.seed(654)
-    
-    # Generate 100 days of weather data
-    start_date = datetime.now() - timedelta(days=100)
-    dates = [start_date + timedelta(days=i) for i in range(100)]
-    
-    data = {
-        'Date': dates,
-        'Temperature_C': np.random.uniform(-10, 35, 100).round(1),
-        'Temperature_F': [],
-        'Humidity': np.random.randint(20, 95, 100),
-        'Pressure': np.random.uniform(980, 1030, 100).round(1),
-        'Wind_Speed': np.random.uniform(0, 50, 100).round(1),
-        'Wind_Direction': np.random.choice(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'], 100),
-        'Precipitation': np.random.uniform(0, 50, 100).round(2),
-        'UV_Index': np.random.randint(0, 11, 100),
-        'Visibility': np.random.uniform(5, 25, 100).round(1),
-        'Weather_Condition': np.random.choice(['Sunny', 'Cloudy', 'Rainy', 'Snowy', 'Foggy', 'Stormy'], 100),
-        'Location': ['Weather Station A'] * 100
-    }
-    
-    # Convert Celsius to Fahrenheit
-    data['Temperature_F'] = [(temp * 9/5) + 32 for temp in data['Temperature_C']]
-    
-    df = pd.DataFrame(data)
-    df.to_excel('sample_weather_data.xlsx', index=False)
-    print("✅ Created: sample_weather_data.xlsx (100 weather records)")
-
-def create_simple_data():
+    create_sample('weather', rows)
+
+
+def create_simple_data(rows=None):
     """Create simple data with basic fields for testing"""
-    np.random.seed(987)
-    
-    data = {
-        'ID': range(1, 21),
-        'Name': [f'Item_{i}' for i in range(1, 21)],
-        'Value': np.random.randint(1, 100, 20),
-        'Category': np.random.choice(['A', 'B', 'C'], 20),
-        'Active': np.random.choice([True, False], 20)
-    }
-    
-    df = pd.DataFrame(data)
-    df.to_excel('sample_simple_data.xlsx', index=False)
-    print("✅ Created: sample_simple_data.xlsx (20 simple records)")
+    create_sample('simple', rows)
 
-if __name__ == "__main__":
+
+def create_all_samples():
     print("🎯 Creating multiple sample Excel files for testing...\n")
-    
-    create_employee_data()
-    create_sales_data()
-    create_inventory_data()
-    create_student_data()
-    create_customer_data()
-    create_weather_data()
-    create_simple_data()
-    
+
+    for name in SAMPLES:
+        create_sample(name)
+
     print("\n🎉 All sample files created successfully!")
     print("\n📁 Files created:")
-    print("• sample_employee_data.xlsx - Employee management data")
-    print("• sample_sales_data.xlsx - Sales and financial data")
-    print("• sample_inventory_data.xlsx - Inventory management data")
-    print("• sample_student_data.xlsx - Academic and student data")
-    print("• sample_customer_data.xlsx - Customer relationship data")
-    print("• sample_weather_data.xlsx - Time series weather data")
-    print("• sample_simple_data.xlsx - Simple test data")
-    
-    print("\n🚀 Ready to test your Excel Data Processor with various data types!")
\ No newline at end of file
+    for name, (_, _, _, description) in SAMPLES.items():
+        print(f"• sample_{name}_data.xlsx - {description}")
+
+    print("\n🚀 Ready to test your Excel Data Processor with various data types!")
+
+
+def create_synthetic(args):
+    rng = np.random.default_rng(args.seed)
+    output = args.output or f'synthetic_{args.rows}.{args.format}'
+
+    start = time.perf_counter()
+    sheets = {}
+    for n in range(1, args.sheets + 1):
+        if args.sample:
+            df = SAMPLES[args.sample][0](args.rows, rng)
+        else:
+            df = synthetic_table(args.rows, args.columns, rng, args.types)
+        sheets[f'Sheet{n}'] = apply_nulls(df, args.null_ratio, rng)
+    generated = time.perf_counter() - start
+
+    paths = write_table(output, sheets, args.format)
+    written = time.perf_counter() - start - generated
+
+    columns = len(next(iter(sheets.values())).columns)
+    for path in paths:
+        print(f"✅ Created: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"   {args.sheets} sheet(s) x {args.rows} rows x {columns} columns, "
+          f"generated in {generated:.1f}s, written in {written:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, help='rows per sheet of a synthetic table; without it the samples are written')
+    parser.add_argument('--columns', type=int, default=10, help='columns of the synthetic table, ID included')
+    parser.add_argument('--types', default=DEFAULT_TYPE_MIX,
+                        help=f'column type weights, types: {", ".join(COLUMN_TYPES)} (default: %(default)s)')
+    parser.add_argument('--null-ratio', type=float, default=0.0, help='share of empty cells per column')
+    parser.add_argument('--sheets', type=int, default=1, help='sheets per workbook, one file per sheet for csv/tsv')
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'tsv'], default='xlsx', help='output format')
+    parser.add_argument('--sample', choices=sorted(SAMPLES), help='use the columns of a sample instead of --columns/--types')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--output', help='output path, synthetic_{rows}.{format} by default')
+    args = parser.parse_args()
+
+    if args.rows is None:
+        create_all_samples()
+        return
+
+    try:
+        parse_type_mix(args.types)
+    except ValueError as e:
+        parser.error(str(e))
+    create_synthetic(args)
+
+
+if __name__ == "__main__":
+    main()
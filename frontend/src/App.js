@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import 'bootstrap/dist/css/bootstrap.min.css';
 import './App.css';
@@ -9,61 +9,103 @@ import FileUpload from './components/FileUpload';
 // API base URL - use relative path for Vercel deployment
 const API_BASE_URL = process.env.REACT_APP_API_URL || '/api';
 
+// Rows come as one array of values per column, so column names are sent once instead of in every row
+const COLUMNAR_JSON = 'application/vnd.excel-data.columnar+json';
+const EMPTY_TABLE = { columns: [], data: [] };
+
+// The upload this browser made, kept across reloads: { sessionId, sheets }
+const SESSION_STORAGE_KEY = 'excelDataSession';
+
+const loadStoredSession = () => {
+    try {
+        return JSON.parse(window.localStorage.getItem(SESSION_STORAGE_KEY)) || {};
+    } catch (err) {
+        return {};
+    }
+};
+
 function App() {
-    const [data, setData] = useState([]);
+    const [table, setTable] = useState(EMPTY_TABLE);
+    const [stats, setStats] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
     const [success, setSuccess] = useState(null);
+    const [sheets, setSheets] = useState(() => loadStoredSession().sheets || []);
+    const [sheet, setSheet] = useState(null);
+    // Session created by this browser's upload, every request is scoped to it
+    const sessionIdRef = useRef(loadStoredSession().sessionId || null);
+
+    const rowCount = table.data.length > 0 ? table.data[0].length : 0;
+
+    const rememberSession = (sessionId, sheetNames) => {
+        sessionIdRef.current = sessionId;
+        setSheets(sheetNames);
+        setSheet(null);
+        if (sessionId) {
+            window.localStorage.setItem(SESSION_STORAGE_KEY, JSON.stringify({ sessionId, sheets: sheetNames }));
+        } else {
+            window.localStorage.removeItem(SESSION_STORAGE_KEY);
+        }
+    };
 
     // Fetch data from API
-    const fetchData = async () => {
+    const fetchData = async (selectedSheet = sheet) => {
+        // Without an upload of our own there is nothing to show
+        if (!sessionIdRef.current) return;
         setLoading(true);
         setError(null);
         try {
-            const response = await axios.get(`${API_BASE_URL}/data`);
-            setData(response.data.data || []);
+            const params = { session_id: sessionIdRef.current };
+            if (selectedSheet !== null) {
+                params.sheet = selectedSheet;
+            }
+            const [response, statsResponse] = await Promise.all([
+                axios.get(`${API_BASE_URL}/data`, { params, headers: { Accept: COLUMNAR_JSON } }),
+                axios.get(`${API_BASE_URL}/stats`, { params })
+            ]);
+            setTable({ columns: response.data.columns || [], data: response.data.data || [] });
+            setStats(statsResponse.data);
         } catch (err) {
-            setError('Failed to fetch data. Please try again.');
+            if (err.response?.status === 404) {
+                // The session expired or was cleared
+                rememberSession(null, []);
+                setTable(EMPTY_TABLE);
+                setStats(null);
+            } else {
+                setError('Failed to fetch data. Please try again.');
+            }
             console.error('Error fetching data:', err);
         } finally {
             setLoading(false);
         }
     };
 
-    // Load data on component mount
+    // Show this browser's upload again after a reload, it stays stored until cleared or expired
     useEffect(() => {
         fetchData();
     }, []);
 
-    // Clear data when website is closed/refreshed
-    useEffect(() => {
-        const handleBeforeUnload = async () => {
-            try {
-                // Clear session data from Firebase when user leaves the page
-                await axios.post(`${API_BASE_URL}/session/clear`);
-                console.log('Session data cleared on page unload');
-            } catch (error) {
-                console.error('Error clearing session data on unload:', error);
-            }
-        };
-
-        const handleVisibilityChange = () => {
-            if (document.visibilityState === 'hidden') {
-                // Page is being hidden (user is leaving)
-                handleBeforeUnload();
+    // Follow a background upload job until it ends, resolving with the upload response
+    const waitForJob = (jobId) => new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE_URL}/jobs/${jobId}`);
+        source.addEventListener('progress', (event) => {
+            const job = JSON.parse(event.data);
+            setSuccess(`Processing... ${job.rows_written} rows written.`);
+        });
+        source.addEventListener('done', (event) => {
+            source.close();
+            const job = JSON.parse(event.data);
+            if (job.status === 'succeeded') {
+                resolve(job.result);
+            } else {
+                reject(Object.assign(new Error(job.error), { jobError: job.error }));
             }
+        });
+        source.onerror = () => {
+            source.close();
+            reject(new Error('Lost connection to the upload job'));
         };
-
-        // Add event listeners
-        window.addEventListener('beforeunload', handleBeforeUnload);
-        document.addEventListener('visibilitychange', handleVisibilityChange);
-
-        // Cleanup event listeners
-        return () => {
-            window.removeEventListener('beforeunload', handleBeforeUnload);
-            document.removeEventListener('visibilitychange', handleVisibilityChange);
-        };
-    }, []);
+    });
 
     // Handle file upload
     const handleFileUpload = async (file) => {
@@ -75,16 +117,21 @@ function App() {
         formData.append('file', file);
 
         try {
+            // Large files are processed in the background so the request cannot time out
             const response = await axios.post(`${API_BASE_URL}/upload-excel`, formData, {
                 headers: {
                     'Content-Type': 'multipart/form-data',
                 },
+                params: { job: true },
             });
+            const result = await waitForJob(response.data.job_id);
 
-            setSuccess(`File uploaded successfully! ${response.data.rows_processed} rows processed.`);
-            fetchData(); // Refresh data after upload
+            rememberSession(result.session_id, (result.sheets || []).map(uploaded => uploaded.name));
+            setSuccess(`File uploaded successfully! ${result.rows_processed} rows processed.`);
+            fetchData(null); // Refresh data after upload
         } catch (err) {
-            setError(err.response?.data?.detail || 'Failed to upload file. Please try again.');
+            setSuccess(null);
+            setError(err.response?.data?.detail || err.jobError || 'Failed to upload file. Please try again.');
             console.error('Error uploading file:', err);
         } finally {
             setLoading(false);
@@ -96,8 +143,12 @@ function App() {
         if (window.confirm('Are you sure you want to clear all data?')) {
             setLoading(true);
             try {
-                await axios.delete(`${API_BASE_URL}/data`);
-                setData([]);
+                if (sessionIdRef.current) {
+                    await axios.delete(`${API_BASE_URL}/data`, { params: { session_id: sessionIdRef.current } });
+                }
+                rememberSession(null, []);
+                setTable(EMPTY_TABLE);
+                setStats(null);
                 setSuccess('All data cleared successfully.');
             } catch (err) {
                 setError('Failed to clear data. Please try again.');
@@ -114,7 +165,7 @@ function App() {
                 <header className="text-center mb-4">
                     <h1 className="display-4 text-primary">Excel Data Viewer</h1>
                     <p className="lead">Upload Excel files and view your data in a beautiful interface</p>
-                    <small className="text-muted">Data will be automatically cleared when you close the page</small>
+                    <small className="text-muted">Your upload is kept until you clear it or it expires</small>
                 </header>
 
                 {/* File Upload Section */}
@@ -135,13 +186,32 @@ function App() {
                     </div>
                 )}
 
+                {/* Sheet selection for multi-sheet workbooks */}
+                {sheets.length > 1 && (
+                    <div className="card">
+                        <h3>Sheet</h3>
+                        <select
+                            className="form-select"
+                            value={sheet === null ? sheets[0] : sheet}
+                            onChange={(e) => {
+                                setSheet(e.target.value);
+                                fetchData(e.target.value);
+                            }}
+                        >
+                            {sheets.map(name => (
+                                <option key={name} value={name}>{name}</option>
+                            ))}
+                        </select>
+                    </div>
+                )}
+
                 {/* Statistics */}
-                {data.length > 0 && (
-                    <Statistics data={data} />
+                {stats && stats.rows_count > 0 && (
+                    <Statistics stats={stats} />
                 )}
 
                 {/* Data Table */}
-                {data.length > 0 && (
+                {rowCount > 0 && (
                     <div className="card">
                         <div className="d-flex justify-content-between align-items-center mb-3">
                             <h3>Data Table</h3>
@@ -153,12 +223,12 @@ function App() {
                                 Clear All Data
                             </button>
                         </div>
-                        <DataTable data={data} loading={loading} />
+                        <DataTable columns={table.columns} values={table.data} loading={loading} />
                     </div>
                 )}
 
                 {/* Empty State */}
-                {!loading && data.length === 0 && (
+                {!loading && rowCount === 0 && (
                     <div className="card text-center">
                         <div className="py-5">
                             <h4>No Data Available</h4>
@@ -1,16 +1,22 @@
 import React, { useState, useMemo } from 'react';
 import { useTable, useSortBy, usePagination, useGlobalFilter } from 'react-table';
 
-const DataTable = ({ data, loading }) => {
+// columns holds the column names and values one array of cell values per column, in the same order
+const DataTable = ({ columns: columnNames, values, loading }) => {
     const [searchTerm, setSearchTerm] = useState('');
 
+    // Each table row is just its position, cells are read straight from the column arrays
+    const data = useMemo(() => {
+        const rowCount = values.length > 0 ? values[0].length : 0;
+        return Array.from({ length: rowCount }, (_, rowIndex) => rowIndex);
+    }, [values]);
+
     // Prepare columns for react-table
     const columns = useMemo(() => {
-        if (data.length === 0) return [];
-
-        return Object.keys(data[0]).map(key => ({
-            Header: key.replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase()),
-            accessor: key,
+        return columnNames.map((name, position) => ({
+            id: String(position),
+            Header: String(name).replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase()),
+            accessor: rowIndex => values[position][rowIndex],
             Cell: ({ value }) => {
                 if (typeof value === 'boolean') {
                     return value ? 'Yes' : 'No';
@@ -24,7 +30,7 @@ const DataTable = ({ data, loading }) => {
                 return value;
             }
         }));
-    }, [data]);
+    }, [columnNames, values]);
 
     const {
         getTableProps,
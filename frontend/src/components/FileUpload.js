@@ -12,7 +12,9 @@ const FileUpload = ({ onFileUpload, loading }) => {
         onDrop,
         accept: {
             'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['.xlsx'],
-            'application/vnd.ms-excel': ['.xls']
+            'application/vnd.ms-excel': ['.xls'],
+            'text/csv': ['.csv'],
+            'text/tab-separated-values': ['.tsv']
         },
         multiple: false
     });
@@ -29,15 +31,15 @@ const FileUpload = ({ onFileUpload, loading }) => {
                     <i className="fas fa-cloud-upload-alt" style={{ fontSize: '3rem', color: '#007bff' }}></i>
                 </div>
                 {isDragActive ? (
-                    <p className="mb-0">Drop the Excel file here...</p>
+                    <p className="mb-0">Drop the file here...</p>
                 ) : (
                     <div>
                         <p className="mb-2">
-                            <strong>Drag & drop an Excel file here</strong>
+                            <strong>Drag & drop an Excel, CSV or TSV file here</strong>
                         </p>
                         <p className="mb-3 text-muted">or click to select a file</p>
                         <p className="mb-0 small text-muted">
-                            Supported formats: .xlsx, .xls
+                            Supported formats: .xlsx, .xls, .csv, .tsv
                         </p>
                     </div>
                 )}
@@ -1,57 +1,17 @@
 import React from 'react';
 
-const Statistics = ({ data }) => {
-    // Calculate statistics
-    const stats = React.useMemo(() => {
-        if (!data || data.length === 0) return {};
-
-        const numericColumns = Object.keys(data[0]).filter(key =>
-            typeof data[0][key] === 'number'
-        );
-
-        const categoricalColumns = Object.keys(data[0]).filter(key =>
-            typeof data[0][key] === 'string' || typeof data[0][key] === 'boolean'
-        );
-
-        const stats = {
-            totalRecords: data.length,
-            columns: Object.keys(data[0]).length,
-            numericColumns: numericColumns.length,
-            categoricalColumns: categoricalColumns.length
-        };
-
-        // Calculate numeric statistics
-        numericColumns.forEach(col => {
-            const values = data.map(row => row[col]).filter(val => !isNaN(val));
-            if (values.length > 0) {
-                stats[`${col}_avg`] = (values.reduce((a, b) => a + b, 0) / values.length).toFixed(2);
-                stats[`${col}_min`] = Math.min(...values);
-                stats[`${col}_max`] = Math.max(...values);
-            }
-        });
-
-        // Calculate categorical statistics
-        categoricalColumns.forEach(col => {
-            const values = data.map(row => row[col]);
-            const uniqueValues = [...new Set(values)];
-            stats[`${col}_unique`] = uniqueValues.length;
-
-            // Most common value
-            const valueCounts = {};
-            values.forEach(val => {
-                valueCounts[val] = (valueCounts[val] || 0) + 1;
-            });
-            const mostCommon = Object.entries(valueCounts).sort((a, b) => b[1] - a[1])[0];
-            if (mostCommon) {
-                stats[`${col}_most_common`] = mostCommon[0];
-                stats[`${col}_most_common_count`] = mostCommon[1];
-            }
-        });
+const formatValue = (value) => {
+    if (typeof value === 'number' && !Number.isInteger(value)) return value.toFixed(2);
+    return String(value);
+};
 
-        return stats;
-    }, [data]);
+const Statistics = ({ stats }) => {
+    // Summaries are computed by the backend at upload time
+    if (!stats || !stats.rows_count) return null;
 
-    if (!data || data.length === 0) return null;
+    const columns = stats.columns || [];
+    const numericColumns = columns.filter(column => column.type === 'number' && column.count > 0);
+    const categoricalColumns = columns.filter(column => column.type !== 'number');
 
     return (
         <div className="card">
@@ -60,25 +20,25 @@ const Statistics = ({ data }) => {
                 {/* Basic Stats */}
                 <div className="col-md-3 mb-3">
                     <div className="stats-card text-center">
-                        <div className="stats-number">{stats.totalRecords}</div>
+                        <div className="stats-number">{stats.rows_count}</div>
                         <div className="stats-label">Total Records</div>
                     </div>
                 </div>
                 <div className="col-md-3 mb-3">
                     <div className="stats-card text-center">
-                        <div className="stats-number">{stats.columns}</div>
+                        <div className="stats-number">{stats.columns_count}</div>
                         <div className="stats-label">Total Columns</div>
                     </div>
                 </div>
                 <div className="col-md-3 mb-3">
                     <div className="stats-card text-center">
-                        <div className="stats-number">{stats.numericColumns}</div>
+                        <div className="stats-number">{stats.numeric_columns}</div>
                         <div className="stats-label">Numeric Columns</div>
                     </div>
                 </div>
                 <div className="col-md-3 mb-3">
                     <div className="stats-card text-center">
-                        <div className="stats-number">{stats.categoricalColumns}</div>
+                        <div className="stats-number">{stats.categorical_columns}</div>
                         <div className="stats-label">Categorical Columns</div>
                     </div>
                 </div>
@@ -99,17 +59,14 @@ const Statistics = ({ data }) => {
                                 </tr>
                             </thead>
                             <tbody>
-                                {Object.keys(stats).filter(key => key.includes('_avg')).map(key => {
-                                    const columnName = key.replace('_avg', '');
-                                    return (
-                                        <tr key={key}>
-                                            <td><strong>{columnName.replace(/_/g, ' ')}</strong></td>
-                                            <td>{stats[key]}</td>
-                                            <td>{stats[`${columnName}_min`]}</td>
-                                            <td>{stats[`${columnName}_max`]}</td>
-                                        </tr>
-                                    );
-                                })}
+                                {numericColumns.map(column => (
+                                    <tr key={String(column.name)}>
+                                        <td><strong>{String(column.name).replace(/_/g, ' ')}</strong></td>
+                                        <td>{formatValue(column.mean)}</td>
+                                        <td>{formatValue(column.min)}</td>
+                                        <td>{formatValue(column.max)}</td>
+                                    </tr>
+                                ))}
                             </tbody>
                         </table>
                     </div>
@@ -126,15 +83,14 @@ const Statistics = ({ data }) => {
                                 </tr>
                             </thead>
                             <tbody>
-                                {Object.keys(stats).filter(key => key.includes('_unique')).map(key => {
-                                    const columnName = key.replace('_unique', '');
+                                {categoricalColumns.map(column => {
+                                    const mostCommon = column.top && column.top[0];
                                     return (
-                                        <tr key={key}>
-                                            <td><strong>{columnName.replace(/_/g, ' ')}</strong></td>
-                                            <td>{stats[key]}</td>
+                                        <tr key={String(column.name)}>
+                                            <td><strong>{String(column.name).replace(/_/g, ' ')}</strong></td>
+                                            <td>{column.distinct || 0}</td>
                                             <td>
-                                                {stats[`${columnName}_most_common`]}
-                                                ({stats[`${columnName}_most_common_count`]})
+                                                {mostCommon && `${formatValue(mostCommon.value)} (${mostCommon.count})`}
                                             </td>
                                         </tr>
                                     );
@@ -148,4 +104,4 @@ const Statistics = ({ data }) => {
     );
 };
 
-export default Statistics; 
\ No newline at end of file
+export default Statistics;